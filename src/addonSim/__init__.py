@@ -12,17 +12,24 @@ bl_info = {
     "category": "Development",
 }
 
-from . import handlers
-from . import preferences
-from . import properties_global
-from . import properties
-from . import operators
-from . import panels
-from . import mw_fract
+try:
+    import bpy
+except ImportError:
+    # headless usage of the simulation core (mw_core, mw_cli) so skip all blender modules
+    bpy = None
 
 from .utils_dev import DEV
-preferences.ADDON._bl_info = bl_info.copy()
-preferences.ADDON._bl_name = __name__
+if bpy:
+    from . import handlers
+    from . import preferences
+    from . import properties_global
+    from . import properties
+    from . import operators
+    from . import panels
+    from . import mw_fract
+
+    preferences.ADDON._bl_info = bl_info.copy()
+    preferences.ADDON._bl_name = __name__
 
 
 #-------------------------------------------------------------------
@@ -36,7 +43,7 @@ submodules = [
     operators,
     panels,
     mw_fract
-]
+] if bpy else []
 _name = f"{__name__}  (...{__file__[-DEV.logs_cutpath:]})"
 
 def register():
@@ -54,5 +61,5 @@ def unregister():
 
 
 loaded = True
-preferences.ADDON._bl_loaded = True
+if bpy: preferences.ADDON._bl_loaded = True
 DEV.log_msg(f"{_name}", {"ADDON", "PARSED"})
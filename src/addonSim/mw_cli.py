@@ -0,0 +1,136 @@
+""" Headless simulation entry point, run from the src folder (no blender required):
+    python -m addonSim.mw_cli points.npy -n 1000 --cfg cfg.json --set water_deg=0.3 --out results.npz
+    python -m addonSim.mw_cli points.npy -n 1000 --ensemble 32 --processes 8 --out ensemble.npz
+    python -m addonSim.mw_cli points.npy -n 1000 --sweep sweep.json --out sweep.csv
+"""
+
+import argparse
+import json
+import numpy as np
+
+from .mw_core import MW_Core, MW_CoreCfg
+from .mw_ensemble import MW_Ensemble
+from .mw_sweep import MW_Sweep
+from .mw_sim import SIM_EXIT_FLAG
+from .utils_dev import DEV
+from .stats import getStats
+
+
+#-------------------------------------------------------------------
+
+def load_array(path:str, cols:int) -> np.ndarray:
+    """ Load a (n,cols) float array from .npy or any text format read by numpy """
+    if path.endswith(".npy"): arr = np.load(path)
+    else: arr = np.loadtxt(path, ndmin=2)
+    return np.asarray(arr, dtype=np.float64).reshape(-1, cols)
+
+def parse_value(s:str):
+    """ Json values for the --set overrides, plain strings otherwise """
+    try: return json.loads(s)
+    except ValueError: return s
+
+def get_cfg(args) -> MW_CoreCfg:
+    cfg = MW_CoreCfg()
+    if args.cfg:
+        with open(args.cfg) as f:
+            cfg.update(json.load(f))
+
+    for kv in args.set:
+        key, val = kv.split("=", 1)
+        # nested values with a dot e.g. debug_rnd.seed=5
+        if "." in key:
+            nested, key = key.split(".", 1)
+            cfg.update({ nested: { key: parse_value(val) } })
+        else:
+            cfg.update({ key: parse_value(val) })
+
+    if args.seed is not None:
+        cfg.debug_rnd.seed = args.seed
+        cfg.debug_rnd.seed_regen = False
+    if args.batch is not None:
+        cfg.step_batchSize = args.batch
+    return cfg
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="mw_cli", description="Run the mechanical weathering simulation without blender")
+    parser.add_argument("points", help="Source points (n,3) as .npy or text")
+    parser.add_argument("-n", "--infiltrations", type=int, default=None, help="Number of infiltrations, cfg.step_infiltrations by default")
+    parser.add_argument("--bounds", type=float, nargs=6, default=None, metavar=("X0","Y0","Z0","X1","Y1","Z1"), help="Container min/max, by default the points bounds plus the margin")
+    parser.add_argument("--margin", type=float, default=0.1, help="Margin added to the points bounds")
+    parser.add_argument("--walls", default=None, help="Wall planes (n,4) normal and distance as .npy or text")
+    parser.add_argument("--precision", type=int, default=None, help="Voro++ custom walls precision")
+    parser.add_argument("--cfg", default=None, help="Json with the sim cfg values (same names as the addon props)")
+    parser.add_argument("--set", default=[], action="append", metavar="KEY=VALUE", help="Override a cfg value, can be repeated")
+    parser.add_argument("--seed", type=int, default=None, help="Shortcut for debug_rnd.seed")
+    parser.add_argument("--batch", type=int, default=None, help="Shortcut for step_batchSize")
+    parser.add_argument("--seeds", type=int, nargs="+", default=None, help="Ensemble mode: run each seed from the same initial state and aggregate")
+    parser.add_argument("--ensemble", type=int, default=None, help="Ensemble mode shortcut: this many consecutive seeds starting at the cfg seed")
+    parser.add_argument("--sweep", default=None, help="Sweep mode: json with a grid of values lists per prop, or min/max ranges plus the number of samples { \"ranges\": {...}, \"samples\": n }")
+    parser.add_argument("--processes", type=int, default=None, help="Ensemble/sweep worker processes, all cores by default")
+    parser.add_argument("--trace", default=None, help="Record the steps trace and save it to this .npz, runs the serial steps")
+    parser.add_argument("-o", "--out", default="results.npz", help="Output .npz with the final links and cells state")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Disable the logs")
+    return parser
+
+#-------------------------------------------------------------------
+
+def main(argv=None) -> int:
+    args = get_parser().parse_args(argv)
+    if args.quiet:
+        DEV.logs = False
+        DEV.logs_stats_dt = False
+        DEV.logs_stats_total = False
+
+    cfg = get_cfg(args)
+    if args.trace:
+        cfg.debug_log_trace = True
+    points = load_array(args.points, 3)
+    if args.bounds:
+        bb = (tuple(args.bounds[:3]), tuple(args.bounds[3:]))
+    else:
+        bb = (tuple(points.min(axis=0) - args.margin), tuple(points.max(axis=0) + args.margin))
+    faces4D = load_array(args.walls, 4) if args.walls else None
+
+    try:
+        core = MW_Core(points, bb, faces4D, cfg, args.precision)
+    except ValueError as e:
+        DEV.log_msg(str(e), {'CLI', 'ERROR'})
+        return 1
+
+    # sweep of cfg values, a csv row per configuration
+    if args.sweep:
+        with open(args.sweep) as f:
+            params = json.load(f)
+        if "ranges" in params: configs = MW_Sweep.sample(params["ranges"], params.get("samples", 16), cfg.debug_rnd.seed)
+        else: configs = MW_Sweep.grid(params)
+
+        try:
+            sweep = MW_Sweep(core, args.processes)
+            rows = sweep.run(configs, args.infiltrations)
+        except KeyError as e:
+            DEV.log_msg(str(e), {'CLI', 'ERROR'})
+            return 1
+        sweep.save_csv(args.out, rows)
+        getStats().logFull("mw_cli sweep")
+        return 0
+
+    # ensemble of seeds aggregated
+    seeds = args.seeds
+    if args.ensemble: seeds = list(range(cfg.debug_rnd.seed, cfg.debug_rnd.seed + args.ensemble))
+    if seeds:
+        res = MW_Ensemble(core, args.processes).run(seeds, args.infiltrations)
+        np.savez_compressed(args.out, **res)
+        getStats().logFull("mw_cli ensemble")
+        return 0
+
+    flags_count = core.run(args.infiltrations)
+    core.save_results(args.out, flags_count)
+    if args.trace:
+        core.sim.trace.save(args.trace)
+
+    getStats().logFull("mw_cli")
+    DEV.log_msg(f"exit flags: { {SIM_EXIT_FLAG.to_str(f):c for f,c in flags_count.items()} }", {'CLI'})
+    return 0 if core.sim.exit_flag != SIM_EXIT_FLAG.NO_ENTRY_LINK else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
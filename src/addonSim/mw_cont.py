@@ -1,142 +1,79 @@
 import bpy
 import bpy.types as types
 from mathutils import Vector
+import numpy as np
 
 from .preferences import getPrefs
 from .properties_global import (
     MW_global_selected, MW_id_utils
 )
 
+# the container and enums live in the bpy-free base, also re-exported from here
+from .mw_cont_base import (
+    MW_ContBase, VORO_Container, CELL_ERROR_ENUM, CELL_STATE_ENUM, neigh_key_t, neighFaces_key_t
+)
 
-# Using tess voro++ adaptor
-from tess import Container as VORO_Container
-
-from . import utils_geo, utils_scene
+from . import utils_geo, utils_scene, utils_trans
 from .utils_dev import DEV
 from .stats import getStats
 
 
 #-------------------------------------------------------------------
 
-neigh_key_t      = tuple[int, int]
-neighFaces_key_t = tuple[int, int]
-
-class CELL_ERROR_ENUM:
-    """ Use leftover indices between cont boundaries and custom walls for filler error idx?
-        # NOTE:: could be using any number, sequentiality not used
-        # OPT:: sequential check of id in all, so in case of slow process just use a unique error etc
-    """
-    # could use original ID to preserve it? anyway need to be either very high or between 7-9 (walls id)
-    _zerosForHighlight = 1000000
-
-    MISSING = -1 *_zerosForHighlight
-    """ Missing a whole cell / object """
-    ASYMMETRY = -2 *_zerosForHighlight
-    """ Missing connection at in the supposed neighbour """
-    DELETED = -3 *_zerosForHighlight
-    """ Deleted from the scene """
-    #IGNORED = -4 *_zerosForHighlight
-    #""" Model debug ignored """
-
-    all = { MISSING, ASYMMETRY, DELETED }
-    build_process = { MISSING, ASYMMETRY }
-
-    @classmethod
-    def str(cls, idx):
-        if idx == cls.MISSING:   return "MISSING"
-        if idx == cls.ASYMMETRY: return "ASYMMETRY"
-        if idx == cls.DELETED:   return "DELETED"
-        #if idx == cls.IGNORED:   return "IGNORED"
-        return "unknown"
-
-class CELL_STATE_ENUM:
-    """ Current cell state, preserves some sequentiality"""
-    SOLID = 0
-    AIR = 1
-    CORE = 2
-
-    all = { SOLID, AIR, CORE }
-
-    @classmethod
-    def to_str(cls, e:int):
-        if e == cls.SOLID:  return "SOLID"
-        if e == cls.AIR:    return "AIR"
-        if e == cls.CORE:   return "CORE"
-        if e in CELL_ERROR_ENUM.all: return "ERROR_ENUM"
-        return "none"
-        #raise ValueError(f"CELL_STATE_ENUM: {e} is not in {cls.all}")
-    @classmethod
-    def from_str(cls, s:str):
-        if s == "SOLID":    return cls.SOLID
-        if s == "AIR":      return cls.AIR
-        if s == "CORE":     return cls.CORE
-        raise ValueError(f"CELL_STATE_ENUM: {s} is not in { set(CELL_STATE_ENUM.to_str(s) for s in cls.all) }")
-
-#-------------------------------------------------------------------
-
-class MW_Cont:
+class MW_Cont(MW_ContBase):
+    """ Container extended with the scene data: fracture root and cell objects/meshes """
 
     def __init__(self, root :types.Object, points: list[Vector], bb: list[Vector, 6], faces4D: list[Vector], precision: int):
-        self.initialized = False
-        """ Set to true after succesfully inserted all points in the voro cointainer """
-        self.precalculated = False
-        """ Set to true after succesfully precalculated all the data """
-
         self.root = root
         """ Shortcut to fracture root object """
 
-        # construct voro++ cont
-        self.voro_cont = self.build_voro(points, bb, faces4D, precision)
+        super().__init__(points, bb, faces4D, precision)
 
-        # initialized when at least found some cells
-        #if self.voro_cont is not None:
-        if self.voro_cont:
-            self.initialized = True
+    def precalculations(self, cells_list : list[types.Object] = None):
+        """ Precalculate/query data such as valid neighbours and mapping faces, also adds storage and cell id to cell objects
+            * without cells the faces are read from the voro cells (like the headless cont) so the links can be built before generating them
+            * the scene objects are then attached afterwards with setCells_objects (same face order as the voro cells)
+        """
+        if cells_list is None:
+            self.set_voro_toWorld()
+            super().precalculations()
+            self.setCells_objects([])
+            return
 
-    def precalculations(self, cells_list : list[types.Object]):
-        """ Precalculate/query data such as valid neighbours and mapping faces, also adds storage and cell id to cell objects """
         stats = getStats()
+        self.precalc_neighs()
 
-        # init wall dict with just empty lists (some will remain empty)
-        self.wallsId : list[int] = self.voro_cont.get_conainerId_limitWalls()+self.voro_cont.walls_cont_idx
-        numWalls = len(self.wallsId)
-        self.wallsId_edges = [ (self.wallsId[i], self.wallsId[(i+1)%numWalls] ) for i in range(numWalls) ]
-        self.keys_perWall: dict[int, list[neigh_key_t]] = {
-            id: list() for id in self.wallsId
-        }
-        # cell dict lists will have the same size of neighs/faces so fill in the following loop while checking for missing ones
-        self.keys_perCell: dict[int, list[neigh_key_t] | int] = dict()
-        """ # NOTE:: missing cells are filled with a placeholder id to preserve original position idx """
-
-
-        # calculate missing cells and query neighs (also with placeholders idx)
-        self.foundId   : list[int]           = []
-        self.missingId : list[int]           = []
-        self.deletedId : list[int]           = [] # NOTE:: will be treated as AIR cells, but missing geometry!
-        self.deletedId_prev = self.deletedId.copy()
-        self.neighs    : list[list[int]|int] = [CELL_ERROR_ENUM.MISSING]*len(self.voro_cont)
-
-        for idx_cell, obj_cell in enumerate(self.voro_cont):
-            if obj_cell is None:
-                self.missingId.append(idx_cell)
-                self.keys_perCell[idx_cell] = CELL_ERROR_ENUM.MISSING
-            else:
-                self.foundId.append(idx_cell)
-                neighs_cell = obj_cell.neighbors()
-                self.neighs[idx_cell] = neighs_cell
-                # prefill with asymmetry keys too
-                key = (CELL_ERROR_ENUM.ASYMMETRY, idx_cell)
-                self.keys_perCell[idx_cell] = [key]*len(neighs_cell)
-
-        msg = f"calculated voro cell neighs: {len(self.missingId)} / {len(self.voro_cont)} missing"
-        if self.missingId: msg += f" {str(self.missingId[:20])}"
-        stats.logDt(msg) # uncut=True
+        # initial state is SOLD
+        idx_cells = self.foundId[:len(cells_list)]
+        for idx_cell in idx_cells:
+            self.setCell_stateId(idx_cell, CELL_STATE_ENUM.SOLID)
 
         # retrieve objs, meshes -> dicts per cell
+        self.setCells_objects(cells_list)
+        #self.cells_meshes_FtoF[idx_cell] = utils_geo.get_meshDicts(mesh)["FtoF"]
+        self.set_FtoF([ utils_geo.map_FtoF_csr(self.cells_meshes[idx_cell]) for idx_cell in idx_cells ])
+
+        stats.logDt("calculated cells mesh dicts (interleaved missing cells)")
+
+        # build symmetric face map of the found cells
+        self.precalc_neighsFaces()
+        self.precalculated = True
+
+    def set_voro_toWorld(self):
+        """ Store the root transform to read the voro faces in world space, same as the cell objects generated from them
+            * the cells are children of the root at their centroid, so their unscaled matrix scales the centroid but not the local verts
+        """
+        utils_trans.trans_update(self.root)
+        loc, rot, scale = self.root.matrix_world.decompose()
+        self.voro_toWorld = np.array(self.root.matrix_world, dtype=np.float64)
+        """ Root world matrix applied to the cell centroids """
+        self.voro_rotWorld = np.array(rot.to_matrix(), dtype=np.float64)
+        """ Root rotation applied to the faces relative to the centroid, also the normal matrix of the unscaled cells """
+
+    def setCells_objects(self, cells_list : list[types.Object]):
+        """ Attach the scene cell objects in found order (placeholders until then), also adds storage, cell id and state to them """
         self.cells_objs        : list[types.Object|int] = [CELL_ERROR_ENUM.MISSING]* len(self.voro_cont)
         self.cells_meshes      : list[types.Mesh|int]   = [CELL_ERROR_ENUM.MISSING]* len(self.voro_cont)
-        self.cells_meshes_FtoF : list[dict|int]         = [CELL_ERROR_ENUM.MISSING]* len(self.voro_cont)
-        self.cells_state       : list[types.Object|int] = [CELL_ERROR_ENUM.MISSING]* len(self.voro_cont)
         prefs = getPrefs()
         self.cells_root = utils_scene.get_child(self.root, prefs.names.cells)
         self.cells_root_core = utils_scene.get_child(self.root, prefs.names.cells_core)
@@ -146,104 +83,12 @@ class MW_Cont:
             # asign idx cell managing missing ones
             idx_cell = self.foundId[idx_found]
             self.cells_objs[idx_cell] = obj_cell
+            self.cells_meshes[idx_cell] = obj_cell.data
 
             # asign data to the scene object too, including the storage id
             obj_cell.mw_id.cell_id = idx_cell
             obj_cell.mw_id.storage_id = self.root.mw_id.storage_id
-
-            # initial state is SOLD
-            self.cells_state[idx_cell] = CELL_STATE_ENUM.SOLID
-            obj_cell.mw_id.cell_state = CELL_STATE_ENUM.SOLID
-
-            # store mesh and faces map
-            mesh = obj_cell.data
-            self.cells_meshes[idx_cell] = mesh
-            #self.cells_meshes_FtoF[idx_cell] = utils_geo.get_meshDicts(mesh)["FtoF"]
-            self.cells_meshes_FtoF[idx_cell] = utils_geo.map_FtoF(mesh)
-
-        stats.logDt("calculated cells mesh dicts (interleaved missing cells)")
-
-        # build symmetric face map of the found cells
-        self.neighs_keys_asymmetry : list[neigh_key_t]   = []
-        self.neighs_keys_missing   : list[neigh_key_t]   = []
-        self.neighs_faces          : list[list[int]|int] = [CELL_ERROR_ENUM.MISSING]*len(self.voro_cont)
-        """ # NOTE:: missing cells and neigh asymmetries are filled with a placeholder id too """
-
-        for idx_cell in self.foundId:
-            neighs_cell = self.neighs[idx_cell]
-
-            faces: list[int] = [CELL_ERROR_ENUM.ASYMMETRY] * len(neighs_cell)
-            for idx_face,idx_neigh in enumerate(neighs_cell):
-                # wall connection always ok, so simply add its index
-                if idx_neigh < 0: faces.append(idx_neigh)
-
-                # general cases try retrieving the respective face at the neighbour end
-                else:
-                    neighs_other = self.neighs[idx_neigh]
-
-                    # check missing whole cell (self.neighs default value) -> alter neighs acording to found error
-                    if neighs_other == CELL_ERROR_ENUM.MISSING:
-                        self.neighs_keys_missing.append((idx_cell,idx_neigh))
-                        neighs_cell[idx_face] = CELL_ERROR_ENUM.MISSING
-                        # also reasign the exact error code in the keys_perCell structure too (started as asymmetry)
-                        self.keys_perCell[idx_cell][idx_face] = (CELL_ERROR_ENUM.MISSING, idx_cell)
-
-                    # try to find valid face matching index
-                    else:
-                        try:
-                            neigh_idx_face = neighs_other.index(idx_cell)
-                            faces[idx_face] = neigh_idx_face
-
-                        # symmetry checked with .index exception -> also alter neighs
-                        except ValueError:
-                            self.neighs_keys_asymmetry.append((idx_cell,idx_neigh))
-                            neighs_cell[idx_face] = CELL_ERROR_ENUM.ASYMMETRY
-
-            # add the merged list of faces
-            self.neighs_faces[idx_cell] = faces
-
-        stats.logDt(f"calculated cell neighs faces: {len(self.neighs_keys_missing)} broken due missing")
-        msg =       f"      ...found {len(self.neighs_keys_asymmetry)} asymmetries"
-        if self.neighs_keys_asymmetry: msg += f": {str(self.neighs_keys_asymmetry[:10])}"
-        stats.logDt(msg) # uncut=True
-        self.precalculated = True
-
-    def build_voro(self, points: list[Vector], bb: list[Vector, 6], faces4D: list[Vector], precision: int):
-        """ Build a voro++ container using the points and the faces as walls """
-
-        # Container bounds expected as tuples
-        bb_tuples = [ p.to_tuple() for p in bb ]
-
-        #Legacy cont some tests mid operator
-        if DEV.LEGACY_CONT_GEN:
-            voro_cont = VORO_Container(points=points, limits=bb_tuples)
-            DEV.log_msg(f"Found {len(voro_cont)} cells (NO walls - {len(faces4D)} faces)", {"CALC", "CONT", "LEGACY"})
-            return voro_cont
-
-        # Set wall planes precision used
-        if precision != VORO_Container.custom_walls_precision_default:
-            VORO_Container.custom_walls_precision = precision
-            DEV.log_msg(f"Set Container.custom_walls_precision: {precision}", {"CALC", "CONT"})
-        else:
-            VORO_Container.custom_walls_precision = VORO_Container.custom_walls_precision_default
-
-        # XXX:: container creation might fail do to some voro++ config params... hard to tweak for all? NOT DYNAMIC, requires recompilation
-        # XXX:: some tiny intersection between cells might happen due to tolerance -> check or not worth it, we shrink then would not be noticeable
-        try:
-            # Build the container and cells
-            voro_cont = VORO_Container(points=points, limits=bb_tuples, walls=faces4D)
-            # OPT:: init in two phases: define walls and then insert points?
-
-            # Check non empty
-            getStats().logDt("built voro container")
-            logType = {"CALC", "CONT"}
-            if not len(voro_cont): logType |= {"ERROR"}
-            DEV.log_msg(f"Found {len(voro_cont)} cells ({len(voro_cont.walls)} walls from {len(faces4D)} faces)", logType)
-            return voro_cont
-
-        except Exception as e:
-            DEV.log_msg(f"exception cont >> {str(e)}", {"CALC", "CONT", "ERROR"})
-            return None
+            obj_cell.mw_id.cell_state = self.cells_state[idx_cell]
 
     #-------------------------------------------------------------------
 
@@ -270,7 +115,7 @@ class MW_Cont:
             self.cells_meshes[idx_cell] = obj_cell.data
             # also recover state from scene
             cleaned |= self.cells_state[idx_cell] == obj_cell.mw_id.cell_state
-            self.cells_state[idx_cell] = obj_cell.mw_id.cell_state
+            self.setCell_stateId(idx_cell, obj_cell.mw_id.cell_state)
 
         # check some deleted obj (meshes not checked)
         ok, broken, error = self.getCells_splitID_needsSanitize()
@@ -302,20 +147,6 @@ class MW_Cont:
 
         return ok, broken+broken_prev, error
 
-    def getCells_splitID_state(self):
-        """ Split cells by state
-            # OPT:: store and only update?
-        """
-        stateMap = {
-            state : [] for state in CELL_STATE_ENUM.all
-        }
-
-        for id in self.foundId:
-            state = self.cells_state[id]
-            stateMap[state].append(id)
-
-        return stateMap
-
     #-------------------------------------------------------------------
 
     def setCells_missing(self, broken:list[int]):
@@ -326,32 +157,49 @@ class MW_Cont:
         for id in broken:
             self.cells_objs[id] = CELL_ERROR_ENUM.DELETED
             self.cells_meshes[id] = CELL_ERROR_ENUM.DELETED
-            self.cells_state[id] = CELL_STATE_ENUM.AIR
+            self.setCell_stateId(id, CELL_STATE_ENUM.AIR)
 
     def setCell_state(self, idx:int, state:int):
-        """ Mark both the array and the cell object """
-        self.cells_objs[idx].mw_id.cell_state = state
-        self.cells_state[idx] = state
-
-    # OPT:: snake case or no? links getters?
-    def setCells_state(self, idx_list:list[int], state:int):
-        """ Mark both the array and the cell object """
-        for idx in idx_list:
-            self.cells_objs[idx].mw_id.cell_state = state
-            self.cells_state[idx] = state
+        """ Mark both the array and the cell object, when attached (setCells_objects copies the state afterwards) """
+        obj = self.cells_objs[idx]
+        if not isinstance(obj, int):
+            obj.mw_id.cell_state = state
+        self.setCell_stateId(idx, state)
 
     #-------------------------------------------------------------------
 
-    # OPT:: reduce stored amoun instead of the whole array
-    def backupState(self):
-        self.backup_cells_state = self.cells_state.copy()
-
-    def backupState_restore(self):
-        self.cells_state = self.backup_cells_state.copy()
-
-    def reset(self):
-        for id in self.foundId:
-            self.cells_state[id] = CELL_STATE_ENUM.SOLID
+    def getFaces_world(self, idx_cell:int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """ Centers, normals and areas of all the faces of a cell read from its mesh, in world space
+            * read in bulk with foreach_get (float32 like the mesh data) and transformed with a single product per cell
+            * cells without objects yet read the voro cell (in the root local space) and apply the transform its object would have
+        """
+        if isinstance(self.cells_meshes[idx_cell], int):
+            centers, normals, areas = super().getFaces_world(idx_cell)
+            centroid = np.asarray(self.voro_cont[idx_cell].centroid(), dtype=np.float64)
+            m, r = self.voro_toWorld, self.voro_rotWorld
+            centers = (centroid @ m[:3,:3].T + m[:3,3]) + (centers - centroid) @ r.T
+            normals = normals @ r.T
+            return centers, normals, areas
+
+        obj        = self.cells_objs[idx_cell]
+        me         = self.cells_meshes[idx_cell]
+        m_toWorld  = utils_trans.get_worldMatrix_unscaled(obj, update=True)
+        mn_toWorld = utils_trans.get_normalMatrix(m_toWorld)
+
+        n = len(me.polygons)
+        centers = np.empty(n*3, dtype=np.float32)
+        normals = np.empty(n*3, dtype=np.float32)
+        areas = np.empty(n, dtype=np.float32)
+        me.polygons.foreach_get("center", centers)
+        me.polygons.foreach_get("normal", normals)
+        me.polygons.foreach_get("area", areas)
+
+        # row vectors so multiply by the transposed matrices
+        # NOTE:: rotated normals may potentially have a length of 1.0 +- 1e-8 but not worth normalizing
+        m = np.array(m_toWorld, dtype=np.float64)
+        centers = centers.reshape(n,3) @ m[:3,:3].T + m[:3,3]
+        normals = normals.reshape(n,3) @ np.array(mn_toWorld, dtype=np.float64).T
+        return centers, normals, areas.astype(np.float64)
 
     #-------------------------------------------------------------------
 
@@ -0,0 +1,455 @@
+import numpy as np
+import itertools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Using tess voro++ adaptor
+from tess import Container as VORO_Container
+
+from . import utils
+from .utils_dev import DEV
+from .stats import getStats
+
+
+#-------------------------------------------------------------------
+
+neigh_key_t      = tuple[int, int]
+neighFaces_key_t = tuple[int, int]
+
+class CELL_ERROR_ENUM:
+    """ Use leftover indices between cont boundaries and custom walls for filler error idx?
+        # NOTE:: could be using any number, sequentiality not used
+        # OPT:: sequential check of id in all, so in case of slow process just use a unique error etc
+    """
+    # could use original ID to preserve it? anyway need to be either very high or between 7-9 (walls id)
+    _zerosForHighlight = 1000000
+
+    MISSING = -1 *_zerosForHighlight
+    """ Missing a whole cell / object """
+    ASYMMETRY = -2 *_zerosForHighlight
+    """ Missing connection at in the supposed neighbour """
+    DELETED = -3 *_zerosForHighlight
+    """ Deleted from the scene """
+    #IGNORED = -4 *_zerosForHighlight
+    #""" Model debug ignored """
+
+    all = { MISSING, ASYMMETRY, DELETED }
+    build_process = { MISSING, ASYMMETRY }
+
+    @classmethod
+    def str(cls, idx):
+        if idx == cls.MISSING:   return "MISSING"
+        if idx == cls.ASYMMETRY: return "ASYMMETRY"
+        if idx == cls.DELETED:   return "DELETED"
+        #if idx == cls.IGNORED:   return "IGNORED"
+        return "unknown"
+
+class CELL_STATE_ENUM:
+    """ Current cell state, preserves some sequentiality"""
+    SOLID = 0
+    AIR = 1
+    CORE = 2
+
+    all = { SOLID, AIR, CORE }
+
+    @classmethod
+    def to_str(cls, e:int):
+        if e == cls.SOLID:  return "SOLID"
+        if e == cls.AIR:    return "AIR"
+        if e == cls.CORE:   return "CORE"
+        if e in CELL_ERROR_ENUM.all: return "ERROR_ENUM"
+        return "none"
+        #raise ValueError(f"CELL_STATE_ENUM: {e} is not in {cls.all}")
+    @classmethod
+    def from_str(cls, s:str):
+        if s == "SOLID":    return cls.SOLID
+        if s == "AIR":      return cls.AIR
+        if s == "CORE":     return cls.CORE
+        raise ValueError(f"CELL_STATE_ENUM: {s} is not in { set(CELL_STATE_ENUM.to_str(s) for s in cls.all) }")
+
+#-------------------------------------------------------------------
+
+class CellsCSR:
+    """ Integer rows per cell stored flat with offsets (CSR), picklable and shareable as plain arrays
+        * rows follow the faces of each cell, missing cells have empty rows and errors are the CELL_ERROR_ENUM sentinels
+        * 32 bit values, the error sentinels fit too
+        * index by cell for the row (a writable view) or by (cell, face) for a single value
+    """
+    __slots__ = ("offsets", "values")
+
+    def __init__(self, offsets: np.ndarray, values: np.ndarray):
+        self.offsets = offsets
+        self.values = values
+
+    @classmethod
+    def from_lists(cls, rows: list[list[int]]):
+        offsets, values = utils.csr_from_lists(rows, dtype=np.int32)
+        return cls(offsets, values.copy())
+
+    def __len__(self):
+        return len(self.offsets)-1
+
+    def __getitem__(self, idx):
+        if isinstance(idx, tuple):
+            return int(self.values[self.offsets[idx[0]] + idx[1]])
+        return self.values[self.offsets[idx]:self.offsets[idx+1]]
+
+    def __setitem__(self, idx: tuple[int,int], value: int):
+        self.values[self.offsets[idx[0]] + idx[1]] = value
+
+    def row(self, idx_cell: int) -> list[int]:
+        """ Python ints, faster to iterate """
+        return self.values[self.offsets[idx_cell]:self.offsets[idx_cell+1]].tolist()
+
+class CellsKeysCSR(CellsCSR):
+    """ Link keys per cell face, only the other end of the key is stored (cell, wall or error placeholder)
+        * the keys are sorted pairs so they are rebuilt from the cell and the other end
+    """
+    __slots__ = ()
+
+    def __getitem__(self, idx):
+        if isinstance(idx, tuple):
+            other = int(self.values[self.offsets[idx[0]] + idx[1]])
+            return (other, idx[0]) if other < idx[0] else (idx[0], other)
+        return [ (other, idx) if other < idx else (idx, other) for other in self.row(idx) ]
+
+    def __setitem__(self, idx: tuple[int,int], key: neigh_key_t):
+        self.values[self.offsets[idx[0]] + idx[1]] = key[0] if key[1] == idx[0] else key[1]
+
+class FacesCSR:
+    """ Integer rows per cell face stored flat with offsets (CSR), the faces of each cell follow the cells offsets
+        * index by (cell, face) for the row (a writable view) or by cell for the list of rows
+    """
+    __slots__ = ("cells_offsets", "offsets", "values")
+
+    def __init__(self, cells_offsets: np.ndarray, offsets: np.ndarray, values: np.ndarray):
+        self.cells_offsets = cells_offsets
+        self.offsets = offsets
+        self.values = values
+
+    def __len__(self):
+        return len(self.cells_offsets)-1
+
+    def __getitem__(self, idx):
+        if isinstance(idx, tuple):
+            f = self.cells_offsets[idx[0]] + idx[1]
+            return self.values[self.offsets[f]:self.offsets[f+1]]
+        return [ self[idx, f] for f in range(self.cells_offsets[idx+1] - self.cells_offsets[idx]) ]
+
+    def row(self, idx_cell: int, idx_face: int) -> list[int]:
+        """ Python ints, faster to iterate """
+        return self[idx_cell, idx_face].tolist()
+
+#-------------------------------------------------------------------
+
+class MW_ContBase:
+    """ Voro++ container with the cells topology and state, no blender scene data involved
+        * used directly by the headless core (mw_core), MW_Cont extends it with the scene cell objects
+        * face data is read from the voro cells so it is in the container space (no object transforms)
+    """
+
+    def __init__(self, points: list, bb: list, faces4D: list, precision: int):
+        self.initialized = False
+        """ Set to true after succesfully inserted all points in the voro cointainer """
+        self.precalculated = False
+        """ Set to true after succesfully precalculated all the data """
+
+        # construct voro++ cont
+        self.voro_cont = self.build_voro(points, bb, faces4D, precision)
+
+        # initialized when at least found some cells
+        #if self.voro_cont is not None:
+        if self.voro_cont:
+            self.initialized = True
+
+    def __getstate__(self):
+        """ The voro container cannot be pickled, but it is only queried during the precalculations """
+        state = self.__dict__.copy()
+        state["voro_cont"] = None
+        return state
+
+    precalc_chunkSize = 1024
+    """ Cells per chunk of the pure data precalculations, the chunks are mapped in a thread pool """
+
+    def precalculations(self, threads: int = None):
+        """ Precalculate/query data such as valid neighbours and mapping faces, all from the voro cells
+            * the voro cells are queried serially, then the pure data work runs over chunks of cells (all cores by default)
+        """
+        self.precalc_neighs()
+
+        for idx_cell in self.foundId:
+            # initial state is SOLD
+            self.setCell_stateId(idx_cell, CELL_STATE_ENUM.SOLID)
+        self.precalc_FtoF(threads)
+
+        getStats().logDt("calculated cells faces dicts (interleaved missing cells)")
+
+        self.precalc_neighsFaces(threads)
+        self.precalculated = True
+
+    def precalc_neighs(self):
+        """ Query the neighbours with placeholder idx for missing cells, also init the per cell arrays """
+        stats = getStats()
+
+        # init wall dict with just empty lists (some will remain empty)
+        self.wallsId : list[int] = self.voro_cont.get_conainerId_limitWalls()+self.voro_cont.walls_cont_idx
+        numWalls = len(self.wallsId)
+        self.wallsId_edges = [ (self.wallsId[i], self.wallsId[(i+1)%numWalls] ) for i in range(numWalls) ]
+        self.keys_perWall: dict[int, list[neigh_key_t]] = {
+            id: list() for id in self.wallsId
+        }
+        # calculate missing cells and query neighs (also with placeholders idx)
+        self.foundId   : list[int]           = []
+        self.missingId : list[int]           = []
+        self.deletedId : list[int]           = [] # NOTE:: will be treated as AIR cells, but missing geometry!
+        self.deletedId_prev = self.deletedId.copy()
+        neighs         : list[list[int]]     = [ list() ]*len(self.voro_cont)
+
+        for idx_cell, obj_cell in enumerate(self.voro_cont):
+            if obj_cell is None:
+                self.missingId.append(idx_cell)
+            else:
+                self.foundId.append(idx_cell)
+                neighs[idx_cell] = obj_cell.neighbors()
+
+        self.neighs : CellsCSR = CellsCSR.from_lists(neighs)
+        """ Neighbour per cell face (cell or wall id), also the error placeholders: missing cells have empty rows """
+        # cell keys have the same size of neighs/faces, prefilled with asymmetry keys too
+        self.keys_perCell : CellsKeysCSR = CellsKeysCSR(self.neighs.offsets, np.full(len(self.neighs.values), CELL_ERROR_ENUM.ASYMMETRY, dtype=np.int32))
+        """ Link key per cell face, filled while building the links """
+
+        msg = f"calculated voro cell neighs: {len(self.missingId)} / {len(self.voro_cont)} missing"
+        if self.missingId: msg += f" {str(self.missingId[:20])}"
+        stats.logDt(msg) # uncut=True
+
+        # faces dicts and state per cell
+        self.cells_meshes_FtoF : FacesCSR                 = None
+        """ Adjacent faces per cell face
+            # NOTE:: named after the cell meshes but the headless cont fills it from the voro faces (same face order)
+        """
+        self.cells_state       : list[int]                = [CELL_ERROR_ENUM.MISSING]* len(self.voro_cont)
+        self.cells_stateIds    : dict[int, set[int]]      = { state: set() for state in CELL_STATE_ENUM.all }
+        """ Found cells id bucketed by state, kept up to date on every state change """
+
+    def precalc_FtoF(self, threads: int = None):
+        """ Faces to faces map of all the found cells, the face loops are read serially then mapped in chunks of cells """
+        faces = [ self.voro_cont[idx_cell].face_vertices() for idx_cell in self.foundId ]
+        chunks = [ faces[i:i+self.precalc_chunkSize] for i in range(0, len(faces), self.precalc_chunkSize) ]
+        self.set_FtoF(map_chunks(calc_FtoF_chunk, chunks, threads))
+
+    def set_FtoF(self, chunks: list[tuple[np.ndarray, np.ndarray]]):
+        """ Join the CSR faces maps of consecutive chunks of found cells (faces in the same order as the neighs) """
+        lens = [ np.diff(offsets) for offsets,_ in chunks ]
+        offsets = np.zeros(sum(map(len, lens))+1, dtype=np.int64)
+        if lens: np.cumsum(np.concatenate(lens), out=offsets[1:])
+        values = np.concatenate([ v for _,v in chunks ]).astype(np.int32) if chunks else np.zeros(0, dtype=np.int32)
+        self.cells_meshes_FtoF = FacesCSR(self.neighs.offsets, offsets, values)
+
+    def precalc_neighsFaces(self, threads: int = None):
+        """ Build the symmetric face map of the found cells
+            * a (cell, neigh) -> face map of all the faces is built once, then the reverse keys are looked up in chunks of faces
+            * the error codes are then applied serially in the original cell and face order
+        """
+        stats = getStats()
+        self.neighs_keys_asymmetry : list[neigh_key_t]   = []
+        self.neighs_keys_missing   : list[neigh_key_t]   = []
+
+        # flat arrays of all the faces
+        n = len(self.voro_cont)
+        offsets = self.neighs.offsets
+        neighs_len = np.diff(offsets)
+        faces_cell = np.repeat(np.arange(n, dtype=np.int64), neighs_len)
+        faces_neigh = self.neighs.values.astype(np.int64)
+        faces_idx = np.arange(len(faces_neigh), dtype=np.int64) - np.repeat(offsets[:-1], neighs_len)
+        found = np.zeros(n, dtype=bool)
+        found[self.foundId] = True
+
+        # the map as sorted keys, a stable sort keeps the first face like list.index with repeated neighbours
+        cells = faces_neigh >= 0
+        keys = faces_cell[cells] * n + faces_neigh[cells]
+        order = np.argsort(keys, kind="stable")
+        FtoF_map = (keys[order], faces_idx[cells][order])
+
+        chunk = self.precalc_chunkSize * 16
+        chunks = [ (faces_cell[i:i+chunk], faces_neigh[i:i+chunk], found, n, FtoF_map) for i in range(0, len(faces_neigh), chunk) ]
+        faces, missing, asymmetry = ( np.concatenate(arrs) if arrs else np.zeros(0, dtype=np.int64)
+                                      for arrs in zip(*map_chunks(calc_neighsFaces_chunk, chunks, threads)) )
+        self.neighs_faces : CellsCSR = CellsCSR(offsets, faces.astype(np.int32))
+        """ Face at the neighbour end per cell face, the walls id and the error placeholders otherwise """
+
+        # missing whole cell -> alter neighs acording to found error
+        for i in np.flatnonzero(missing).tolist():
+            self.neighs_keys_missing.append((int(faces_cell[i]), int(faces_neigh[i])))
+        self.neighs.values[missing] = CELL_ERROR_ENUM.MISSING
+        # also reasign the exact error code in the keys_perCell structure too (started as asymmetry)
+        self.keys_perCell.values[missing] = CELL_ERROR_ENUM.MISSING
+
+        # symmetry not found at the other end -> also alter neighs
+        for i in np.flatnonzero(asymmetry).tolist():
+            self.neighs_keys_asymmetry.append((int(faces_cell[i]), int(faces_neigh[i])))
+        self.neighs.values[asymmetry] = CELL_ERROR_ENUM.ASYMMETRY
+
+        stats.logDt(f"calculated cell neighs faces: {len(self.neighs_keys_missing)} broken due missing")
+        msg =       f"      ...found {len(self.neighs_keys_asymmetry)} asymmetries"
+        if self.neighs_keys_asymmetry: msg += f": {str(self.neighs_keys_asymmetry[:10])}"
+        stats.logDt(msg) # uncut=True
+
+    def build_voro(self, points: list, bb: list, faces4D: list, precision: int):
+        """ Build a voro++ container using the points and the faces as walls """
+
+        # Container bounds expected as tuples
+        bb_tuples = [ tuple(p) for p in bb ]
+
+        #Legacy cont some tests mid operator
+        if DEV.LEGACY_CONT_GEN:
+            voro_cont = VORO_Container(points=points, limits=bb_tuples)
+            DEV.log_msg(f"Found {len(voro_cont)} cells (NO walls - {len(faces4D)} faces)", {"CALC", "CONT", "LEGACY"})
+            return voro_cont
+
+        # Set wall planes precision used
+        if precision != VORO_Container.custom_walls_precision_default:
+            VORO_Container.custom_walls_precision = precision
+            DEV.log_msg(f"Set Container.custom_walls_precision: {precision}", {"CALC", "CONT"})
+        else:
+            VORO_Container.custom_walls_precision = VORO_Container.custom_walls_precision_default
+
+        # XXX:: container creation might fail do to some voro++ config params... hard to tweak for all? NOT DYNAMIC, requires recompilation
+        # XXX:: some tiny intersection between cells might happen due to tolerance -> check or not worth it, we shrink then would not be noticeable
+        try:
+            # Build the container and cells
+            voro_cont = VORO_Container(points=points, limits=bb_tuples, walls=faces4D)
+            # OPT:: init in two phases: define walls and then insert points?
+
+            # Check non empty
+            getStats().logDt("built voro container")
+            logType = {"CALC", "CONT"}
+            if not len(voro_cont): logType |= {"ERROR"}
+            DEV.log_msg(f"Found {len(voro_cont)} cells ({len(voro_cont.walls)} walls from {len(faces4D)} faces)", logType)
+            return voro_cont
+
+        except Exception as e:
+            DEV.log_msg(f"exception cont >> {str(e)}", {"CALC", "CONT", "ERROR"})
+            return None
+
+    #-------------------------------------------------------------------
+
+    def getFaces_world(self, idx_cell:int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """ Centers, normals and areas of all the faces of a cell, indexed like its neighs
+            * the center is the vertex average like the blender polygons, summed at once over the flattened face loops
+        """
+        cell = self.voro_cont[idx_cell]
+        verts = np.asarray(cell.vertices(), dtype=np.float64)
+        faces = cell.face_vertices()
+        loops_len = np.fromiter(map(len, faces), dtype=np.int64, count=len(faces))
+        loops = np.fromiter(itertools.chain.from_iterable(faces), dtype=np.int64, count=int(loops_len.sum()))
+        loops_start = np.cumsum(loops_len) - loops_len
+        centers = np.add.reduceat(verts[loops], loops_start, axis=0) / loops_len[:,None]
+        normals = np.asarray(cell.normals(), dtype=np.float64)
+        areas = np.asarray(cell.face_areas(), dtype=np.float64)
+        return centers, normals, areas
+
+    def getCells_splitID_state(self) -> dict[int, set[int]]:
+        """ Split cells by state, returns the stored index so treat the sets as read only """
+        return self.cells_stateIds
+
+    def getCells_count_state(self, state:int) -> int:
+        return len(self.cells_stateIds[state])
+
+    #-------------------------------------------------------------------
+
+    def setCell_stateId(self, idx:int, state:int):
+        """ Mark the array and move the cell to its new state bucket """
+        prev = self.cells_state[idx]
+        if prev in self.cells_stateIds:
+            self.cells_stateIds[prev].discard(idx)
+        self.cells_stateIds[state].add(idx)
+        self.cells_state[idx] = state
+
+    def setCell_state(self, idx:int, state:int):
+        self.setCell_stateId(idx, state)
+
+    # OPT:: snake case or no? links getters?
+    def setCells_state(self, idx_list:list[int], state:int):
+        for idx in idx_list:
+            self.setCell_state(idx, state)
+
+    def recalc_stateIds(self):
+        """ Rebuild the state buckets from the array """
+        self.cells_stateIds = { state: set() for state in CELL_STATE_ENUM.all }
+        for idx in self.foundId:
+            self.cells_stateIds[self.cells_state[idx]].add(idx)
+
+    #-------------------------------------------------------------------
+
+    def get_snapshot(self) -> dict:
+        return {
+            "cells_state"    : self.cells_state.copy(),
+            "cells_stateIds" : { state: ids.copy() for state,ids in self.cells_stateIds.items() },
+        }
+
+    def set_snapshot(self, snap:dict):
+        """ Restore the state, the scene objects are not updated """
+        self.cells_state[:] = snap["cells_state"]
+        self.cells_stateIds = { state: ids.copy() for state,ids in snap["cells_stateIds"].items() }
+
+    def reset(self):
+        for id in self.foundId:
+            self.cells_state[id] = CELL_STATE_ENUM.SOLID
+        self.recalc_stateIds()
+
+#-------------------------------------------------------------------
+# NOTE:: threads instead of processes: the blender python cannot spawn workers and the heavy parts are numpy calls releasing the GIL
+
+def map_chunks(fn, chunks: list, threads: int = None) -> list:
+    """ Results of fn per chunk in order, mapped in a thread pool when there is more than one chunk """
+    if threads is None: threads = os.cpu_count() or 1
+    if threads <= 1 or len(chunks) <= 1:
+        return [ fn(c) for c in chunks ]
+    with ThreadPoolExecutor(min(threads, len(chunks))) as pool:
+        return list(pool.map(fn, chunks))
+
+def calc_FtoF_chunk(faces: list[list[list[int]]]) -> tuple[np.ndarray, np.ndarray]:
+    """ Faces to faces CSR map (local face ids) of the faces of consecutive cells given their face loops, with their vertex ids offset """
+    faces_len = np.fromiter(map(len, faces), dtype=np.int64, count=len(faces))
+    faces_start = np.cumsum(faces_len) - faces_len
+
+    # offset the vertices of each cell past the previous ones
+    loops_cell = list(itertools.chain.from_iterable(faces))
+    loops_len = np.fromiter(map(len, loops_cell), dtype=np.int64, count=len(loops_cell))
+    loops = np.fromiter(itertools.chain.from_iterable(loops_cell), dtype=np.int64, count=int(loops_len.sum()))
+    if len(loops):
+        cells_loops_len = np.add.reduceat(loops_len, faces_start)
+        verts_len = np.maximum.reduceat(loops, np.cumsum(cells_loops_len) - cells_loops_len) + 1
+        loops += np.repeat(np.cumsum(verts_len) - verts_len, cells_loops_len)
+    offsets, neighs = utils.map_FtoF_loops(loops, loops_len)
+
+    # back to the local face ids of each cell
+    neighs = neighs - np.repeat(np.repeat(faces_start, faces_len), np.diff(offsets))
+    return offsets, neighs
+
+def calc_neighsFaces_chunk(args) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """ Face at the neighbour end of a chunk of faces given as (cell, neigh) arrays, plus the missing and asymmetry masks
+        * the (cell, neigh) -> face map is given as sorted keys (cell * n + neigh) and their faces
+    """
+    faces_cell, faces_neigh, found, n, (map_keys, map_faces) = args
+    faces = np.full(len(faces_cell), CELL_ERROR_ENUM.ASYMMETRY, dtype=np.int64)
+
+    # wall connection always ok, so simply add its index
+    walls = faces_neigh < 0
+    faces[walls] = faces_neigh[walls]
+
+    # the neighbour cell may be missing, otherwise look up the reverse key
+    cells = ~walls
+    missing = np.zeros(len(faces_cell), dtype=bool)
+    missing[cells] = ~found[faces_neigh[cells]]
+    lookup = cells & ~missing
+    keys = faces_neigh[lookup] * n + faces_cell[lookup]
+    pos = np.minimum(np.searchsorted(map_keys, keys), max(len(map_keys)-1, 0))
+    hit = map_keys[pos] == keys if len(map_keys) else np.zeros(len(keys), dtype=bool)
+
+    faces_lookup = faces[lookup]
+    faces_lookup[hit] = map_faces[pos[hit]]
+    faces[lookup] = faces_lookup
+    asymmetry = np.zeros(len(faces_cell), dtype=bool)
+    asymmetry[lookup] = ~hit
+    return faces, missing, asymmetry
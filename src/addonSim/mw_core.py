@@ -0,0 +1,252 @@
+import numpy as np
+
+from .mw_cont_base import MW_ContBase, VORO_Container
+from .mw_links import MW_Links
+from .mw_sim import MW_Sim, SIM_EXIT_FLAG
+from .mw_sim_batch import MW_SimBatch
+from .mw_sim_flow import MW_SimFlow
+from .mw_sim_skip import MW_SimSkip
+from . import mw_resistance
+
+from .utils_dev import DEV
+from .stats import getStats
+
+
+#-------------------------------------------------------------------
+# NOTE:: plain mirrors of the blender props, keep the defaults in sync with properties.py
+
+class _MW_CoreCfgBase:
+    """ Attributes with the names and defaults of a blender property group """
+    _defaults : dict = {}
+    _sets = ()
+    _vectors = ()
+
+    def __init__(self, **kwargs):
+        for k,v in self._defaults.items():
+            setattr(self, k, v.copy() if isinstance(v, set) else v)
+        self.update(kwargs)
+
+    def update(self, values: dict):
+        """ Set values by name, sets and vectors can come as lists (e.g. from json) """
+        for k,v in values.items():
+            if k not in self._defaults:
+                raise KeyError(f"{type(self).__name__}: unknown prop {k}")
+            if k in self._sets: v = set(v)
+            elif k in self._vectors: v = tuple(float(x) for x in v)
+            setattr(self, k, v)
+
+    def to_dict(self) -> dict:
+        d = { k: getattr(self, k) for k in self._defaults }
+        for k in self._sets: d[k] = sorted(d[k])
+        for k in self._vectors: d[k] = list(d[k])
+        return d
+
+    def copy_props(self, props):
+        """ Read the same named values from a blender property group """
+        self.update({ k: getattr(props, k) for k in self._defaults })
+
+class MW_CoreRndCfg(_MW_CoreCfgBase):
+    """ Mirror of properties_utils.RND_config """
+    _defaults = {
+        "seed"       : 64,
+        "seed_mod"   : 0,
+        "seed_regen" : False,
+    }
+
+class MW_CoreResistCfg(_MW_CoreCfgBase):
+    """ Mirror of properties.MW_resistance_cfg (without the visualization props) """
+    _defaults = {
+        "field"     : {'LAYERS_SIDE'},
+        "out_inv"   : False,
+        "out_round" : False,
+        "in_flipX"  : False,
+        "in_flipY"  : False,
+    }
+    _sets = ("field",)
+
+class MW_CoreCfg(_MW_CoreCfgBase):
+    """ Mirror of properties.MW_sim_cfg, used as sim cfg when running headless """
+    _defaults = {
+        "step_infiltrations"         : 100,
+        "step_batchSize"             : 1,
+        "step_skipTolerance"         : 0.0,
+        "step_skipWindow"            : 100,
+        "step_expectedFlow"          : False,
+        "step_undoLevels"            : 8,
+        "step_maxDepth"              : -1,
+        "step_stopBreak"             : True,
+        "step_stopBreak_event"       : {'LINK'},
+        "water__start"               : 1.0,
+        "water_deg"                  : 0.25,
+        "water_abs_air"              : 0.05,
+        "water_abs_solid"            : 0.10,
+        "link_deg"                   : 0.5,
+        "link_resist_weight"         : 0.75,
+        "dir_entry"                  : (1, -0.5, -0.5),
+        "dir_entry_minAlign"         : 0.05,
+        "dir_entry_fromArrow"        : True,
+        "dir_next"                   : (0, 0, -1),
+        "dir_next_minAlign"          : 0.05,
+        "water_rnd_abs_minCheck"     : 0.25,
+        "water_rnd_abs_continueProb" : 0.9,
+        "water_rnd_abs_damage"       : 0.75,
+        "link_rnd_break_minCheck"    : 0.4,
+        "link_rnd_break_resistProb"  : 0.9,
+        "link_next_dir_weight"       : 0.75,
+        "link_next_exit_avoidance"   : 0.75,
+        "debug_log"                  : False,
+        "debug_log_lastIters"        : 10,
+        "debug_log_everyIters"       : 0,
+        "debug_log_path"             : False,
+        "debug_log_trace"            : False,
+        "debug_log_trace_candidates" : False,
+        "debug_log_trace_maxSteps"   : 1000,
+        "debug_log_trace_every"      : 1,
+        "debug_skip_entry_area"      : False,
+        "debug_skip_next_maxResist"  : False,
+        "debug_util_rndState"        : False,
+        "debug_util_uniformDeg"      : False,
+    }
+    """ # NOTE:: the headless defaults turn off the logging """
+    _sets = ("step_stopBreak_event",)
+    _vectors = ("dir_entry", "dir_next")
+    _nested = ("debug_rnd", "resist")
+
+    def __init__(self, **kwargs):
+        self.debug_rnd = MW_CoreRndCfg()
+        self.resist = MW_CoreResistCfg()
+        super().__init__(**kwargs)
+
+    def update(self, values: dict):
+        values = dict(values)
+        for k in self._nested:
+            if k in values: getattr(self, k).update(values.pop(k))
+        super().update(values)
+
+    def to_dict(self) -> dict:
+        d = super().to_dict()
+        for k in self._nested:
+            d[k] = getattr(self, k).to_dict()
+        return d
+
+    def copy_props(self, props, resist_props=None):
+        """ Read the values from the blender sim props (and optionally the resistance ones from the prefs) """
+        super().copy_props(props)
+        self.debug_rnd.copy_props(props.debug_rnd)
+        if resist_props is not None:
+            self.resist.copy_props(resist_props)
+
+#-------------------------------------------------------------------
+
+class MW_Core:
+    """ Headless fracture: container, links and sim built from plain arrays without any blender scene
+        * points, bounds (min/max pair) and wall planes (normal and distance 4D vectors) all in the same space
+        * the addon builds the same objects from the scene (MW_Cont extends the container with the cells objects)
+    """
+
+    def __init__(self, points, bb, faces4D=None, cfg: MW_CoreCfg = None, precision: int = None):
+        stats = getStats()
+        self.cfg = cfg if cfg is not None else MW_CoreCfg()
+        mw_resistance.set_cfg(self.cfg.resist)
+        if precision is None:
+            precision = VORO_Container.custom_walls_precision_default
+
+        # same steps as the fracture operator
+        points = [ tuple(p) for p in points ]
+        faces4D = [ tuple(f) for f in faces4D ] if faces4D is not None else []
+        self.cont = MW_ContBase(points, bb, faces4D, precision)
+        if not self.cont.initialized:
+            raise ValueError("found no cont or cells... recalc different params?")
+
+        self.cont.precalculations()
+        self.links = MW_Links(self.cont)
+        if not self.links.initialized:
+            raise ValueError("found no links... recalc different params?")
+
+        self.sim = MW_Sim(self.cont, self.links, self.cfg)
+        self.depth_mean = 0.0
+        """ Mean depth reached by the infiltrations of the last run """
+        stats.logDt("built headless core")
+
+    def run(self, n:int = None) -> dict[int,int]:
+        """ Run n infiltrations (cfg.step_infiltrations by default) like the step operator, returns the count per exit flag """
+        cfg = self.cfg
+        sim = self.sim
+        if n is None: n = cfg.step_infiltrations
+
+        # store the state, also seeds the random, then compile the cfg for all the steps
+        sim.backup_state()
+        sim.cfg_update()
+
+        # expected degradation without walks, there are no exit flags
+        if cfg.step_expectedFlow:
+            flow = MW_SimFlow(sim)
+            flow.run(n)
+            self.depth_mean = flow.depth_mean
+            getStats().logDt("completed expected flow")
+            return dict()
+
+        # NOTE:: the trace is only recorded by the serial steps
+        if cfg.step_skipTolerance > 0 and not cfg.debug_util_uniformDeg and not cfg.debug_log_trace:
+            skip = MW_SimSkip(sim)
+            flags_count = skip.run(n, cfg.step_batchSize)
+            depth_sum = skip.depth_sum
+
+        elif cfg.step_batchSize > 1 and not cfg.debug_util_uniformDeg and not cfg.debug_log_trace:
+            batch = MW_SimBatch(sim)
+            flags_count = batch.run(n, cfg.step_batchSize)
+            depth_sum = batch.depth_sum
+
+        else:
+            flags_count = dict()
+            depth_sum = 0
+            for step_id in range(n):
+                # still alive msg
+                if cfg.debug_log_everyIters and step_id%cfg.debug_log_everyIters == 0:
+                    DEV.log_msg(f"// ({step_id}) running...", {'SIM', 'CORE'})
+
+                log_step = cfg.debug_log and step_id+1 > n-cfg.debug_log_lastIters
+                if not cfg.debug_util_uniformDeg: sim.step(log_step)
+                else: sim.step_degradeAll() # alternative see erosion on all
+                flags_count[sim.exit_flag] = flags_count.get(sim.exit_flag, 0) + 1
+                depth_sum += sim.step_depth
+
+                # skip the rest of steps
+                if sim.exit_flag == SIM_EXIT_FLAG.NO_ENTRY_LINK or sim.exit_flag >= SIM_EXIT_FLAG.STOP_ON_LINK_BREAK:
+                    break
+
+        runs = sum(flags_count.values())
+        self.depth_mean = depth_sum / runs if runs else 0.0
+
+        if sim.exit_flag == SIM_EXIT_FLAG.NO_ENTRY_LINK:
+            DEV.log_msg("No entry link found... (probably due dir_entry)", {'SIM', 'CORE', 'ERROR'})
+
+        getStats().logDt("completed simulation steps")
+        return flags_count
+
+    #-------------------------------------------------------------------
+
+    def get_results(self) -> dict[str, np.ndarray]:
+        """ Final state of the links and cells as arrays """
+        t = self.links.table
+        return {
+            "links_key_cells"   : t.key_cells,
+            "links_state"       : t.state,
+            "links_life"        : t.life,
+            "links_picks"       : t.picks,
+            "links_picks_entry" : t.picks_entry,
+            "cells_state"       : np.asarray(self.cont.cells_state, dtype=np.int64),
+            "comps_label"       : self.links.comps_label,
+            "step_id"           : np.asarray(self.sim.step_id),
+            "seed"              : np.asarray(self.cfg.debug_rnd.seed),
+        }
+
+    def save_results(self, path:str, flags_count: dict[int,int] = None):
+        """ Write the results arrays (and the exit flags count) to a compressed npz """
+        res = self.get_results()
+        if flags_count is not None:
+            flags = sorted(flags_count)
+            res["flags"] = np.asarray(flags, dtype=np.int64)
+            res["flags_count"] = np.asarray([ flags_count[f] for f in flags ], dtype=np.int64)
+        np.savez_compressed(path, **res)
+        DEV.log_msg(f"Saved results: {path}", {'CORE', 'IO'})
@@ -0,0 +1,134 @@
+import numpy as np
+import multiprocessing as mp
+from time import time
+
+from .mw_core import MW_Core
+from .mw_cont_base import CELL_STATE_ENUM
+from .mw_links import LINK_STATE_ENUM
+
+from .utils_dev import DEV
+from .stats import getStats
+
+
+#-------------------------------------------------------------------
+# worker process globals, inherited with fork or received once per worker with spawn
+
+_worker_core : MW_Core = None
+_worker_base : tuple[dict,dict] = None
+
+def _worker_init(core: MW_Core, base: tuple[dict,dict], logs: bool):
+    global _worker_core, _worker_base
+    _worker_core = core
+    _worker_base = base
+    DEV.logs = DEV.logs_stats_dt = DEV.logs_stats_total = logs
+
+def _worker_run(task: tuple[int,int,dict]) -> dict:
+    """ Run a seed (with some cfg values overriden) from the base state, only the per run results are sent back """
+    seed, n, values = task
+    core, sim = _worker_core, _worker_core.sim
+    snap, cfg_base = _worker_base
+
+    # always start from the same state, the seed is applied when storing the state at the start of the run
+    sim.set_snapshot(snap)
+    sim.snapshots.clear()
+    if values: core.cfg.update(values)
+    core.cfg.debug_rnd.seed = seed
+    core.cfg.debug_rnd.seed_regen = False
+
+    t = time()
+    flags_count = core.run(n)
+    t = time() - t
+
+    table = core.links.table
+    cells_state = np.asarray(core.cont.cells_state)
+    res = {
+        "seed"        : seed,
+        "values"      : values,
+        "flags_count" : flags_count,
+        "link_broken" : (table.state == LINK_STATE_ENUM.AIR) & (table.state_initial == LINK_STATE_ENUM.SOLID),
+        "cell_air"    : cells_state == CELL_STATE_ENUM.AIR,
+        "life"        : table.life.copy(),
+        "picks"       : table.picks.copy(),
+        "comps_len"   : core.links.comps_len,
+        "depth_mean"  : core.depth_mean,
+        # steps actually run, the step_id is 0-based and carried over from the base state
+        "steps"       : sim.step_id - snap["step_id"],
+        "time"        : t,
+    }
+
+    # leave the cfg as received for the next task
+    core.cfg.update(cfg_base)
+    return res
+
+def run_tasks(core: MW_Core, tasks: list[tuple[int,int,dict]], processes: int) -> list[dict]:
+    """ Run the tasks (seed, infiltrations, cfg values) from the current state of the core in a process pool
+        * the core is restored to its initial state and cfg at the end
+    """
+    global _worker_core, _worker_base
+    base = (core.sim.get_snapshot(), core.cfg.to_dict())
+
+    if processes <= 1 or len(tasks) <= 1:
+        # run in this process, still restoring the initial state at the end
+        _worker_core, _worker_base = core, base
+        runs = [ _worker_run(task) for task in tasks ]
+
+    else:
+        # NOTE:: fork shares the memory pages until written, spawn needs to pickle the core (without the voro container)
+        if "fork" in mp.get_all_start_methods():
+            _worker_core, _worker_base = core, base
+            ctx = mp.get_context("fork")
+            pool = ctx.Pool(processes)
+        else:
+            ctx = mp.get_context("spawn")
+            pool = ctx.Pool(processes, initializer=_worker_init, initargs=(core, base, DEV.logs))
+
+        with pool:
+            runs = list(pool.imap(_worker_run, tasks))
+
+    # leave the core as it was
+    core.sim.set_snapshot(base[0])
+    core.cfg.update(base[1])
+    _worker_core, _worker_base = None, None
+    return runs
+
+#-------------------------------------------------------------------
+
+class MW_Ensemble:
+    """ Run the same headless core with several seeds in a process pool and aggregate the erosion per link/cell
+        * the geometry (container, links table, CSR neighbours) is shared read only: inherited with fork, otherwise pickled once per worker
+        * each worker restores the initial state arrays before every seed, so a seed gives the same result as a single run
+    """
+
+    def __init__(self, core: MW_Core, processes: int = None):
+        self.core = core
+        self.processes = processes if processes else mp.cpu_count()
+
+    def run(self, seeds: list[int], n: int = None) -> dict[str, np.ndarray]:
+        """ Run n infiltrations per seed, returns the aggregated results """
+        runs = run_tasks(self.core, [ (seed, n, None) for seed in seeds ], self.processes)
+        getStats().logDt(f"ensemble runs: {len(runs)} seeds (processes {self.processes})")
+        return self.aggregate(runs)
+
+    def aggregate(self, runs: list[dict]) -> dict[str, np.ndarray]:
+        """ Mean per link/cell over the runs sorted by seed, also the exit flags histogram per seed """
+        runs = sorted(runs, key=lambda r: r["seed"])
+        col = lambda k: [ r[k] for r in runs ]
+        flags_counts = col("flags_count")
+        flags = sorted(set().union(*flags_counts))
+
+        res = {
+            "seeds"            : np.asarray(col("seed"), dtype=np.int64),
+            "link_break_prob"  : np.mean(col("link_broken"), axis=0),
+            "link_life_mean"   : np.mean(col("life"), axis=0),
+            "link_picks_mean"  : np.mean(col("picks"), axis=0),
+            "cell_air_prob"    : np.mean(col("cell_air"), axis=0),
+            "flags"            : np.asarray(flags, dtype=np.int64),
+            "flags_hist"       : np.asarray([ [ fc.get(f, 0) for f in flags ] for fc in flags_counts ], dtype=np.int64).reshape(len(runs), len(flags)),
+            "comps_len"        : np.asarray(col("comps_len"), dtype=np.int64),
+            "depth_mean"       : np.asarray(col("depth_mean"), dtype=np.float64),
+            "steps"            : np.asarray(col("steps"), dtype=np.int64),
+            "time"             : np.asarray(col("time"), dtype=np.float64),
+            "links_key_cells"  : self.core.links.table.key_cells,
+        }
+        DEV.log_msg(f"ensemble: {len(runs)} seeds, mean links broken {res['link_break_prob'].sum():.2f}, mean cells air {res['cell_air_prob'].sum():.2f}", {"CORE", "ENSEMBLE"})
+        return res
@@ -226,8 +226,8 @@ def get_connected_comps_unionFind(fract: MW_Fract):
     """ # NOTE:: old method, now done with networkx """
     cell_union = UnionFind(len(fract.cont.foundId))
 
-    for l in fract.links.internal:
-        cell_union.union(*l.key_cells)
+    for c1,c2 in fract.links.table.key_cells[fract.links.internal].tolist():
+        cell_union.union(c1,c2)
 
     DEV.log_msg(f"Extracted {cell_union.num_components} components", {"CALC", "COMP"})
     return cell_union
@@ -1,15 +1,20 @@
-import bpy
-import bpy.types as types
-from mathutils import Vector, Matrix
+try:
+    from mathutils import Vector
+except ImportError:
+    # headless core (mw_core), only the UI/debug views build vectors
+    Vector = tuple
 INF_FLOAT = float("inf")
 import networkx as nx
+import numpy as np
 import itertools
+from collections import deque
 
-from .mw_cont import MW_Cont, CELL_ERROR_ENUM, CELL_STATE_ENUM, neigh_key_t, neighFaces_key_t
+from .mw_cont_base import MW_ContBase, CELL_ERROR_ENUM, CELL_STATE_ENUM, neigh_key_t, neighFaces_key_t
 from .mw_resistance import field_R_current
+from .sumtree import SumTree
+from .unionfind import UnionFindSets
 
-from . import utils, utils_trans
-from .utils_trans import VECTORS
+from . import utils
 from .utils_dev import DEV
 from .stats import getStats
 
@@ -37,110 +42,227 @@ class LINK_STATE_ENUM:
         if s == "WALL":     return cls.WALL
         raise ValueError(f"CELL_STATE_ENUM: {s} is not in {set(LINK_STATE_ENUM.to_str(s) for s in cls.all)}")
 
-class Link():
-    """ # OPT:: could use separate array of props? pyhton already slow so ok class?"""
-
-    def __init__(self, key_cells: neigh_key_t, key_faces: neighFaces_key_t,
-                pos_world:Vector, dir_world:Vector, dir_from:int,
-                face_area:float, resistance:float, state=LINK_STATE_ENUM.SOLID):
+class LinkTable():
+    """ Struct of arrays with all links props, indexed by a sequential integer link id
+        * built in bulk from the faces arrays of all cells gathered by the link map
+        * sim props are the only mutable ones (life, state, picks...) apart from the dir flipping
+        * state changes go through set_stateId to keep the per state buckets up to date
+    """
+
+    def __init__(self):
+        self.len = 0
+        """ Number of links, valid after build """
+
+    def build(self, key_cells, key_faces, pos_world:np.ndarray, dir_world:np.ndarray, dir_from,
+                face_area:np.ndarray, resistance:np.ndarray, state_initial):
+        """ Set the static columns (one row per link) and reset the sim props """
+        n = self.len = len(key_cells)
         # no directionality but tuple key instead of set
-        self.key_cells : neigh_key_t      = key_cells
-        self.key_faces : neighFaces_key_t = key_faces
+        self.key_cells     = np.array(key_cells, dtype=np.int64).reshape(n,2)
+        self.key_faces     = np.array(key_faces, dtype=np.int64).reshape(n,2)
+        # properties in world space
+        self.pos           = np.array(pos_world, dtype=np.float64).reshape(n,3)
+        self.dir           = np.array(dir_world, dtype=np.float64).reshape(n,3)
+        self.dir_from      = np.array(dir_from, dtype=np.int64)
+        # properties to later normalize or divide by avg
+        self.area          = np.array(face_area, dtype=np.float64)
+        self.areaFactor    = np.ones(n, dtype=np.float64)
+        self.areaFactor_inv= np.ones(n, dtype=np.float64)
+        # NOTE:: resistance atm defined by 2D field -> potentially already normalized so no need for factor
+        self.resistance    = np.array(resistance, dtype=np.float64)
+        self.state_initial = np.array(state_initial, dtype=np.int8)
+
+        # cached resistance terms of the sim, the weight is set by the sim cfg
+        self.resist_weight = 1.0
+        self.resist_w      = self.resistance * self.resist_weight
+        """ Resistance field value times the sim weight """
 
         # sim props
-        self.state_initial = state
         self.reset()
 
-        # properties in world space
-        self.pos = pos_world
-        self.dir = dir_world
-        self.dir_from = dir_from
-        # properties to later normalize or divide by avg
-        self.area = face_area
-        self.areaFactor = 1
+        self.dir_version = 0
+        """ Incremented on dir flips so cached dir dependant values can be invalidated """
 
-        # NOTE:: resistance atm defined by 2D field -> potentially already normalized so no need for factor
-        self.resistance = resistance
-        #self.resistanceFactor = 1 # resistance already normalized
+    #-------------------------------------------------------------------
 
     def reset(self, life=1.0, picks=0, picks_entry=0):
-        """ Reset simulation parameters """
-        self.state = self.state_initial
-        self.life = life
-        self.picks = picks
-        self.picks_entry = picks_entry
-
-    def backupState(self):
-        """ Backup simulation parameters """
-        self.backup_state = self.state
-        self.backup_life = self.life
-        self.backup_picks = self.picks
-        self.backup_picks_entry = self.picks_entry
-
-    def backupState_restore(self):
-        """ Restore simulation parameters with backup """
-        self.state = self.backup_state
-        self.life = self.backup_life
-        self.picks = self.backup_picks
-        self.picks_entry = self.backup_picks_entry
+        """ Reset simulation parameters of all links """
+        self.state       = self.state_initial.copy()
+        self.life        = np.full(self.len, life, dtype=np.float64)
+        self.picks       = np.full(self.len, picks, dtype=np.int64)
+        self.picks_entry = np.full(self.len, picks_entry, dtype=np.int64)
+        self.recalc_stateIds()
+        self.update_resist_eff()
+
+    def reset_link(self, lid:int, life=1.0, picks=0, picks_entry=0):
+        """ Reset simulation parameters of a single link """
+        self.set_stateId(lid, self.state_initial[lid])
+        self.life[lid]        = life
+        self.picks[lid]       = picks
+        self.picks_entry[lid] = picks_entry
+        self.update_resist_eff(lid)
+
+    _cols_snapshot = ("state", "life", "picks", "picks_entry", "dir", "dir_from")
+
+    def get_snapshot(self) -> dict:
+        """ Copy of the mutable columns (dir too because of flipping) """
+        snap = { col: getattr(self, col).copy() for col in LinkTable._cols_snapshot }
+        snap["state_ids"] = { state: ids.copy() for state,ids in self.state_ids.items() }
+        return snap
+
+    def set_snapshot(self, snap:dict):
+        """ Copy back the columns in place, the snapshot can be restored again """
+        for col in LinkTable._cols_snapshot:
+            getattr(self, col)[:] = snap[col]
+        self.state_ids = { state: ids.copy() for state,ids in snap["state_ids"].items() }
+        self.dir_version += 1
+        self.update_resist_eff()
+
+    def recalc_stateIds(self):
+        """ Rebuild the state buckets from the state array """
+        self.state_ids : dict[int, set[int]] = {
+            state : set(np.flatnonzero(self.state == state).tolist()) for state in LINK_STATE_ENUM.all
+        }
+
+    def set_stateId(self, lid:int, state:int):
+        """ Set the state and move the link to its new state bucket """
+        self.state_ids[self.state[lid]].discard(lid)
+        self.state_ids[state].add(lid)
+        self.state[lid] = state
+
+    #-------------------------------------------------------------------
+
+    def set_broken(self, lid:int):
+        self.set_stateId(lid, LINK_STATE_ENUM.AIR)
+        self.life[lid] = 0
+        self.resist_eff[lid] = 0
+        #self.picks[lid] = 0
+
+    def flip_dir(self, lid:int):
+        self.dir[lid] *= -1
+        self.dir_version += 1
+        c1,c2 = self.key_cells[lid]
+        self.dir_from[lid] = c2 if self.dir_from[lid] == c1 else c1
+
+    def update_resistance(self):
+        self.resistance[:] = field_R_current().get2D_array(self.pos[:,0], self.pos[:,2])
+        self.set_resist_weight(self.resist_weight, force=True)
+
+    def set_area_factor(self, avg_area:float):
+        """ Area relative to the avg area, also kept as reciprocal to multiply instead of divide in the sim """
+        self.areaFactor[:] = self.area / avg_area
+        self.areaFactor_inv[:] = avg_area / self.area
+
+    def set_resist_weight(self, weight:float, force=False):
+        """ Update the cached resistance when the sim weight (or the field) changes """
+        if weight == self.resist_weight and not force: return
+        self.resist_weight = weight
+        self.resist_w = self.resistance * weight
+        self.update_resist_eff()
+
+    def update_resist_eff(self, lids=None):
+        """ Recalculate the effective resistance of some links (all by default), call it after modifying their life """
+        if lids is None:
+            self.resist_eff = np.maximum(self.life, 0.0) * self.resist_w
+            """ Resistance opposed by each link: dead links oppose none (but never negative) """
+        else:
+            self.resist_eff[lids] = np.maximum(self.life[lids], 0.0) * self.resist_w[lids]
+
+    def life_clamped(self, lids):
+        """ Get links life clamped [0,1] """
+        return np.clip(self.life[lids], 0, 1)
+
+class Link():
+    """ Thin view over a single row of the LinkTable, only kept for UI/debug
+        # NOTE:: pos/dir build a new Vector per access, avoid them in hot paths and read the table instead
+    """
+    __slots__ = ("table", "id")
+
+    def __init__(self, table: LinkTable, lid:int):
+        self.table : LinkTable = table
+        self.id    : int       = lid
+
+    def __eq__(self, other):
+        return isinstance(other, Link) and self.id == other.id and self.table is other.table
+    def __hash__(self):
+        return self.id
 
     def __str__(self):
         #a({self.area:.2f}), p({self.picks},{self.picks_entry}),
         if self.state == LINK_STATE_ENUM.WALL:
-            return f"W{self.key_cells[0]} entries({self.picks_entry}), dir{self.dir.to_tuple(2)}"
+            return f"W{self.key_cells[0]} entries({self.picks_entry}), dir{utils.vec3_to_string(self.table.dir[self.id])}"
         elif self.state == LINK_STATE_ENUM.AIR:
-            return f"A{self.key_cells} entries({self.picks_entry}), picks({self.picks}), dir{self.dir.to_tuple(2)}"
+            return f"A{self.key_cells} entries({self.picks_entry}), picks({self.picks}), dir{utils.vec3_to_string(self.table.dir[self.id])}"
         else:
-            #return f"K{self.key_cells}: life({self.life:.3f}), dir{self.dir.to_tuple(2)}"
+            #return f"K{self.key_cells}: life({self.life:.3f}), dir{utils.vec3_to_string(self.table.dir[self.id])}"
             return f"k{self.key_cells} life({self.life:.3f}), picks({self.picks})"
 
     #-------------------------------------------------------------------
 
-    def set_broken(self):
-        self.state = LINK_STATE_ENUM.AIR
-        self.life = 0
-        #self.picks = 0
+    @property
+    def key_cells(self) -> neigh_key_t:
+        return tuple(self.table.key_cells[self.id].tolist())
+    @property
+    def key_faces(self) -> neighFaces_key_t:
+        return tuple(self.table.key_faces[self.id].tolist())
 
-    def flip_dir(self):
-        self.dir = -self.dir
-        if self.dir_from == self.key_cells[0]:
-            self.dir_from = self.key_cells[1]
-        else:
-            self.dir_from = self.key_cells[0]
+    @property
+    def pos(self) -> Vector:
+        return Vector(self.table.pos[self.id])
+    @property
+    def dir(self) -> Vector:
+        return Vector(self.table.dir[self.id])
+    @property
+    def dir_from(self) -> int:
+        return int(self.table.dir_from[self.id])
 
-    def update_resistance(self):
-        self.resistance = field_R_current().get2D(self.pos.x, self.pos.z)
+    @property
+    def area(self) -> float:
+        return float(self.table.area[self.id])
+    @property
+    def areaFactor(self) -> float:
+        return float(self.table.areaFactor[self.id])
+    @property
+    def resistance(self) -> float:
+        return float(self.table.resistance[self.id])
 
-    def degrade(self, deg):
-        """ Degrade link life, no clamping """
-        self.life -= deg
+    @property
+    def state(self) -> int:
+        return int(self.table.state[self.id])
+    @property
+    def life(self) -> float:
+        return float(self.table.life[self.id])
+    @property
+    def picks(self) -> int:
+        return int(self.table.picks[self.id])
+    @property
+    def picks_entry(self) -> int:
+        return int(self.table.picks_entry[self.id])
 
     @property
     def life_clamped(self):
         """ Get link life clamped [0,1] """
         return min( max(self.life, 0), 1)
 
-    def clamp(self):
-        """ Clamp link life [0,1] """
-        self.life = self.life_clamped
-
     def key_cells_other(self, cell_id):
-        if self.key_cells[0] == cell_id:
-            return self.key_cells[1]
-        assert(self.key_cells[1] == cell_id)
-        return self.key_cells[0]
+        c1,c2 = self.key_cells
+        if c1 == cell_id:
+            return c2
+        assert(c2 == cell_id)
+        return c1
 
     def key_faces_other(self, face_id):
-        if self.key_faces[0] == face_id:
-            return self.key_faces[1]
-        assert(self.key_faces[1] == face_id)
-        return self.key_faces[0]
+        f1,f2 = self.key_faces
+        if f1 == face_id:
+            return f2
+        assert(f2 == face_id)
+        return f1
 
 #-------------------------------------------------------------------
 
 class MW_Links():
 
-    def __init__(self, cont: MW_Cont):
+    def __init__(self, cont: MW_ContBase):
         stats = getStats()
         self.initialized = False
         """ Set to true after succesfully computed the link map """
@@ -151,50 +273,76 @@ class MW_Links():
         self.cont = cont
         """ Shortcut to container """
 
+        self.table = LinkTable()
+        """ All links data as contiguous columns indexed by link id, use Link views only for UI/debug """
+        self.keys_id : dict[neigh_key_t, int] = dict()
+        """ Map from the sorted cells key to the link id """
+
         self.cells_graph = nx.Graph()
         """ Graph connecting the cells to find connected components, also adds walls with negative indices
             # NOTE:: edges for a given node are not returned sorted by face, use faceKey inside the link to get the actual face index
             # NOTE:: adding edges creates nodes, but added edges might swap the indices order! use getKey_swap to make sure
-            # NOTE:: removing nodes from the graphs takes all their edges too (use subgraphs)
+            # NOTE:: edges store the link id as "id"
         """
+        self.cells_links : list[list[tuple[int,int]]] = None
+        """ Static adjacency per cell id: pairs of the cell at the other end and the link id (walls included) """
 
         self.comps = []
         """ List of sets with connected components cells id """
-        self.comps_subgraph = nx.Graph()    # used to leave cells_graph untouched (edges get removed along nodes)
+        self.comps_label : np.ndarray = None
+        """ Index of the component in comps per cell id, -1 for non solid cells
+            # NOTE:: the comps graph is implicit: solid (or core) cells joined by solid links, so no graph to keep in sync
+        """
         self.comps_len = 1                  # initial expected
 
-        self.air_graph = nx.Graph()
-        """ Used to determine air bubbles inside the model """
-        self.air_comps = []
+        self.air_uf : UnionFindSets = None
+        """ Used to determine air bubbles inside the model: air cells and walls (nodes after the cells) joined by adjacency """
+        self.air_cell : np.ndarray = None
+        """ Mask of cells id already added to the air union-find """
         self.air_comps_len = 1
 
-        self.links_graph = nx.Graph()
-        """ Graph connecting links! Links connect with other links from adjacent faces from both cells """
-        self.external : list[Link] = list()
-        """ Dynamic list of external links: AIR/WALL to CELL, mainly used as entry points in the simulation """
-        self.internal : list[Link] = list()
-        """ Dynamic list of internal links: CELL to CELL, mainly used for rendering of the links """
-
-        # OPT:: maybe voro++ face normal/area is faster?
-        self.min_pos = Vector([INF_FLOAT]*3)
-        self.max_pos = Vector([-INF_FLOAT]*3)
-        self.min_area,  self.max_area, self.avg_area = INF_FLOAT, -INF_FLOAT, 1
-        self.min_resistance,  self.max_resistance, self.avg_resistance = INF_FLOAT, -INF_FLOAT, 1
+        self.links_neighs_ptr : np.ndarray = None
+        """ CSR offsets per link id into links_neighs, neighbours of lid are links_neighs[ptr[lid]:ptr[lid+1]] """
+        self.links_neighs : np.ndarray = None
+        """ CSR flat array of links id! Links connect with other links from adjacent faces from both cells """
+        self.frontier_internal : np.ndarray = None
+        """ Times each link id counts as internal, once per solid cell at its sides (e.g. solid links twice) """
+        self.frontier_external : np.ndarray = None
+        """ Mask of external links id, at most one solid side facing the air connected to the walls """
+        self.frontier_dirty_cells : set[int] = set()
+        self.frontier_dirty_links : set[int] = set()
+        """ Cells and links whose state changed since the last frontier recalc """
+        self.air_wall : np.ndarray = None
+        """ Mask of air cells id connected to the walls (not in a bubble) """
+        self._internal : list[int] = None
+        self._external : list[int] = None
+        self.external_sampler : SumTree = None
+        """ Entry weights indexed by link id (null for non external), set by the sim and updated on frontier recalc """
+        self.external_weights_fn = None
+
+        # FIRST loop to build the global dictionaries, the links props are gathered in bulk afterwards
+        # OPT:: the faces of each cell are read and transformed at once (foreach_get with meshes), only the keys are per face
+        faces_pos, faces_normal, faces_area = list(), list(), list()
+        faces_len = 0
+        links_face : list[int] = list()
+        """ Index of the face of each link id into the concatenated faces of all cells """
+        links_key, links_key_faces, links_dir_from, links_state = list(), list(), list(), list()
 
-        # FIRST loop to build the global dictionaries
         for idx_cell in cont.foundId:
             # skip deleted afterwards
             if idx_cell in cont.deletedId:
                 continue
 
-            # Will store some constant precalculated global data in the links
-            obj        = cont.cells_objs[idx_cell]
-            me         = cont.cells_meshes[idx_cell]
-            m_toWorld  = utils_trans.get_worldMatrix_unscaled(obj, update=True)
-            mn_toWorld = utils_trans.get_normalMatrix(m_toWorld)
+            # Will store some constant precalculated global data in the links (from meshes or voro cells)
+            cell_pos, cell_normal, cell_area = cont.getFaces_world(idx_cell)
+            faces_pos.append(cell_pos)
+            faces_normal.append(cell_normal)
+            faces_area.append(cell_area)
+            faces_offset = faces_len
+            faces_len += len(cell_area)
 
             # iterate all faces including asymmetry placeholders (missing cells already ignored with cont_foundId)
-            for idx_face, idx_neighCell in enumerate(cont.neighs[idx_cell]):
+            for idx_face, idx_neighCell in enumerate(cont.neighs.row(idx_cell)):
 
                 # skip asymmetric (already prefilled keys_perCell)
                 if idx_neighCell in CELL_ERROR_ENUM.all:
@@ -202,130 +350,107 @@ class MW_Links():
                 if idx_neighCell in cont.deletedId:
                     continue
 
-                # get link dir props
-                face: types.MeshPolygon = me.polygons[idx_face]
-                normal = mn_toWorld @ face.normal
-                # NOTE:: rotated normals may potentially have a length of 1.0 +- 1e-8 but not worth normalizing
-                #DEV.log_msg(f"face.normal {face.normal} (l: {face.normal.length}) -> world {normal} (l: {normal.length})", cut=False)
-
                 # skip aligned with z for debug model
-                if MW_Links.skip_dir_debugModel(normal):
+                if MW_Links.skip_dir_debugModel(cell_normal[idx_face]):
                     # could set IGNORED error idx but not worth it
                     continue
 
-                # get world props, some normalized afterwards
-                pos = m_toWorld @ face.center
-                area = face.area
-                resistance = field_R_current().get2D(pos.x, pos.z)
-
                 if idx_neighCell < 0:
-                    self.update_limits(pos, area, resistance)
-
                     # link to a wall, wont be repeated
                     key = (idx_neighCell, idx_cell)
                     key_faces = (idx_neighCell, idx_face)
-                    l = Link(key, key_faces, pos, normal, idx_cell, area, resistance, LINK_STATE_ENUM.WALL)
+                    state = LINK_STATE_ENUM.WALL
 
-                    # add to graphs and external
-                    self.cells_graph.add_edge(*key, l=l)
-                    #self.links_graph.add_node(key, l=l)
-                    self.external.append(l)
                     # also static cont maps
                     cont.keys_perWall[idx_neighCell].append(key)
-                    cont.keys_perCell[idx_cell][idx_face] = key
+                    cont.keys_perCell[idx_cell, idx_face] = key
 
                 else:
                     # internal link, check unique between cells (networkx works without swapping the key tho)
                     key,swap = self.getKey_swap(idx_cell, idx_neighCell)
-                    if self.cells_graph.has_edge(*key):
-                    #if self.links_graph.has_node(key):
+                    if key in self.keys_id:
                         continue
 
-                    # only taken into account once! otherwise skewed averages
-                    self.update_limits(pos, area, resistance)
-
-                    # build the link
-                    idx_neighFace = cont.neighs_faces[idx_cell][idx_face]
+                    # build the link, only taken into account once! otherwise skewed averages
+                    idx_neighFace = cont.neighs_faces[idx_cell, idx_face]
                     key_faces = self.getKey(idx_face, idx_neighFace, swap)
-                    l = Link(key, key_faces, pos, normal, idx_cell, area, resistance, LINK_STATE_ENUM.SOLID)
+                    state = LINK_STATE_ENUM.SOLID
 
-                    # add to graphs and internal
-                    self.cells_graph.add_edge(*key, l=l)
-                    #self.links_graph.add_node(key, l=l)
-                    self.internal.append(l)
                     # also static cont maps
-                    cont.keys_perCell[idx_cell][idx_face] = key
-                    cont.keys_perCell[idx_neighCell][idx_neighFace] = key
-
-
-        # count the links and calcualte averages
-        self.links_len = self.cells_graph.number_of_edges()
-        if self.links_len:
-            self.avg_area /= float(self.links_len)
-            self.avg_resistance /= float(self.links_len)
+                    cont.keys_perCell[idx_cell, idx_face] = key
+                    cont.keys_perCell[idx_neighCell, idx_neighFace] = key
+
+                # add to graphs
+                lid = len(links_face)
+                self.keys_id[key] = lid
+                self.cells_graph.add_edge(*key, id=lid)
+
+                links_face.append(faces_offset + idx_face)
+                links_key.append(key)
+                links_key_faces.append(key_faces)
+                links_dir_from.append(idx_cell)
+                links_state.append(state)
+
+        # gather the world props of the faces with links, some normalized afterwards
+        links_face = np.array(links_face, dtype=np.int64)
+        pos = np.concatenate(faces_pos).reshape(-1,3)[links_face] if faces_len else np.zeros((0,3))
+        normal = np.concatenate(faces_normal).reshape(-1,3)[links_face] if faces_len else np.zeros((0,3))
+        area = np.concatenate(faces_area)[links_face] if faces_len else np.zeros(0)
+        resistance = field_R_current().get2D_array(pos[:,0], pos[:,2])
+
+        # build the arrays, count the links and calculate limits and averages
+        self.table.build(links_key, links_key_faces, pos, normal, links_dir_from, area, resistance, links_state)
+        self.links_len = self.table.len
+        self.calc_limits()
 
         stats.logDt(f"created link map: {self.links_len}")
         DEV.log_msg(f"Pos limits: {utils.vec3_to_string(self.min_pos)}, {utils.vec3_to_string(self.max_pos)}", {"CALC", "LINKS", "LIMITS"}, cut=False)
         DEV.log_msg(f"Area limits: ({self.min_area:.2f},{self.max_area:.2f}) avg:{self.avg_area:.2f}", {"CALC", "LINKS", "LIMITS"}, cut=False)
         DEV.log_msg(f"Reistance limits: ({self.min_resistance:.2f},{self.max_resistance:.2f}) avg:{self.avg_resistance:.2f}", {"CALC", "LINKS", "LIMITS"}, cut=False)
 
-        # SECOND loop to aggregate the links neighbours, only need to iterate cont_foundId
-        for idx_cell in cont.foundId:
-            # skip deleted afterwards
-            if idx_cell in cont.deletedId:
-                continue
-
-            # the face id is not indexed by the order in edges_perCell, then use static cont map that includes missing ones
-            keys_perFace = cont.keys_perCell[idx_cell]
-            for idx_face,key in enumerate(keys_perFace):
-
-                # skip possible asymmetries
-                if key[0] in CELL_ERROR_ENUM.all:
-                    continue
-
-                # avoid recalculating link neighs, create a node in links_graph now
-                if self.links_graph.has_node(key):
-                    if "l" in self.links_graph.nodes[key]:
-                        continue
-                l : Link = self.cells_graph.edges[key]["l"]
-                self.links_graph.add_node(key, l=l)
-
-                # calculate area factor relative to avg area (avg wont be zero when there are links_graph.nodes)
-                l.areaFactor = l.area / self.avg_area
-                #l.resistanceFactor = l.resistance / self.avg_resistance
-
-                # no AIR links
-                if l.state == LINK_STATE_ENUM.WALL:
-                    # walls only add local faces from the same cell
-                    wf_neighs = cont.cells_meshes_FtoF[idx_cell][idx_face]
-                    w_neighs = [ keys_perFace[f] for f in wf_neighs ]
-                    self.add_links_neigs(key, w_neighs)
-
-                else:
-                    # regular links add both neigh faces from same and the other cell
-                    # extract idx and geometry faces neighs
-                    c1, c2 = l.key_cells
-                    f1, f2 = l.key_faces
-                    m1_neighs = cont.cells_meshes_FtoF[c1]
-                    m2_neighs = cont.cells_meshes_FtoF[c2]
-                    f1_neighs = m1_neighs[f1]
-                    f2_neighs = m2_neighs[f2]
-
-                    # the key is sorted, so query the keys per cell per each one
-                    c1_keys = cont.keys_perCell[c1]
-                    c2_keys = cont.keys_perCell[c2]
-                    c1_neighs = [ c1_keys[f] for f in f1_neighs ]
-                    c2_neighs = [ c2_keys[f] for f in f2_neighs ]
-                    self.add_links_neigs(key, c1_neighs + c2_neighs)
-
-        stats.logDt("aggregated link neighbours")
-
-        # initial components subgraph calculation
+        # calculate area factor relative to avg area (avg wont be zero when there are links)
+        self.table.set_area_factor(self.avg_area)
+        #self.table.resistanceFactor = self.table.resistance / self.avg_resistance
+
+        # SECOND loop to aggregate the links neighbours, link ids were created in the same cell/face order
+        # NOTE:: symmetric adjacency as ordered sets (dict keys) so the neighbour order is deterministic
+        links_adj : list[dict[int,None]] = [ dict() for lid in range(self.links_len) ]
+        for lid in range(self.links_len):
+            c1, c2 = self.table.key_cells[lid].tolist()
+            f1, f2 = self.table.key_faces[lid].tolist()
+
+            # no AIR links
+            if self.table.state_initial[lid] == LINK_STATE_ENUM.WALL:
+                # walls only add local faces from the same cell
+                wf_neighs = cont.cells_meshes_FtoF.row(c2, f2)
+                w_neighs = [ cont.keys_perCell[c2, f] for f in wf_neighs ]
+                self.add_links_neigs(links_adj, lid, w_neighs)
+
+            else:
+                # regular links add both neigh faces from same and the other cell
+                f1_neighs = cont.cells_meshes_FtoF.row(c1, f1)
+                f2_neighs = cont.cells_meshes_FtoF.row(c2, f2)
+
+                # the key is sorted, so query the keys per cell per each one
+                c1_neighs = [ cont.keys_perCell[c1, f] for f in f1_neighs ]
+                c2_neighs = [ cont.keys_perCell[c2, f] for f in f2_neighs ]
+                self.add_links_neigs(links_adj, lid, c1_neighs + c2_neighs)
+
+        # freeze the adjacency into CSR arrays
+        self.links_neighs_ptr, self.links_neighs = utils.csr_from_lists(links_adj)
+        stats.logDt(f"aggregated link neighbours: {len(self.links_neighs)} (CSR)")
+
+        # static cells adjacency read from the graph
+        adj = self.cells_graph.adj
+        self.cells_links = [ [ (c_other, d["id"]) for c_other,d in adj[idx].items() ] if idx in adj else list()
+                             for idx in range(len(cont.cells_state)) ]
+
+        # initial components calculation, the frontier starts empty
+        self.frontier_internal = np.zeros(self.links_len, dtype=np.int8)
+        self.frontier_external = np.zeros(self.links_len, dtype=bool)
+        self.air_wall = np.zeros(len(cont.cells_state), dtype=bool)
         self.comps_recalc()
 
-        #assert(len(list(self.cells_graph.edges)) == len(list(self.links_graph.nodes)))
-        #assert( { getKey_swap(k[0],k[1])[0] for k in self.cells_graph.edges } == set(self.links_graph.nodes))
-
         logType = {"CALC", "LINKS"}
 
         # init when found at least a link
@@ -334,28 +459,28 @@ class MW_Links():
             logType |= {"ERROR"}
         DEV.log_msg(f"Found {self.links_len} links: {int(len(self.internal)/2)} internal | {len(self.external)} external", logType)
 
-    def add_links_neigs(self, key, newNeighs):
-        #self.links_graph.add_edges_from(newNeighs)
+    def add_links_neigs(self, links_adj:list[dict[int,None]], lid:int, newNeighs:list[neigh_key_t]):
         for nn in newNeighs:
+            # skip possible asymmetries
             if nn[0] not in CELL_ERROR_ENUM.all:
-                self.links_graph.add_edge(key, nn)
-
-    def update_limits(self, pos, area, resistance):
-        # check min/max pos
-        if self.min_pos.x > pos.x: self.min_pos.x = pos.x
-        elif self.max_pos.x < pos.x: self.max_pos.x = pos.x
-        if self.min_pos.y > pos.y: self.min_pos.y = pos.y
-        elif self.max_pos.y < pos.y: self.max_pos.y = pos.y
-        if self.min_pos.z > pos.z: self.min_pos.z = pos.z
-        elif self.max_pos.z < pos.z: self.max_pos.z = pos.z
-        # area
-        self.avg_area += area
-        if self.min_area > area: self.min_area = area
-        elif self.max_area < area: self.max_area = area
-        # resist
-        self.avg_resistance += resistance
-        if self.min_resistance > resistance: self.min_resistance = resistance
-        elif self.max_resistance < resistance: self.max_resistance = resistance
+                lid_n = self.keys_id[nn]
+                links_adj[lid][lid_n] = None
+                links_adj[lid_n][lid] = None
+
+    def calc_limits(self):
+        """ Min/max/avg of some links props, averages stay at 1 without links """
+        self.min_pos = Vector([INF_FLOAT]*3)
+        self.max_pos = Vector([-INF_FLOAT]*3)
+        self.min_area,  self.max_area, self.avg_area = INF_FLOAT, -INF_FLOAT, 1
+        self.min_resistance,  self.max_resistance, self.avg_resistance = INF_FLOAT, -INF_FLOAT, 1
+        if not self.links_len:
+            return
+
+        t = self.table
+        self.min_pos = Vector(t.pos.min(axis=0))
+        self.max_pos = Vector(t.pos.max(axis=0))
+        self.min_area, self.max_area, self.avg_area = float(t.area.min()), float(t.area.max()), float(t.area.mean())
+        self.min_resistance, self.max_resistance, self.avg_resistance = float(t.resistance.min()), float(t.resistance.max()), float(t.resistance.mean())
 
     #-------------------------------------------------------------------
 
@@ -383,124 +508,313 @@ class MW_Links():
         return cleaned
 
     def comps_recalc(self, recalcGraph = True):
-        """ Recalc cell connected componentes, return true when new split """
+        """ Recalc cell connected componentes, return true when new split
+            * recalcGraph when the state could have changed anywhere (reset, sanitize...) so the frontier is fully rebuilt
+        """
         if self.log: DEV.log_msg(f"Recalc COMPS", {"COMPS"})
         prevLen = self.comps_len
 
-        # recalc subgraph
-        if recalcGraph:
-            self.comps_recalc_subgraph()
-        # OPT:: shared statemaps across methods, or keep uptodate
-        # OPT:: too much link/id interchange and requery too..
-
         # recount components
         self.comps_count()
         newSplit = prevLen != self.comps_len
         if newSplit:
             getStats().logDt(f"calculated COMPS: [new SPLIT] from {prevLen}")
 
+        # a new graph means the state could have changed anywhere
+        self.comps_recalc_split(newSplit, fullFrontier=recalcGraph)
+        return newSplit
+
+    def comps_recalc_split(self, newSplit:bool, fullFrontier=False):
+        """ Detach cells and recalc the frontier once the comps are counted """
         # potential detach of cells
         if newSplit and self.comps_len > 1:
             self.comps_detach_frontier()
             self.comps_count()
 
         # recalc frontier even for no new splits -> cells turned to AIR changes the front
-        self.comps_recalc_frontier()
-
-        return newSplit
+        self.comps_recalc_frontier(fullFrontier)
 
-    def comps_recalc_subgraph(self):
-        """ Recalculate component subgraph """
-        if self.log: DEV.log_msg(f"Recalc COMPS subgraph", {"COMPS"})
+    def comps_count(self):
+        """ Label the connected components with a flood fill over the implicit graph """
+        self.comps = []
+        self.comps_label = np.full(len(self.cont.cells_state), -1, dtype=np.int64)
 
-        # create a subgraph with no air, no missing cells and no additional walls
         stateMap = self.cont.getCells_splitID_state()
-        valid = stateMap[CELL_STATE_ENUM.SOLID] + stateMap[CELL_STATE_ENUM.CORE]
-        # copy the read only subgraph, cannot copy and remove because there are extra edges from virtual wall cells
-        self.comps_subgraph : nx.Graph = self.cells_graph.subgraph(valid).copy()
-
-        # remove missing links too
-        stateMap_links = self.get_link_splitID_state()
-        removed_links = stateMap_links[LINK_STATE_ENUM.AIR] # + stateMap_links[LINK_STATE_ENUM.WALL] already dropped with stateMap not AIR
-        self.comps_subgraph.remove_edges_from(removed_links)
-
-        ## TEST:: subgraphs
-        #stateMap = self.cont.getCells_splitID_state()
-        #air_graph : nx.Graph = self.cells_graph.subgraph(stateMap[CELL_STATE_ENUM.AIR]+self.cont.wallsId)
-        #comps = list(nx.connected_components(air_graph))
-        #stateMap_links = self.get_link_splitID_state()
-        #airlinks_subgraph_view : nx.Graph = self.links_graph.subgraph(stateMap_links[LINK_STATE_ENUM.WALL] + stateMap_links[LINK_STATE_ENUM.AIR])
-        #comps_links = list(nx.connected_components(airlinks_subgraph_view))
+        for cell_id in sorted(stateMap[CELL_STATE_ENUM.SOLID] | stateMap[CELL_STATE_ENUM.CORE]):
+            if self.comps_label[cell_id] != -1:
+                continue
+
+            comp_cells = {cell_id}
+            q = deque([cell_id])
+            while q:
+                for c in self.comps_neighs(q.popleft()):
+                    if c not in comp_cells:
+                        comp_cells.add(c)
+                        q.append(c)
+
+            self.comps_label[list(comp_cells)] = len(self.comps)
+            self.comps.append(comp_cells)
 
-    def comps_count(self):
-        self.comps = list(nx.connected_components(self.comps_subgraph))
         self.comps_len = len(self.comps)
         getStats().logDt(f"count COMPS: {self.comps_len}")
 
-    def comps_recalc_frontier(self):
-        """ Check new internal and external links, also changes cells state to air """
-        if self.log: DEV.log_msg(f"Recalc FRONT", {"COMPS"})
+    def comps_neighs(self, cell_id:int) -> list[int]:
+        """ Adjacent cells in the comps graph: through solid links and both solid (or core) """
+        cs = self.cont.cells_state
+        state = self.table.state
+        return [ c for c,lid in self.cells_links[cell_id] if c >= 0 and state[lid] == LINK_STATE_ENUM.SOLID and cs[c] in MW_Links._solid_states ]
+
+    def comps_split_check(self, c1:int, c2:int) -> bool:
+        """ Check if removing the edge c1-c2 split its component, relabels the smaller side when so
+            * bidirectional BFS alternating both sides: stops when the searches meet or a side is exhausted
+            * so the cost is bounded by the smaller side instead of the whole graph
+        """
+        cs = self.cont.cells_state
+        if c1 == c2 or c1 < 0 or cs[c1] not in MW_Links._solid_states or cs[c2] not in MW_Links._solid_states:
+            return False
+
+        seen = ({c1}, {c2})
+        queues = (deque([c1]), deque([c2]))
+        while True:
+            for side in (0, 1):
+                q, seen_side, seen_other = queues[side], seen[side], seen[1-side]
+
+                # exhausted side is a whole new component
+                if not q:
+                    self.comps_split(seen_side)
+                    return True
+
+                # expand a single cell per side and turn
+                for c in self.comps_neighs(q.popleft()):
+                    if c in seen_other:
+                        return False
+                    if c not in seen_side:
+                        seen_side.add(c)
+                        q.append(c)
+
+    def comps_split(self, cells:set[int]):
+        """ Move the cells to a new component appended at the end """
+        old = self.comps_label[next(iter(cells))]
+        self.comps[old] -= cells
+        self.comps_label[list(cells)] = len(self.comps)
+        self.comps.append(cells)
+        self.comps_len = len(self.comps)
 
-        self.internal.clear()
-        self.external.clear()
+    def comps_recalc_frontier(self, full=False):
+        """ Update internal and external links, only the ones touched by the cells/links marked dirty unless full """
+        if self.log: DEV.log_msg(f"Recalc FRONT" + (" (full)" if full else ""), {"COMPS"})
+
+        # track air connected to the walls -> detecting air bubbles
+        # cells that joined or left the walls air affect their links too
+        air_changed = []
+        if not DEV.SKIP_BUBBLE_CHECK:
+            if full or self.air_uf is None or self.air_check_rebuild():
+                air_wall_prev = self.air_wall
+                self.air_recalc()
+                air_changed = np.flatnonzero(self.air_wall != air_wall_prev).tolist()
+            else:
+                for cell_id in self.frontier_dirty_cells:
+                    if self.cont.cells_state[cell_id] == CELL_STATE_ENUM.AIR:
+                        air_changed += self.air_add_cell(cell_id)
+
+        if full:
+            lids = np.arange(self.links_len)
+        else:
+            touched = set(self.frontier_dirty_links)
+            for cell_id in itertools.chain(self.frontier_dirty_cells, air_changed):
+                touched.update(self.get_cell_linksId(cell_id))
+            lids = np.fromiter(touched, dtype=np.int64, count=len(touched))
+
+        self.frontier_dirty_cells.clear()
+        self.frontier_dirty_links.clear()
+        self.frontier_update(lids)
+        if full and self.external_sampler is not None:
+            self.external_sampler.rebuild()
+
+        # verification mode: compare against the full rebuild
+        if DEV.DEBUG_FRONTIER_CHECK and not full:
+            if not DEV.SKIP_BUBBLE_CHECK:
+                air_wall = self.air_wall
+                self.air_recalc()
+                assert (air_wall == self.air_wall).all()
+            lids_all = np.arange(self.links_len)
+            internal, external = self.frontier_calc(lids_all)
+            assert (internal == self.frontier_internal).all() and (external == self.frontier_external).all()
+
+    def frontier_update(self, lids:np.ndarray):
+        """ Recalculate the frontier of the links given, also updating the entry sampler with the changes """
+        if not len(lids):
+            return
+        internal, external = self.frontier_calc(lids)
+        external_prev = self.frontier_external[lids]
+        self.frontier_internal[lids] = internal
+        self.frontier_external[lids] = external
+
+        # invalidate the lists built from the arrays
+        self._internal = self._external = None
+        self.external_sampler_update(lids[external & ~external_prev], lids[external_prev & ~external])
+
+    def frontier_calc(self, lids:np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """ Internal count and external mask of the links given, from their state and their cells state """
+        t = self.table
+        cs = self.cont.cells_state
+        c1 = t.key_cells[lids, 0]
+        c2 = t.key_cells[lids, 1]
+        solid = t.state[lids] == LINK_STATE_ENUM.SOLID
+
+        # walls have negative id and there is no cell associated, but they are always connected to the outside air
+        wall1 = c1 < 0
+        s1 = np.fromiter(( c >= 0 and cs[c] in MW_Links._solid_states for c in c1.tolist() ), dtype=bool, count=len(lids))
+        s2 = np.fromiter(( cs[c] in MW_Links._solid_states for c in c2.tolist() ), dtype=bool, count=len(lids))
 
         if DEV.SKIP_BUBBLE_CHECK:
-            # all solid are internal
-            stateMap_links = self.get_link_split_state()
-            self.internal = stateMap_links[LINK_STATE_ENUM.SOLID]
-            # external pick only the ones with at least a solid at the other side
-            for l in stateMap_links[LINK_STATE_ENUM.WALL] + stateMap_links[LINK_STATE_ENUM.AIR]:
-                if self.solid_link_check(l):
-                    self.external.append(l)
+            # all solid are internal (once), external pick only the ones with at least a solid at the other side
+            internal = solid.astype(np.int8)
+            external = ~solid & (s1 | s2)
 
         else:
-            # build air graph connecting all external walls -> detecting air bubbles
-            stateMap = self.cont.getCells_splitID_state()
-            self.air_recalc_graph(stateMap)
-            self.air_comps_count()
-
-            # iterate solid cells split their link by state (contain the frontier)
-            solids = stateMap[CELL_STATE_ENUM.SOLID] + stateMap[CELL_STATE_ENUM.CORE]
-            for cell_id in solids:
-                links = self.get_cell_links(cell_id)
-                for l in links:
-                    if l.state == LINK_STATE_ENUM.SOLID:
-                        self.internal.append(l)
-                    else:
-                        # check that the component of the air link is the same as wall comp id
-                        cell_id_other = l.key_cells_other(cell_id)
-                        if cell_id_other in self.air_comps[self.air_comps_wall_id]:
-                            self.external.append(l)
-                        else:
-                            self.internal.append(l) # internal broken link in a bubble!
-
-    def air_recalc_graph(self, stateMap):
-        self.air_graph = nx.Graph()
-        self.air_graph.add_edges_from( self.cont.wallsId_edges )
-
-        # now add air links and connect only the valid edges
-        self.air_graph.add_nodes_from( stateMap[CELL_STATE_ENUM.AIR] )
-        for cell_id in stateMap[CELL_STATE_ENUM.AIR]:
-            links = self.get_cell_linksKeys(cell_id)
-            for lk in links:
-                if self.air_graph.has_node(lk[0]) and self.air_graph.has_node(lk[1]):
-                    self.air_graph.add_edge(*lk)
-
-    def air_comps_count(self):
-        self.air_comps = list(nx.connected_components(self.air_graph))
-        self.air_comps_len = len(self.air_comps)
-
-        # find wall comp
-        self.air_comps_wall_id = -1
-        sampleWall = self.cont.wallsId[0]
-        for i,comp in enumerate(self.air_comps):
-            if sampleWall in comp:
-                self.air_comps_wall_id = i
-                break
-        assert(self.air_comps_wall_id != -1)
+            # solid links are internal from both sides, the rest depend on the air comp at the other side
+            w1 = wall1 | self.air_wall[np.maximum(c1, 0)]
+            w2 = self.air_wall[c2]
+            internal = np.where(solid, s1.astype(np.int8) + s2, (s1 & ~w2).astype(np.int8) + (s2 & ~w1))
+            external = ~solid & ((s1 & w2) | (s2 & w1)) # otherwise internal broken link in a bubble!
+
+        return internal.astype(np.int8), external
+
+    _solid_states = (CELL_STATE_ENUM.SOLID, CELL_STATE_ENUM.CORE)
+
+    @property
+    def internal(self) -> list[int]:
+        """ Internal links id: CELL to CELL (repeated per solid cell), mainly used for rendering of the links """
+        if self._internal is None:
+            self._internal = np.repeat(np.arange(self.links_len), self.frontier_internal).tolist()
+        return self._internal
+
+    @property
+    def external(self) -> list[int]:
+        """ External links id: AIR/WALL to CELL, mainly used as entry points in the simulation """
+        if self._external is None:
+            self._external = np.flatnonzero(self.frontier_external).tolist()
+        return self._external
+
+    def external_sampler_set(self, weights_fn):
+        """ Build the entry sampler with the weights of the current external links (fn from an array of id to weights) """
+        self.external_weights_fn = weights_fn
+        weights = np.zeros(self.links_len, dtype=np.float64)
+        external = np.flatnonzero(self.frontier_external)
+        if len(external):
+            weights[external] = weights_fn(external)
+        self.external_sampler = SumTree.from_weights(weights)
+
+    def get_snapshot(self) -> dict:
+        """ Copy of all the mutable state: links table, comps, frontier and air """
+        return {
+            "table"             : self.table.get_snapshot(),
+            "comps"             : [ comp_cells.copy() for comp_cells in self.comps ],
+            "comps_label"       : self.comps_label.copy(),
+            "frontier_internal" : self.frontier_internal.copy(),
+            "frontier_external" : self.frontier_external.copy(),
+            "air_cell"          : self.air_cell.copy() if self.air_cell is not None else None,
+            "air_wall"          : self.air_wall.copy(),
+            "air_comps_len"     : self.air_comps_len,
+            "external_sampler"  : self.external_sampler.copy() if self.external_sampler else None,
+        }
+
+    def set_snapshot(self, snap:dict):
+        """ Restore the state by copying arrays, no graph or component recalculation
+            * the cells state should be restored beforehand (cont snapshot)
+        """
+        self.table.set_snapshot(snap["table"])
+        self.comps = [ comp_cells.copy() for comp_cells in snap["comps"] ]
+        self.comps_len = len(self.comps)
+        self.comps_label[:] = snap["comps_label"]
+
+        self.frontier_internal[:] = snap["frontier_internal"]
+        self.frontier_external[:] = snap["frontier_external"]
+        self.frontier_dirty_cells.clear()
+        self.frontier_dirty_links.clear()
+        self._internal = self._external = None
+
+        # the air union-find is lazily rebuilt on the next frontier recalc
+        self.air_uf = None
+        self.air_cell = snap["air_cell"].copy() if snap["air_cell"] is not None else None
+        self.air_wall[:] = snap["air_wall"]
+        self.air_comps_len = snap["air_comps_len"]
+
+        # the sampler is only valid for the same weights fn (checked by the sim)
+        if snap["external_sampler"] and self.external_sampler:
+            self.external_sampler = snap["external_sampler"].copy()
+        else:
+            self.external_sampler = None
+
+    def external_sampler_update(self, added:np.ndarray, removed:np.ndarray):
+        if self.external_sampler is None:
+            return
+
+        for lid in removed.tolist():
+            self.external_sampler.update(lid, 0.0)
+        if len(added):
+            for lid, w in zip(added.tolist(), self.external_weights_fn(added).tolist()):
+                self.external_sampler.update(lid, w)
+
+    def air_recalc(self):
+        """ Rebuild the air union-find from scratch with all the walls joined """
+        cells_len = len(self.cont.cells_state)
+        self.air_walls_node = { w: cells_len+i for i,w in enumerate(self.cont.wallsId) }
+        self.air_uf = UnionFindSets(cells_len + len(self.air_walls_node))
+        for w1,w2 in self.cont.wallsId_edges:
+            self.air_uf.union(self.air_walls_node[w1], self.air_walls_node[w2])
+        self.air_root_node = self.air_walls_node[self.cont.wallsId[0]]
+
+        # now add air cells and connect them with the walls and other air cells
+        self.air_cell = np.zeros(cells_len, dtype=bool)
+        self.air_wall = np.zeros(cells_len, dtype=bool)
+        self.air_comps_len = 1
+        stateMap = self.cont.getCells_splitID_state()
+        for cell_id in sorted(stateMap[CELL_STATE_ENUM.AIR]):
+            self.air_add_cell(cell_id)
 
         getStats().logDt(f"count AIR COMPS: {self.air_comps_len}")
 
+    def air_check_rebuild(self) -> bool:
+        """ Cells can only be added incrementally, so any dirty cell that stopped being air requires a rebuild """
+        for cell_id in self.frontier_dirty_cells:
+            if self.air_cell[cell_id] and self.cont.cells_state[cell_id] != CELL_STATE_ENUM.AIR:
+                return True
+        return False
+
+    def air_add_cell(self, cell_id:int) -> list[int]:
+        """ Merge a new air cell with the adjacent air cells and walls, returns the cells that got connected to the walls """
+        if self.air_cell[cell_id]:
+            return []
+        self.air_cell[cell_id] = True
+        self.air_comps_len += 1
+
+        nodes = [cell_id]
+        for cell_id_other, lid in self.get_cell_linksNeighId(cell_id):
+            if cell_id_other < 0:
+                nodes.append(self.air_walls_node[cell_id_other])
+            elif self.air_cell[cell_id_other]:
+                nodes.append(cell_id_other)
+
+        # bubbles merged (not connected to the walls yet)
+        uf = self.air_uf
+        root_wall = uf.find_parent(self.air_root_node)
+        roots = { uf.find_parent(n) for n in nodes }
+        roots_bubbles = [ r for r in roots if r != root_wall ]
+        joined = len(roots_bubbles) != len(roots)
+
+        # bubbles connected to the walls, members gathered before the roots merge
+        changed = []
+        if joined:
+            changed = list(itertools.chain.from_iterable(uf.members[r] for r in roots_bubbles))
+            self.air_wall[changed] = True
+
+        self.air_comps_len -= len(roots)-1
+        for n in nodes[1:]:
+            uf.union(cell_id, n)
+        return changed
+
     def comps_detach_frontier(self):
         if self.log: DEV.log_msg(f"Recalc DETACH", {"COMPS"})
 
@@ -532,7 +846,8 @@ class MW_Links():
 
         # otherwise remove the smaller candidate
         else:
-            candidates = sorted(candidates, key=len)
+            # NOTE:: ties broken by the lowest cell id, so the result does not depend on the comps order
+            candidates = sorted(candidates, key=lambda c: (len(c), min(c)))
             new_air_cells = list(itertools.chain.from_iterable(candidates[:-1]))
 
         # set links as air which will trigger link removeal etc
@@ -540,9 +855,9 @@ class MW_Links():
 
     #-------------------------------------------------------------------
 
-    def solid_link_check(self, l):
+    def solid_link_check(self, lid:int):
         """ Check if any of the referenced cells is solid (or core) """
-        c1,c2 = l.key_cells
+        c1,c2 = self.table.key_cells[lid].tolist()
 
         # the second ID is always a cell ID
         s2 = self.cont.cells_state[c2]
@@ -550,55 +865,67 @@ class MW_Links():
             return True
 
         # walls have negative id and there is no cell associated, so s1 only check for non walls
-        if l.state != LINK_STATE_ENUM.WALL:
+        if self.table.state[lid] != LINK_STATE_ENUM.WALL:
             s1 = self.cont.cells_state[c1]
             if s1 != CELL_STATE_ENUM.AIR:
                 return True
 
         return False
 
-    def setState_link_check(self, key, state:LINK_STATE_ENUM, recalc=True):
+    def solid_link_check_arr(self, lids:np.ndarray, cells_state:np.ndarray) -> np.ndarray:
+        """ Vectorized solid_link_check given the cells state as an array, returns a bool mask """
+        c1 = self.table.key_cells[lids, 0]
+        c2 = self.table.key_cells[lids, 1]
+
+        # walls have negative id so clamp the index and ignore the s1 check for them
+        s1 = cells_state[np.maximum(c1, 0)] != CELL_STATE_ENUM.AIR
+        s1 &= self.table.state[lids] != LINK_STATE_ENUM.WALL
+        s2 = cells_state[c2] != CELL_STATE_ENUM.AIR
+        return s1 | s2
+
+    def setState_link_check(self, lid:int, state:LINK_STATE_ENUM, recalc=True):
         """ Set state, modify graph, returns True when recalc """
-        if self.log: DEV.log_msg(f"Check link AIR {key}", {"COMPS", "LINK"})
-        l = self.get_link(key)
+        t = self.table
+        if self.log: DEV.log_msg(f"Check link AIR {lid}", {"COMPS", "LINK"})
 
         # ignore already set
-        if l.state == state:
+        l_state = t.state[lid]
+        if l_state == state:
             return False
+        c1,c2 = t.key_cells[lid].tolist()
+        self.frontier_dirty_links.add(lid)
 
         # broke the link? change graph etc
         if state == LINK_STATE_ENUM.AIR:
             # ignore walls and break solid links
-            if l.state == LINK_STATE_ENUM.WALL:
+            if l_state == LINK_STATE_ENUM.WALL:
                 return False
-            l.set_broken()
-
-            # remove link edges, alredy removed when coming from an setState_cell_check
-            self.comps_subgraph.remove_edges_from([l.key_cells])
+            t.set_broken(lid)
 
             # potentially flip normals so than visualization goes towards outside
-            if self.cont.cells_state[l.dir_from] != CELL_STATE_ENUM.SOLID:
-                l.flip_dir()
+            if self.cont.cells_state[t.dir_from[lid]] != CELL_STATE_ENUM.SOLID:
+                t.flip_dir(lid)
 
         # link back to solid
         else:
             # reset even wall links (number of picks), but for those nothing else to do
-            l.reset()
-            if l.state == LINK_STATE_ENUM.WALL:
+            t.reset_link(lid)
+            if l_state == LINK_STATE_ENUM.WALL:
                 return False
 
-            # readd the link, cells should be added beforehand
-            self.comps_subgraph.add_edges_from([l.key_cells])
-
         breaking = False
         if recalc:
             # recalc on link break only when a path between cells ceases to exist
-            c1,c2 = l.key_cells
-            if DEV.SKIP_PATH_CHECK: breaking = True
-            else: breaking = not nx.has_path(self.comps_subgraph, c1, c2)
-            if breaking:
+            if DEV.SKIP_PATH_CHECK:
+                breaking = True
                 self.comps_recalc(False)
 
+            # the split check already relabels the comps, so skip the full count
+            elif self.comps_split_check(c1, c2):
+                breaking = True
+                getStats().logDt(f"calculated COMPS: [new SPLIT] to {self.comps_len}")
+                self.comps_recalc_split(True)
+
         return breaking
 
     def setState_cell_check(self, idx, state:CELL_STATE_ENUM, recalc = True):
@@ -610,20 +937,19 @@ class MW_Links():
         if cell_state == state:
             return False
         self.cont.setCell_state(idx, state)
+        self.frontier_dirty_cells.add(idx)
 
         # cell to air? change graph and also set the links
         if state == CELL_STATE_ENUM.AIR:
-            # remove cell and attached link
-            self.comps_subgraph.remove_nodes_from([idx]) # direcly removes edges tho
-            for key in self.get_cell_linksKeys(idx):
-                self.setState_link_check(key, LINK_STATE_ENUM.AIR, False)
+            # break the attached links
+            for lid in self.get_cell_linksId(idx):
+                self.setState_link_check(lid, LINK_STATE_ENUM.AIR, False)
 
         # cell back to solid
         else:
-            # add cell back and recover links
-            self.comps_subgraph.add_nodes_from([idx])
-            for key in self.get_cell_linksKeys(idx):
-                self.setState_link_check(key, LINK_STATE_ENUM.SOLID, False)
+            # recover links
+            for lid in self.get_cell_linksId(idx):
+                self.setState_link_check(lid, LINK_STATE_ENUM.SOLID, False)
 
         if recalc:
             self.comps_recalc(False)
@@ -634,59 +960,58 @@ class MW_Links():
         for idx in idx_list:
             self.setState_cell_check(idx, state, False)
 
-        # recalc without building the graph as setState_cell_check already removes/adds missing nodes
+        # recalc without the full frontier, setState_cell_check already marks the cells dirty
         if recalc_afterAll:
             self.comps_recalc(False)
 
     #-------------------------------------------------------------------
 
+    def get_linkId(self, key:neigh_key_t) -> int:
+        return self.keys_id[key]
     def get_link(self, key:neigh_key_t) -> Link:
-        return self.links_graph.nodes[key]["l"]
-    def get_links(self, keys:list[neigh_key_t]) -> list [Link]:
-        return [self.links_graph.nodes[k]["l"] for k in keys ]
-
-    def get_link_neighsId(self, key:neigh_key_t) -> list[neigh_key_t]:
-        """ The links neighs ID unordered by face or anything """
-        return list(self.links_graph.neighbors(key))
-    def get_link_neighs(self, key:neigh_key_t) -> list[Link]:
+        return Link(self.table, self.keys_id[key])
+    def get_links(self, keys:list[neigh_key_t]) -> list[Link]:
+        return [ Link(self.table, self.keys_id[k]) for k in keys ]
+
+    def get_link_fromId(self, lid:int) -> Link:
+        return Link(self.table, lid)
+    def get_links_fromId(self, lids:list[int]) -> list[Link]:
+        return [ Link(self.table, lid) for lid in lids ]
+
+    def get_link_neighsId(self, lid:int) -> np.ndarray:
+        """ The links neighs ID unordered by face or anything, a read only view (slice) of the CSR array """
+        return self.links_neighs[self.links_neighs_ptr[lid]:self.links_neighs_ptr[lid+1]]
+    def get_link_neighs(self, lid:int) -> list[Link]:
         """ The links neighs unordered by face or anything """
-        return [ self.get_link(k) for k in self.get_link_neighsId(key) ]
+        return self.get_links_fromId(self.get_link_neighsId(lid))
+
+    def get_cell_linksKeys(self, idx:int) -> list[neigh_key_t]:
+        """ The links keys from a given cell with properly sorted keys """
+        return [ self.getKey_swap(idx, c_other)[0] for c_other,_ in self.cells_links[idx] ]
 
-    def get_cell_linksKeys(self, idx:int) -> list[Link]:
-        """ The links ID from a given cell with properly sorted keys """
-        return [ self.getKey_swap(k[0],k[1])[0] for k in self.cells_graph.edges(idx) ]
+    def get_cell_linksId(self, idx:int) -> list[int]:
+        """ The links ID from a given cell """
+        return [ lid for _,lid in self.cells_links[idx] ]
+
+    def get_cell_linksNeighId(self, idx:int) -> list[tuple[int,int]]:
+        """ The links ID from a given cell paired with the cell at the other end (stored list, read only) """
+        return self.cells_links[idx]
 
     def get_cell_links(self, idx:int) -> list[Link]:
         """ The links from a given cell """
-        return self.get_links(self.get_cell_linksKeys(idx))
+        return self.get_links_fromId(self.get_cell_linksId(idx))
 
-    def get_link_splitID_state(self):
-        """ Split links ID by state
-            # OPT:: store and only update?
-        """
-        stateMap = {
-            state : [] for state in LINK_STATE_ENUM.all
-        }
-
-        for key in self.links_graph.nodes():
-            l = self.get_link(key)
-            stateMap[l.state].append(key)
+    def get_link_splitID_state(self) -> dict[int, set[int]]:
+        """ Split links id by state, returns the stored index so treat the sets as read only """
+        return self.table.state_ids
 
-        return stateMap
+    def get_link_count_state(self, state:int) -> int:
+        return len(self.table.state_ids[state])
 
     def get_link_split_state(self):
-        """ Split links by state
-            # OPT:: store and only update? + same code almost
-        """
-        stateMap = {
-            state : [] for state in LINK_STATE_ENUM.all
-        }
-
-        for key in self.links_graph.nodes():
-            l = self.get_link(key)
-            stateMap[l.state].append(l)
-
-        return stateMap
+        """ Split links by state """
+        stateMap = self.get_link_splitID_state()
+        return { state: self.get_links_fromId(lids) for state, lids in stateMap.items() }
 
     #-------------------------------------------------------------------
 
@@ -706,10 +1031,11 @@ class MW_Links():
     @staticmethod
     def skip_dir_debugModel(d:Vector):
         if DEV.DEBUG_MODEL:
-            return utils_trans.aligned(d, VECTORS.backY, bothDir=True)
+            from .utils_trans import aligned, VECTORS
+            return aligned(Vector(d), VECTORS.backY, bothDir=True)
         return False
     @staticmethod
     def skip_link_debugModel(l:Link):
         if DEV.DEBUG_MODEL:
             return MW_Links.skip_dir_debugModel(l.dir)
-        return False
\ No newline at end of file
+        return False
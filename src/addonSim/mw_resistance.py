@@ -1,23 +1,39 @@
 from math import sin,cos
-from .preferences import getPrefs
+import numpy as np
 # HACK:: simple way to avoid circular import
 #from .properties import MW_resistance_cfg
 
 # OPT:: edit from UI or plot in notebook?
 #-------------------------------------------------------------------
 
+_resist_cfg = None
+""" Config set by the headless core (mw_core), otherwise read from the addon preferences """
+
+def set_cfg(cfg):
+    global _resist_cfg
+    _resist_cfg = cfg
+    field_R_current_switch()
+
+def get_cfg():
+    if _resist_cfg is not None:
+        return _resist_cfg
+    # preferences require blender so only imported when running as addon
+    from .preferences import getPrefs
+    return getPrefs().resist_cfg
+
 def user_in_cfg(x,y):
     #cfg : MW_resistance_cfg = getPrefs().resist_cfg
-    cfg = getPrefs().resist_cfg
-    if cfg.in_flipX: x *= -1
-    if cfg.in_flipY: y *= -1
+    cfg = get_cfg()
+    # NOTE:: not in place, the arrays version receives views of the links positions
+    if cfg.in_flipX: x = -x
+    if cfg.in_flipY: y = -y
     return x,y
 
 def user_out_cfg(r):
     #cfg : MW_resistance_cfg = getPrefs().resist_cfg
-    cfg = getPrefs().resist_cfg
+    cfg = get_cfg()
     if cfg.out_inv: r = 1-r
-    if cfg.out_round: r = round(r)
+    if cfg.out_round: r = np.round(r) if isinstance(r, np.ndarray) else round(r)
     return r
 
 class LAYERS_SIDE:
@@ -26,6 +42,12 @@ class LAYERS_SIDE:
         r = sin(-1 * x + 0.5 * y)
         r = (0.5 * r + 0.5) # normalize
         return user_out_cfg(r)
+    def get2D_array(x:np.ndarray, y:np.ndarray) -> np.ndarray:
+        """ Same as get2D for arrays of coordinates """
+        x,y = user_in_cfg(x,y)
+        r = np.sin(-1 * x + 0.5 * y)
+        r = (0.5 * r + 0.5) # normalize
+        return user_out_cfg(r)
 
 class LAYERS_STACK:
     def get2D(x, y):
@@ -33,6 +55,12 @@ class LAYERS_STACK:
         r = sin(1 * y + -0.15 * x)
         r = (0.5 * r + 0.5) # normalize
         return user_out_cfg(r)
+    def get2D_array(x:np.ndarray, y:np.ndarray) -> np.ndarray:
+        """ Same as get2D for arrays of coordinates """
+        x,y = user_in_cfg(x,y)
+        r = np.sin(1 * y + -0.15 * x)
+        r = (0.5 * r + 0.5) # normalize
+        return user_out_cfg(r)
 
 class POCKETS:
     def get2D(x, y):
@@ -40,6 +68,12 @@ class POCKETS:
         r = sin(x) + cos(y)
         r = (r+2.0) / 4.0 # normalize
         return user_out_cfg(r)
+    def get2D_array(x:np.ndarray, y:np.ndarray) -> np.ndarray:
+        """ Same as get2D for arrays of coordinates """
+        x,y = user_in_cfg(x,y)
+        r = np.sin(x) + np.cos(y)
+        r = (r+2.0) / 4.0 # normalize
+        return user_out_cfg(r)
 
 # field selector
 _fields_map = {
@@ -51,7 +85,7 @@ _field_R_current = LAYERS_SIDE
 
 def field_R_current_switch():
     global _field_R_current, _fields_map
-    cfg = getPrefs().resist_cfg
+    cfg = get_cfg()
     names = cfg.field.copy()
     field_name = names.pop()
     _field_R_current = _fields_map[field_name]
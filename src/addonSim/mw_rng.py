@@ -0,0 +1,60 @@
+import numpy as np
+from itertools import accumulate
+from bisect import bisect
+from math import isfinite
+
+
+#-------------------------------------------------------------------
+
+class MW_Rng:
+    """ Counter based random streams of the simulation (numpy Philox generator)
+        * the key is the seed (plus the seed mod), every infiltration draws from its own stream given by its step id
+        * so a step only depends on the seed, its id and the state: resumed, undone or parallel runs reproduce the serial one
+        * the serial steps consume single values from a small pre-drawn block, the batched ones use the generator directly
+    """
+    STREAM_STEP = 0
+    STREAM_BATCH = 1
+    BLOCK = 32
+
+    def __init__(self, seed: int, seed_mod: int = 0):
+        self.seed = seed
+        self.seed_mod = seed_mod
+        self.bitgen = np.random.Philox(key=[seed % 2**64, seed_mod % 2**64])
+        self.gen = np.random.Generator(self.bitgen)
+
+        # the state dict is reused to jump between streams, cheaper than building a new generator
+        self._state = self.bitgen.state
+        self._block : list[float] = []
+        self._block_pos = 0
+
+    def stream(self, step_id: int, kind: int = STREAM_STEP) -> np.random.Generator:
+        """ Move the generator to the start of the stream of a step, each one has 2^66 values before overlapping the next """
+        st = self._state
+        st["state"]["counter"] = np.array([0, step_id, kind, 0], dtype=np.uint64)
+        st["buffer_pos"] = 4
+        st["has_uint32"] = st["uinteger"] = 0
+        self.bitgen.state = st
+        self._block = []
+        self._block_pos = 0
+        return self.gen
+
+    def begin(self, step_id: int):
+        """ Start the stream of a serial step """
+        self.stream(step_id)
+
+    def random(self) -> float:
+        """ Next uniform [0,1) of the current stream """
+        if self._block_pos == len(self._block):
+            self._block = self.gen.random(self.BLOCK).tolist()
+            self._block_pos = 0
+        u = self._block[self._block_pos]
+        self._block_pos += 1
+        return u
+
+    def choice(self, weights: list[float]) -> int:
+        """ Index sampled by weight, same algorithm as random.choices (raises ValueError when the total is not positive) """
+        cum = list(accumulate(weights))
+        total = cum[-1] if cum else 0.0
+        if not total > 0.0 or not isfinite(total):
+            raise ValueError("MW_Rng: total of weights must be greater than zero")
+        return bisect(cum, self.random() * total, 0, len(cum)-1)
@@ -399,20 +399,31 @@ def gen_linksMesh(fract: MW_Fract, root: types.Object, context: types.Context):
         k1_k2 : list[tuple[int,int]]          = [None]*numLinks
         f1_f2 : list[tuple[int,int]]          = [None]*numLinks
 
+    # read the columns of the links table in bulk
+    t = fract.links.table
+    lids = fract.links.internal
+    lids_pos = t.pos[lids].tolist()
+    lids_dir = t.dir[lids].tolist()
+    lids_life = t.life_clamped(lids).tolist()
+    lids_picks = t.picks[lids].tolist()
+    lids_key_cells = t.key_cells[lids].tolist()
+    lids_key_faces = t.key_faces[lids].tolist()
+
     # iterate the global map and store vert pairs for the tube mesh generation
-    for id, l in enumerate(fract.links.internal):
+    for id in range(numLinks):
         id_normalized = id / float(numLinks) if not DEV.DEBUG_GEODATA_ID_RAW else id
+        key_cells, key_faces = tuple(lids_key_cells[id]), tuple(lids_key_faces[id])
 
         # original center
-        points[id]= l.pos
+        points[id]= Vector(lids_pos[id])
 
         # point from face to face
-        p1,p2 = fract.cont.getFaces_pos(l.key_cells, l.key_faces)
+        p1,p2 = fract.cont.getFaces_pos(key_cells, key_faces)
 
         # pick a valid normal
         pdir : Vector= p2-p1
         if utils_trans.almostNull(pdir):
-            pdir = l.dir
+            pdir = Vector(lids_dir[id])
         else:
             pdir.normalize()
 
@@ -422,7 +433,7 @@ def gen_linksMesh(fract: MW_Fract, root: types.Object, context: types.Context):
         verts[id]= (p1, p2)
 
         # lerp the width
-        life = l.life_clamped
+        life = lids_life[id]
         if cfg.links_width__mode == {"UNIFORM"}:
             lifeWidths[id]= cfg.links_width_broken * (1-life) + cfg.links_width_base * life
         elif cfg.links_width__mode == {"BINARY"}:
@@ -430,16 +441,16 @@ def gen_linksMesh(fract: MW_Fract, root: types.Object, context: types.Context):
 
         # query props
         id_life[id]= (id_normalized, life)
-        #id_resist[id]= (id_normalized, l.resistance)
+        #id_resist[id]= (id_normalized, t.resistance[lids[id]])
         #dirX_dirZ[id]=(abs(pdir.x), abs(pdir.z))
-        #id_area[id] = (id_normalized, (l.area-fract.links.min_area) / (fract.links.max_area-fract.links.min_area))
+        #id_area[id] = (id_normalized, (t.area[lids[id]]-fract.links.min_area) / (fract.links.max_area-fract.links.min_area))
 
         if DEV.DEBUG_GEODATA_PICKS:
-            id_picks[id]= (id_normalized, l.picks)
+            id_picks[id]= (id_normalized, lids_picks[id])
         # query info keys
         if DEV.DEBUG_GEODATA:
-            k1_k2[id] = l.key_cells
-            f1_f2[id] = l.key_faces
+            k1_k2[id] = key_cells
+            f1_f2[id] = key_faces
 
     # single mesh with tubes
     name = prefs.names.links
@@ -498,7 +509,7 @@ def gen_linksMesh_air(fract: MW_Fract, root: types.Object, context: types.Contex
         f1_f2 : list[tuple[int,int]]          = []
 
     # max prob for normalizeing probabilty
-    probs = [ sim.get_entryProbability(l) for l in fract.links.external ]
+    probs = sim.get_entryProbability(fract.links.external).tolist()
     probsMax = max(probs) if probs else 1
     if probsMax == 0: probsMax = 1
     #probsMax = fract.links.max_area # visualize area instead
@@ -507,14 +518,15 @@ def gen_linksMesh_air(fract: MW_Fract, root: types.Object, context: types.Contex
     w2 = cfg.wall_links_width_base * 0.5
 
     # iterate the global map and store vert pairs for the tube mesh generation
-    for id, l in enumerate(fract.links.external):
+    for id, l in enumerate(fract.links.get_links_fromId(fract.links.external)):
         #if MW_Links.skip_link_debugModel(l): continue # just not generated
         id_normalized = id / float(numLinks) if not DEV.DEBUG_GEODATA_ID_RAW else id
+        l_pos, l_dir = l.pos, l.dir
 
         # represent picks with point from original global pos + normal + offset a bit
-        perp = utils_trans.getPerpendicular_stable(l.dir)
-        p1 = l.pos - perp * w2
-        p2 = p1 + l.dir * (cfg.wall_links_depth_base + l.picks * cfg.wall_links_depth_incr)
+        perp = utils_trans.getPerpendicular_stable(l_dir)
+        p1 = l_pos - perp * w2
+        p2 = p1 + l_dir * (cfg.wall_links_depth_base + l.picks * cfg.wall_links_depth_incr)
         verts.append((p1, p2))
 
         # query props
@@ -526,15 +538,15 @@ def gen_linksMesh_air(fract: MW_Fract, root: types.Object, context: types.Contex
             f1_f2.append(l.key_faces)
 
         # check non prob for entry links visualization
-        prob = sim.get_entryProbability(l)
+        prob = probs[id]
         #prob = l.area+fract.links.min_area
         #prob = 1
         if prob == 0 and not DEV.DEBUG_UNREACH_ENTRY:
             continue
 
         # represent entry picks similarly
-        p1 = l.pos + perp * w2
-        p2 = p1 + l.dir * (cfg.wall_links_depth_base + l.picks_entry * cfg.wall_links_depth_incr)
+        p1 = l_pos + perp * w2
+        p2 = p1 + l_dir * (cfg.wall_links_depth_base + l.picks_entry * cfg.wall_links_depth_incr)
         verts_entry.append((p1, p2))
 
         # also store more props
@@ -542,7 +554,7 @@ def gen_linksMesh_air(fract: MW_Fract, root: types.Object, context: types.Contex
         id_prob.append((id_normalized, prob_normalized))
         if DEV.DEBUG_GEODATA_PICKS:
             id_entries.append((id_normalized, l.picks_entry))
-        #dirX_dirZ[id]=(abs(l.dir.x), abs(l.dir.z))
+        #dirX_dirZ[id]=(abs(l_dir.x), abs(l_dir.z))
 
     # two mesh with tubes to represent entry picks / regular traverse picks
     resFaces = utils_mesh.get_resFaces_fromCurveRes(cfg.wall_links_res)
@@ -604,32 +616,34 @@ def gen_linksMesh_neighs(fract: MW_Fract, root: types.Object, context: types.Con
 
     # avoid repetitions
     checked = set()
+    t = fract.links.table
 
     # iterate the global map and store vert pairs for the tube mesh generation
-    for id, l in enumerate(linkSet):
+    for id, lid in enumerate(linkSet):
         id_normalized = id / float(numLinks) if not DEV.DEBUG_GEODATA_ID_RAW else id
 
         # allow once from outer loop
-        checked.add(l.key_cells)
-        for ln in fract.links.get_link_neighs(l.key_cells):
-            if ln.key_cells in checked: continue
+        checked.add(lid)
+        for lid_n in fract.links.get_link_neighsId(lid):
+            if lid_n in checked: continue
 
             # skip links with no solid end
-            if not fract.links.solid_link_check(ln):
+            if not fract.links.solid_link_check(lid_n):
                 continue
 
             # point from links pos
-            p1 = l.pos
-            p2 = ln.pos
+            p1 = Vector(t.pos[lid])
+            p2 = Vector(t.pos[lid_n])
             verts.append((p1, p2))
 
             # grav mod
-            g = sim.get_nextAlign( (p1-p2).normalized(), bothDir=True)
+            g = float(sim.get_nextAlign(p1-p2, bothDir=True))
             id_grav.append((id_normalized, g))
             #id_grav.append((id_normalized, 0))
 
             # query info keys
             if DEV.DEBUG_GEODATA:
+                l, ln = fract.links.get_link_fromId(lid), fract.links.get_link_fromId(lid_n)
                 l1k1_l1k2.append(l.key_cells)
                 l2k1_l2k2.append(ln.key_cells)
                 l1f1_l1f2.append(l.key_faces)
@@ -683,7 +697,7 @@ def gen_linksMesh_path(fract: MW_Fract, root: types.Object, context: types.Conte
     for depth, step in enumerate(path):
         depth_normalized = depth / float(maxDepth)
         depth_id = depth_normalized if not DEV.DEBUG_GEODATA_ID_RAW else depth
-        l = fract.links.get_link(step[0])
+        l = fract.links.get_link_fromId(step[0])
         w = step[1]
 
         # end point at the link pos
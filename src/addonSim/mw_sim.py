@@ -1,17 +1,15 @@
-import bpy.types as types
-from mathutils import Vector, Matrix
+import numpy as np
 import random as rnd
 
-from .preferences import getPrefs
-from .properties import (
-    MW_sim_cfg,
-)
+# HACK:: only used as type hint, the props module requires blender and the headless core passes a plain cfg (mw_core)
+#from .properties import MW_sim_cfg
 
-from .mw_cont import MW_Cont
-from .mw_links import MW_Links, Link, LINK_STATE_ENUM, neigh_key_t
+from .mw_cont_base import MW_ContBase
+from .mw_links import MW_Links, Link, LINK_STATE_ENUM
+from .mw_trace import MW_Trace
+from .mw_rng import MW_Rng
 
-from . import utils, utils_trans
-from .utils_trans import VECTORS
+from . import utils
 from .utils_dev import DEV
 from .stats import getStats
 
@@ -58,34 +56,80 @@ class SIM_EXIT_FLAG:
         if s == "STOP_ON_CELL_BREAK":   return cls.STOP_ON_CELL_BREAK
         raise ValueError(f"SIM_EXIT_FLAG: {s} is not in {set(SIM_EXIT_FLAG.to_str(s) for s in cls.all)}")
 
-class SubStepData:
-    """ Information per sub step """
-    def __init__(self):
-        self.currentL             : Link        = None
-        self.currentL_deg         : float       = None
-        self.currentL_life        : float       = None
-        self.currentL_candidates  : list[Link]  = None
-        self.currentL_candidatesW : list[float] = None
-        self.water_abs            : float       = None
-        self.water                : float       = None
-
-class StepData:
-    """ Information per step """
-    def __init__(self):
-        self.subs               : list[SubStepData] = list()
-        self.entryL             : Link              = None
-        self.entryL_candidates  : list[Link]        = None
-        self.entryL_candidatesW : list[float]       = None
-        self.exitL              : Link              = None
-        self.break_flag         : int               = SIM_EXIT_FLAG.STILL_RUNNING
+class StepCfg:
+    """ Frozen copy of the sim cfg values read by the steps, avoids the blender props access in the inner loop
+        * compiled once per batch of steps by MW_Sim.cfg_update, the seed and undo props are still read from the live cfg
+        * also keeps the normalized dirs and the alignment normalization factors
+    """
+    _props = (
+        "step_maxDepth", "step_stopBreak", "step_stopBreak_event", "step_skipTolerance", "step_skipWindow",
+        "water__start", "water_deg", "water_abs_air", "water_abs_solid",
+        "link_deg", "link_resist_weight",
+        "dir_entry", "dir_entry_minAlign", "dir_next", "dir_next_minAlign",
+        "water_rnd_abs_minCheck", "water_rnd_abs_continueProb", "water_rnd_abs_damage",
+        "link_rnd_break_minCheck", "link_rnd_break_resistProb",
+        "link_next_dir_weight", "link_next_exit_avoidance",
+        "debug_log_path", "debug_log_trace", "debug_log_trace_candidates", "debug_log_trace_maxSteps", "debug_log_trace_every",
+        "debug_skip_entry_area", "debug_skip_next_maxResist",
+    )
+    __slots__ = _props + ("dir_entry_inv", "dir_entry_minAlign_f", "dir_next_n", "dir_next_minAlign_f")
+
+    def __init__(self, cfg):
+        values = { k: getattr(cfg, k) for k in self._props }
+        values["step_stopBreak_event"] = frozenset(values["step_stopBreak_event"])
+        values["dir_entry"] = tuple(float(x) for x in values["dir_entry"])
+        values["dir_next"] = tuple(float(x) for x in values["dir_next"])
+
+        # water comes from the entry dir, so the faces against it are aligned
+        values["dir_entry_inv"] = -utils.vec3_normalized(values["dir_entry"])
+        values["dir_next_n"] = utils.vec3_normalized(values["dir_next"])
+        values["dir_entry_inv"].flags.writeable = False
+        values["dir_next_n"].flags.writeable = False
+
+        # NOTE:: a full min align (1.0) leaves nothing reachable anyway
+        values["dir_entry_minAlign_f"] = self.minAlign_factor(values["dir_entry_minAlign"])
+        values["dir_next_minAlign_f"] = self.minAlign_factor(values["dir_next_minAlign"])
+
+        for k,v in values.items():
+            object.__setattr__(self, k, v)
+
+    @staticmethod
+    def minAlign_factor(minAlign: float) -> float:
+        """ Normalization factor of the alignment above the cut-off: 1/(1-minAlign) """
+        return 1.0 / (1.0 - minAlign) if minAlign < 1.0 else 0.0
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f"StepCfg is read only, update the sim cfg and call MW_Sim.cfg_update ({key})")
+
+    def __getstate__(self):
+        return { k: getattr(self, k) for k in self.__slots__ }
+
+    def __setstate__(self, state: dict):
+        """ Pickling (e.g. spawned ensemble workers) goes through object.__setattr__ too """
+        for k,v in state.items():
+            object.__setattr__(self, k, v)
 
 #-------------------------------------------------------------------
 
 class MW_Sim:
-    def __init__(self, cont: MW_Cont, links: MW_Links):
-        self.cfg : MW_sim_cfg = cont.root.mw_sim
-        self.cont : MW_Cont = cont
+    def __init__(self, cont: MW_ContBase, links: MW_Links, cfg = None):
+        self.cfg : "MW_sim_cfg" = cfg if cfg is not None else cont.root.mw_sim
+        """ Blender props of the fracture root, or any object with the same attributes when headless """
+        self.cont : MW_ContBase = cont
         self.links : MW_Links = links
+        self.step_cfg : StepCfg = StepCfg(self.cfg)
+        """ Frozen copy of the cfg values read by the steps, recompiled with cfg_update """
+        self.links.table.set_resist_weight(self.step_cfg.link_resist_weight)
+        self.rng : MW_Rng = MW_Rng(self.cfg.debug_rnd.seed, self.cfg.debug_rnd.seed_mod)
+        """ Random streams per step, rebuilt when the seed is stored or restored """
+
+        # cached static alignment terms, recalculated only when their cfg key changes
+        self.cache_entryAlign_key = None
+        self.cache_nextAlign_key = None
+        self.cache_entrySampler_key = None
+
+        # ring of array snapshots for undo, limited by cfg.step_undoLevels
+        self.snapshots : list[dict] = list()
 
         # empty trace data
         self.step_reset()
@@ -93,44 +137,65 @@ class MW_Sim:
 
     #-------------------------------------------------------------------
 
+    def cfg_update(self):
+        """ Compile the cfg values read by the steps, call it before a batch of steps when the cfg changed """
+        self.step_cfg = StepCfg(self.cfg)
+        self.links.table.set_resist_weight(self.step_cfg.link_resist_weight)
+        self.trace.max_steps = self.step_cfg.debug_log_trace_maxSteps
+        self.trace.every = self.step_cfg.debug_log_trace_every
+
     def rnd_store(self):
-        #self.rndState = rnd.getstate()
+        # the global random is still seeded for the debug utils (e.g. state_reset_rnd)
         s = None if self.cfg.debug_rnd.seed_regen else self.cfg.debug_rnd.seed
         self.cfg.debug_rnd.seed = utils.rnd_reset_seed(s)
+        self.rng = MW_Rng(self.cfg.debug_rnd.seed, self.cfg.debug_rnd.seed_mod)
 
     def rnd_restore(self):
-        # NOTE:: just call some amount of randoms to modify seed, could modify state but requires copying a 600 elemnt tuple
-        #rnd.setstate(self.rndState)
-        self.cfg.debug_rnd.seed = utils.rnd_reset_seed(self.cfg.debug_rnd.seed, self.cfg.debug_rnd.seed_mod)
+        # NOTE:: the streams depend on the seed and step id, so there is no random state to replay
+        self.cfg.debug_rnd.seed = utils.rnd_reset_seed(self.cfg.debug_rnd.seed)
+        self.rng = MW_Rng(self.cfg.debug_rnd.seed, self.cfg.debug_rnd.seed_mod)
 
     def backup_state(self):
-        # delegate backup to the links
-        for key in self.links.links_graph.nodes():
-            l = self.links.get_link(key)
-            l.backupState()
-
-        # store cells state too
-        self.cont.backupState()
-
-        # store random too
+        """ Push a snapshot of the arrays to the undo ring, the oldest ones are discarded """
+        # store random first so the snapshot keeps the seed used
         self.rnd_store()
 
-        # store some sim props
-        self.back_step_id = self.step_id
+        snap = self.get_snapshot()
+        snap["seed"] = self.cfg.debug_rnd.seed
+        self.snapshots.append(snap)
+        # at least the last one, a headless cfg has no min clamp (0 would keep all)
+        levels = max(self.cfg.step_undoLevels, 1)
+        if len(self.snapshots) > levels:
+            del self.snapshots[:len(self.snapshots)-levels]
+
+    def backup_state_restore(self, pop=False):
+        """ Restore the last snapshot (optionally discarding it), no graph or component recalculation """
+        if not self.snapshots:
+            DEV.log_msg("No snapshot to restore", {"SIM", "UNDO"})
+            return
+        snap = self.snapshots.pop() if pop else self.snapshots[-1]
 
-    def backup_state_restore(self):
-        # restore all
-        for key in self.links.links_graph.nodes():
-            l = self.links.get_link(key)
-            l.backupState_restore()
-        self.cont.backupState_restore()
+        self.set_snapshot(snap)
+        self.cfg.debug_rnd.seed = snap["seed"]
         self.rnd_restore()
 
-        # global recalculation including graphs
-        self.links.comps_recalc()
+    def get_snapshot(self) -> dict:
+        """ Copy of the simulation state arrays (links and cells), the random state is not included """
+        return {
+            "links"             : self.links.get_snapshot(),
+            "cont"              : self.cont.get_snapshot(),
+            "entrySampler_key"  : self.cache_entrySampler_key,
+            "step_id"           : self.step_id,
+        }
+
+    def set_snapshot(self, snap:dict):
+        # cells first, the links frontier depends on them
+        self.cont.set_snapshot(snap["cont"])
+        self.links.set_snapshot(snap["links"])
+        self.cache_entrySampler_key = snap["entrySampler_key"]
 
         # restore some sim props
-        self.step_id = self.back_step_id
+        self.step_id = snap["step_id"]
 
     #-------------------------------------------------------------------
 
@@ -143,10 +208,8 @@ class MW_Sim:
         self.step_reset_trace()
 
     def state_reset(self, life=1.0, picks=0):
-        # modify links direclty
-        for key in self.links.links_graph.nodes():
-            l = self.links.get_link(key)
-            l.reset(life, picks)
+        # modify links table direclty
+        self.links.table.reset(life, picks)
 
         # reset cells
         self.cont.reset()
@@ -155,14 +218,14 @@ class MW_Sim:
         self.links.comps_recalc()
 
     def state_reset_rnd(self, min_val=0, max_val=1, max_picks = 8, max_entry = 8):
-        # modify links direclty
-        for key in self.links.links_graph.nodes():
-            l = self.links.get_link(key)
-            r = lambda : rnd.random() * (max_val-min_val) + min_val
+        # modify links table direclty
+        r = lambda : rnd.random() * (max_val-min_val) + min_val
+        entryProbs = self.get_entryProbability(range(self.links.links_len))
+        for lid in range(self.links.links_len):
             life = r()
             picks = int(r()*max_picks)
-            entry = int(r()*self.get_entryProbability(l)*max_entry)
-            l.reset(life, picks, entry)
+            entry = int(r()*entryProbs[lid]*max_entry)
+            self.links.table.reset_link(lid, life, picks, entry)
 
         # reset cells normally
         self.cont.reset()
@@ -171,20 +234,22 @@ class MW_Sim:
         self.links.comps_recalc()
 
     def step_reset(self):
-        self.currentL   : Link  = None
-        self.prevL      : Link  = None
-        self.water      : float = self.cfg.water__start
+        # links are referenced by their id in the links table, -1 when none
+        self.currentL   : int   = -1
+        self.prevL      : int   = -1
+        self.water      : float = self.step_cfg.water__start
         self.water_abs  : float = 0
 
-        self.entryL     : Link  = None
+        self.entryL     : int   = -1
         self.exit_flag  : int   = SIM_EXIT_FLAG.STILL_RUNNING
-        self.step_path  : list[tuple[neigh_key_t, float]] = []
+        self.step_path  : list[tuple[int, float]] = []
 
     def step_reset_trace(self):
         self.step_id = self.step_depth = -1
-        self.trace_data : list[StepData] = list()
-        self.step_trace : StepData       = None
-        self.sub_trace  : SubStepData    = None
+        self.trace : MW_Trace = MW_Trace(self.step_cfg.debug_log_trace_maxSteps, self.step_cfg.debug_log_trace_every)
+        """ Columnar trace of the steps, recorded when cfg.debug_log_trace """
+        self.tracing = False
+        """ Whether the current step is recorded in the trace (sampling) """
 
     def step_log_ui(self):
         s = f"({self.step_id},{self.step_depth}) : {SIM_EXIT_FLAG.to_str(self.exit_flag)} - w:{self.water:.2f}"
@@ -193,17 +258,28 @@ class MW_Sim:
     #-------------------------------------------------------------------
 
     def step_degradeAll(self):
-        for l in self.links.internal:
-            l.degrade(self.cfg.link_deg)
+        # NOTE:: internal links are repeated once per cell so unbuffered subtract
+        np.subtract.at(self.links.table.life, self.links.internal, self.step_cfg.link_deg)
+        self.links.table.update_resist_eff(self.links.internal)
 
     def step(self, log_step):
+        """ Run a single infiltration, the fast path is selected automatically when there is no logging nor tracing """
+        if not log_step and not (self.step_cfg.debug_log_trace and self.trace.sampled(self.step_id+1)):
+            self.step_fast()
+        else:
+            self.step_debug(log_step)
+
+    def step_debug(self, log_step):
+        """ Instrumented infiltration with the optional logs and trace data per sub step """
         self.step_reset()
         self.step_id += 1
+        self.rng.begin(self.step_id)
 
         # LOG: config/limit logs
         self.logs_cutmsg_disabled_prev = DEV.logs_cutmsg_disabled
         self.log = log_step
-        self.log_trace = self.log and self.cfg.debug_log_trace
+        self.tracing = self.step_cfg.debug_log_trace and self.trace.sampled(self.step_id)
+        self.log_trace = self.log and self.tracing
         log_links_prev = self.links.log
         self.links.log = self.log
         DEV.logs_cutmsg_disabled = True
@@ -213,25 +289,26 @@ class MW_Sim:
             DEV.log_msg_sep(DEV.logs_cutmsg * 0.75)
             DEV.log_msg(f" > ({self.step_id}) : starting water {self.water}", {"SIM", "STEP"})
 
-        # TRACE: writing the full trace slows down the process, even more when print to console!
-        if (self.log_trace):
-            self.step_trace = StepData()
-            self.trace_data.append(self.step_trace)
+        # TRACE: printing the full trace slows down the process a lot, the recording is just some rows
+        if self.tracing:
+            self.trace.step_begin(self.step_id)
 
 
         # get entry
         self.get_entryLink()
         if not self.check_start():
+            if self.tracing: self.trace.step_end(-1, self.exit_flag)
             return
 
         # LOG: entry
         if self.log:
-            DEV.log_msg(f" > ({self.step_id}) : {self.currentL}", {"SIM", "ENTRY" })
+            DEV.log_msg(f" > ({self.step_id}) : {self.links.get_link_fromId(self.currentL)}", {"SIM", "ENTRY" })
         # TRACE: log entry
         if self.log_trace:
-            DEV.log_msg(f" >>> ENTRY CANDIDATES len({len(self.step_trace.entryL_candidates)})", {"SIM", "ENTRY"})
-            for (l,w) in zip(self.step_trace.entryL_candidates, self.step_trace.entryL_candidatesW):
-                DEV.log_msg(f"      [{w:.2f}] {l}", {"SIM", "ENTRY", "TRACE"})
+            DEV.log_msg(f" >>> ENTRY CANDIDATES len({len(self.links.external)})", {"SIM", "ENTRY"})
+            if self.step_cfg.debug_log_trace_candidates:
+                for (lid,w) in zip(*self.trace.get_cands(self.trace.step_last())):
+                    DEV.log_msg(f"      [{w:.2f}] {self.links.get_link_fromId(lid)}", {"SIM", "ENTRY", "TRACE"})
 
 
         # main loop with a break condition
@@ -240,15 +317,15 @@ class MW_Sim:
 
         # LOG: exit
         if self.log:
-            DEV.log_msg(f" >>> ({self.step_id}) : exit {SIM_EXIT_FLAG.to_str(self.exit_flag)} : {self.currentL}", {"SIM", "EXIT"})
+            DEV.log_msg(f" >>> ({self.step_id}) : exit {SIM_EXIT_FLAG.to_str(self.exit_flag)} : {self.get_currentL_log()}", {"SIM", "EXIT"})
             DEV.log_msg(f" >>> PATH len({len(self.step_path)})", {"SIM", "PATH"})
-            if self.cfg.debug_log_path:
-                for i,(k,w) in enumerate(self.step_path):
-                    DEV.log_msg(f"      [{i}] {self.links.get_link(k)} - w:{w:.2f}", {"SIM", "PATH"})
+            if self.step_cfg.debug_log_path:
+                for i,(lid,w) in enumerate(self.step_path):
+                    DEV.log_msg(f"      [{i}] {self.links.get_link_fromId(lid)} - w:{w:.2f}", {"SIM", "PATH"})
 
         # TRACE: exitL
-        if self.cfg.debug_log_trace:
-            self.step_trace.exitL = self.currentL
+        if self.tracing:
+            self.trace.step_end(self.currentL, self.exit_flag)
 
         # LOG: exit cfg
         if self.log:
@@ -256,9 +333,130 @@ class MW_Sim:
         self.links.log = log_links_prev
         DEV.logs_cutmsg_disabled = self.logs_cutmsg_disabled_prev
 
+    def step_fast(self):
+        """ Same infiltration as step_debug without the log/trace branching, the state is kept in locals until the exit
+            # NOTE:: keep in sync with step_debug: same random calls in the same order so both give identical results
+        """
+        self.step_reset()
+        self.step_id += 1
+        self.rng.begin(self.step_id)
+        self.log = self.log_trace = self.tracing = False
+        log_links_prev = self.links.log
+        self.links.log = False
+
+        cfg = self.step_cfg
+        rng = self.rng
+        links = self.links
+        t = links.table
+        ptr = links.links_neighs_ptr
+        path = self.step_path
+
+        # get entry
+        self.get_entryLink()
+        if self.entryL == -1:
+            self.exit_flag = SIM_EXIT_FLAG.NO_ENTRY_LINK
+            self.links.log = log_links_prev
+            return
+
+        currentL = self.currentL
+        prevL = self.prevL
+        water = self.water
+        water_abs = self.water_abs
+        flag = SIM_EXIT_FLAG.STILL_RUNNING
+        depth = -1
+        maxDepth = cfg.step_maxDepth
+
+        while True:
+            # exit conditions, same order as check_continue
+            if flag == SIM_EXIT_FLAG.STILL_RUNNING:
+                if currentL == -1:
+                    if t.state[prevL] == LINK_STATE_ENUM.WALL: flag = SIM_EXIT_FLAG.NO_NEXT_LINK_WALL
+                    else: flag = SIM_EXIT_FLAG.NO_NEXT_LINK
+                elif water <= 0:
+                    flag = SIM_EXIT_FLAG.NO_WATER
+                elif maxDepth != -1 and depth >= maxDepth-1:
+                    flag = SIM_EXIT_FLAG.MAX_DEPTH
+            if flag != SIM_EXIT_FLAG.STILL_RUNNING:
+                break
+            depth += 1
+
+            # choose next link to propagate
+            start, end = ptr[currentL], ptr[currentL+1]
+            if start == end:
+                currentL = -1
+            else:
+                edges = slice(start, end)
+                candidates = links.links_neighs[edges]
+                prob_weights = self.get_nextProbability(candidates, edges).tolist()
+                prevL = currentL
+                try:
+                    currentL = int(candidates[rng.choice(prob_weights)])
+                    t.picks[currentL] += 1
+                except ValueError:
+                    currentL = -1
+
+            if currentL == -1:
+                continue
+            path.append( (currentL, water) )
+            solid = t.state[currentL] == LINK_STATE_ENUM.SOLID
+
+            # water degradation, potential full absorption
+            if water < cfg.water_rnd_abs_minCheck and (water / cfg.water_rnd_abs_minCheck) * cfg.water_rnd_abs_continueProb < rng.random():
+                flag = SIM_EXIT_FLAG.NO_WATER_RND
+                water_abs = cfg.water_rnd_abs_damage * water
+                water -= water_abs
+            else:
+                if not solid:
+                    w = float(cfg.water_abs_air * t.areaFactor[currentL])
+                else:
+                    # OPT:: cached link_resistance
+                    wr = t.resist_eff[currentL] * cfg.water_deg
+                    wa = cfg.water_abs_solid * t.areaFactor[currentL]
+                    w = float(wa + wr)
+
+                water -= w
+                if water > 0:
+                    water_abs = w
+                else:
+                    water_abs = w + water
+                    water = 0
+
+            # link degradation, potential break
+            if solid:
+                life = t.life[currentL] - water_abs * cfg.link_deg * t.areaFactor_inv[currentL]
+                if life < cfg.link_rnd_break_minCheck:
+                    if (life / cfg.link_rnd_break_minCheck) * cfg.link_rnd_break_resistProb < rng.random():
+                        life = -1
+                t.life[currentL] = life
+                t.resist_eff[currentL] = max(life, 0.0) * t.resist_w[currentL]
+
+                if life <= 0:
+                    breaking = links.setState_link_check(currentL, LINK_STATE_ENUM.AIR)
+                    if cfg.step_stopBreak:
+                        if "LINK" in cfg.step_stopBreak_event:
+                            flag = SIM_EXIT_FLAG.STOP_ON_LINK_BREAK
+                        elif "CELL" in cfg.step_stopBreak_event:
+                            if breaking:
+                                flag = SIM_EXIT_FLAG.STOP_ON_CELL_BREAK
+
+        # write back the step state
+        self.currentL, self.prevL = currentL, prevL
+        self.water, self.water_abs = water, water_abs
+        self.step_depth = depth
+        self.exit_flag = flag
+        self.links.log = log_links_prev
+
+        # LOG: the stop events are always logged
+        if flag >= SIM_EXIT_FLAG.STOP_ON_LINK_BREAK:
+            DEV.log_msg(f" >>> ({self.step_id}) : exit {SIM_EXIT_FLAG.to_str(flag)} : {self.get_currentL_log()}", {"SIM", "EXIT"})
+
+    def get_currentL_log(self) -> Link:
+        """ View of the current link for logs and trace, None when there is no current link """
+        return self.links.get_link_fromId(self.currentL) if self.currentL != -1 else None
+
     def infiltration_buildPath(self):
-        if self.currentL:
-            self.step_path.append( (self.currentL.key_cells, self.water) )
+        if self.currentL != -1:
+            self.step_path.append( (self.currentL, self.water) )
 
     def infiltration_loop(self):
         self.step_depth = -1
@@ -266,225 +464,262 @@ class MW_Sim:
             self.step_depth += 1
 
             # TRACE: build step
-            if (self.cfg.debug_log_trace):
-                self.sub_trace = SubStepData()
-                self.step_trace.subs.append(self.sub_trace)
+            if self.tracing:
+                self.trace.sub_begin(self.step_id, self.step_depth)
 
             # choose next link to propagate
             self.get_nextLink()
 
             # apply degradation etc
-            if self.currentL:
+            if self.currentL != -1:
                 self.water_degradation()
                 self.link_degradation()
 
                 # TRACE: log step
                 if self.log_trace:
+                    sub = self.trace.sub_last()
                     DEV.log_msg(f" > ({self.step_id},{self.step_depth})"
-                                f" : {self.sub_trace.currentL}, n{len(self.sub_trace.currentL_candidates)}"
-                                f" - dw({self.sub_trace.water_abs:.3f}) dl({self.sub_trace.currentL_deg:.3f}) : w({self.sub_trace.water:.3f})"
-                                #f" : n{len(self.sub_trace.currentL_candidates)} {self.sub_trace.currentL_candidatesW[:32]}"
+                                f" : {self.get_currentL_log()}, n{sub['cands_len']}"
+                                f" - dw({sub['water_abs']:.3f}) dl({sub['deg']:.3f}) : w({sub['water']:.3f})"
                                 ,{"SIM", "NEXT", "TRACE"})
-                    if self.cfg.debug_log_trace_candidates:
-                        for (l,w) in zip(self.sub_trace.currentL_candidates, self.sub_trace.currentL_candidatesW):
-                            DEV.log_msg(f"      [{w:.2f}] {l}", {"SIM", "NEXT", "TRACE"})
+                    if self.step_cfg.debug_log_trace_candidates:
+                        for (lid,w) in zip(*self.trace.get_cands(sub)):
+                            DEV.log_msg(f"      [{w:.2f}] {self.links.get_link_fromId(lid)}", {"SIM", "NEXT", "TRACE"})
 
     #-------------------------------------------------------------------
     #  https://docs.python.org/dev/library/random.html#random.choices
 
     def get_entryLink(self):
-        candidates = self.links.external
+        sampler = self.get_entrySampler()
+        total = sampler.total()
 
-        # candidates not found
-        if not candidates:
-            self.entryL = None
-            prob_weights = []
+        # candidates not found or all prob_weights being null etc
+        if not total > 0:
+            self.entryL = -1
 
-        # rnd.choices may fail due to all prob_weights being null etc
+        # sample the sum tree, same as a weighted choice but without rebuilding all the weights
         else:
-            prob_weights = [ self.get_entryProbability(l) for l in candidates ]
-            try:
-                picks = rnd.choices(candidates, prob_weights)
-                self.entryL = picks[0]
-                self.entryL.picks_entry +=1
+            self.entryL = sampler.find(self.rng.random() * total)
 
-            except ValueError as e:
-                self.entryL = None
+            # a leftover floating total (all removed) lands on a null weight
+            if sampler.weights[self.entryL] <= 0:
+                self.entryL = -1
+            else:
+                self.links.table.picks_entry[self.entryL] +=1
 
         # found an entry
-        if self.entryL:
+        if self.entryL != -1:
             self.currentL = self.entryL
 
         self.infiltration_buildPath()
 
-        # TRACE: build entry
-        if self.cfg.debug_log_trace:
-            self.step_trace.entryL = self.entryL
-            self.step_trace.entryL_candidates = candidates
-            self.step_trace.entryL_candidatesW = prob_weights
+        # TRACE: build entry, all the external links are candidates so only stored when asked
+        if self.tracing:
+            if self.step_cfg.debug_log_trace_candidates:
+                candidates = self.links.external
+                self.trace.step_entry(self.entryL, candidates, [ sampler.weights[lid] for lid in candidates ])
+            else:
+                self.trace.step_entry(self.entryL)
+
+    def get_entrySampler(self):
+        """ Sum tree of entry weights kept by the links, rebuilt only when the entry cfg changes """
+        key = (self.step_cfg.dir_entry, self.step_cfg.dir_entry_minAlign, self.step_cfg.debug_skip_entry_area)
+        if self.cache_entrySampler_key != key or self.links.external_sampler is None:
+            self.cache_entrySampler_key = key
+            self.links.external_sampler_set(self.get_entryProbability)
+        return self.links.external_sampler
+
+    def get_entryProbability(self, lids) -> np.ndarray:
+        """ Entry probability of the links given by id (vectorized) """
+        t = self.links.table
+        lids = np.asarray(lids, dtype=np.int64)
 
-    def get_entryProbability(self, l:Link):
         # link dir align (face normal)
-        a = self.get_entryAlign(l.dir)
+        a = self.get_entryAlign_cached()[lids]
         p = a
 
         # weight using face area (normalized)
-        if not self.cfg.debug_skip_entry_area:
-            p*= l.areaFactor
+        if not self.step_cfg.debug_skip_entry_area:
+            p*= t.areaFactor[lids]
 
         return p
 
-    def get_entryAlign(self, vdir:Vector, bothDir=False):
+    def get_entryAlign(self, vdir:np.ndarray, bothDir=False) -> np.ndarray:
+        """ Alignment of a single dir or array of dirs (n,3) with the entry dir """
         # relative position water dir
-        water_dir_inv = -self.cfg.dir_entry.normalized()
-        a = vdir.dot(water_dir_inv)
-        if bothDir: a = abs(a)
-
-        # cut-off
-        if a < self.cfg.dir_entry_minAlign:
-            return 0
-
-        # normalize including potential negative align
-        a_norm = (a - self.cfg.dir_entry_minAlign) / (1.0 - self.cfg.dir_entry_minAlign)
-        return a_norm
+        cfg = self.step_cfg
+        a = np.asarray(vdir) @ cfg.dir_entry_inv
+        if bothDir: a = np.abs(a)
+
+        # cut-off and normalize including potential negative align
+        a_norm = (a - cfg.dir_entry_minAlign) * cfg.dir_entry_minAlign_f
+        return np.where(a < cfg.dir_entry_minAlign, 0.0, a_norm)
+
+    def get_entryAlign_cached(self) -> np.ndarray:
+        """ Entry alignment of all links, recalculated when the entry dir cfg changes or some link dir flips """
+        key = (self.step_cfg.dir_entry, self.step_cfg.dir_entry_minAlign, self.links.table.dir_version)
+        if self.cache_entryAlign_key != key:
+            self.cache_entryAlign_key = key
+            self.cache_entryAlign = self.get_entryAlign(self.links.table.dir)
+        return self.cache_entryAlign
 
     #-------------------------------------------------------------------
 
     def get_nextLink(self):
         # merge neighs, the water could scape to the outer surface
-        candidates = self.links.get_link_neighs(self.currentL.key_cells)
+        candidates = self.links.get_link_neighsId(self.currentL)
 
         ## drop prev from candidates? implicit by gravity direction
         #if self.prevL: candidates -= [self.prevL]
 
         # candidates not found
-        if not candidates:
-            self.currentL = None
+        if not len(candidates):
+            self.currentL = -1
             prob_weights = []
 
-        # rnd.choices may fail due to all prob_weights being null etc
+        # the weighted choice may fail due to all prob_weights being null etc
         else:
-            prob_weights = [ self.get_nextProbability(l) for l in candidates ]
+            edges = slice(self.links.links_neighs_ptr[self.currentL], self.links.links_neighs_ptr[self.currentL+1])
+            prob_weights = self.get_nextProbability(candidates, edges).tolist()
             self.prevL = self.currentL
             try:
-                picks = rnd.choices(candidates, prob_weights)
-                self.currentL = picks[0]
-                self.currentL.picks += 1
+                self.currentL = int(candidates[self.rng.choice(prob_weights)])
+                self.links.table.picks[self.currentL] += 1
 
             except ValueError as e:
-                self.currentL = None
+                self.currentL = -1
 
         self.infiltration_buildPath()
 
         # TRACE: build next
-        if self.cfg.debug_log_trace:
-            self.sub_trace.currentL = self.currentL
-            self.sub_trace.currentL_candidates = candidates
-            self.sub_trace.currentL_candidatesW = prob_weights
+        if self.tracing:
+            self.trace.sub_next(self.currentL, candidates, prob_weights)
 
-    def get_nextProbability(self, l:Link):
-        # links hanging in the air are not valid (rare case)
-        if not self.links.solid_link_check(l):
-            return 0
+    def get_nextProbability(self, lids, edges, cells_state:np.ndarray=None) -> np.ndarray:
+        """ Next probability of the links given by id (vectorized), the edges index the CSR neighs of the links reached
+            * optional cells state array to vectorize the solid link check
+        """
+        t = self.links.table
+        lids = np.asarray(lids, dtype=np.int64)
 
-        # relative pos align
-        dpos = l.pos - self.currentL.pos
-        a = self.get_nextAlign(dpos.normalized())
-        p = a * self.cfg.link_next_dir_weight
+        # relative pos align, static so cached per neigh edge
+        a = self.get_nextAlign_cached()[edges]
+        p = a * self.step_cfg.link_next_dir_weight
 
         # weight by link resistance field
-        if l.state == LINK_STATE_ENUM.SOLID:
-            r = self.link_resistance(l)
-            if not self.cfg.debug_skip_next_maxResist:
-                r = min(r, 0.999)
-            p *= 1-r
+        r = self.link_resistance(lids)
+        if not self.step_cfg.debug_skip_next_maxResist:
+            r = np.minimum(r, 0.999)
 
         # weight the probability of air links
-        if l.state != LINK_STATE_ENUM.SOLID:
-            p *= self.cfg.link_next_exit_avoidance
+        solid = t.state[lids] == LINK_STATE_ENUM.SOLID
+        p *= np.where(solid, 1-r, self.step_cfg.link_next_exit_avoidance)
+
+        # links hanging in the air are not valid (rare case)
+        if cells_state is not None:
+            p[~self.links.solid_link_check_arr(lids, cells_state)] = 0
+        else:
+            for i,lid in enumerate(lids.tolist()):
+                if not self.links.solid_link_check(lid):
+                    p[i] = 0
 
         return p
 
-    def get_nextAlign(self, vdir:Vector, bothDir=False):
+    def get_nextAlign(self, vdir:np.ndarray, bothDir=False) -> np.ndarray:
+        """ Alignment of a single dir or array of dirs (n,3) with the next dir, normalizes the dirs """
         # relative pos align
-        water_dir_inv = self.cfg.dir_next.normalized()
-        a = vdir.normalized().dot(water_dir_inv)
-        if bothDir: a = abs(a)
-
-        # cut-off
-        if a < self.cfg.dir_next_minAlign:
-            return 0
-
-        # normalize including potential negative align
-        a_norm = (a - self.cfg.dir_next_minAlign) / (1.0 - self.cfg.dir_next_minAlign)
-        return a_norm
+        cfg = self.step_cfg
+        vdir = np.asarray(vdir, dtype=np.float64)
+        vdir_len = np.linalg.norm(vdir, axis=-1)
+        a = (vdir @ cfg.dir_next_n) / np.where(vdir_len == 0, 1.0, vdir_len)
+        if bothDir: a = np.abs(a)
+
+        # cut-off and normalize including potential negative align
+        a_norm = (a - cfg.dir_next_minAlign) * cfg.dir_next_minAlign_f
+        return np.where(a < cfg.dir_next_minAlign, 0.0, a_norm)
+
+    def get_nextAlign_cached(self) -> np.ndarray:
+        """ Alignment of every directed neigh edge (CSR order of links_neighs), recalculated when the next dir cfg changes """
+        key = (self.step_cfg.dir_next, self.step_cfg.dir_next_minAlign)
+        if self.cache_nextAlign_key != key:
+            self.cache_nextAlign_key = key
+            t = self.links.table
+            ptr, neighs = self.links.links_neighs_ptr, self.links.links_neighs
+            lids_from = np.repeat(np.arange(t.len), np.diff(ptr))
+            self.cache_nextAlign = self.get_nextAlign(t.pos[neighs] - t.pos[lids_from])
+        return self.cache_nextAlign
 
     #-------------------------------------------------------------------
 
-    def link_resistance(self, l:Link):
-        # dead link opposes no resistance (but never negative)
-        r = max(l.life, 0.0)
+    def link_resistance(self, lids):
+        """ Resistance of a single link or array of links by id """
+        t = self.links.table
 
-        # mod by the resistance field at its center
-        r *= l.resistance * self.cfg.link_resist_weight
+        # dead link opposes no resistance (but never negative), mod by the resistance field at its center
+        # NOTE:: cached by the table, kept in sync with the life and the resist weight
+        r = t.resist_eff[lids]
 
         ## also consider area factor so area size affects the resistance opposed?
-        #if self.cfg.debug_skip_next_area:
-        #    r *= l.areaFactor
+        #if self.step_cfg.debug_skip_next_area:
+        #    r *= t.areaFactor[lids]
         return r
 
     def link_degradation(self):
+        t = self.links.table
         d = -1
-        if self.currentL.state == LINK_STATE_ENUM.SOLID:
+        if t.state[self.currentL] == LINK_STATE_ENUM.SOLID:
 
             # degradation depends on water abs but distributed over the link surface (cancels out area)
-            d = self.water_abs * self.cfg.link_deg / self.currentL.areaFactor
+            d = self.water_abs * self.step_cfg.link_deg * t.areaFactor_inv[self.currentL]
 
             # apply degradation -> potential break
-            self.currentL.degrade(d)
+            t.life[self.currentL] -= d
 
             if self.link_rnd_break_event():
-                self.currentL.life = -1
+                t.life[self.currentL] = -1
+            t.update_resist_eff(self.currentL)
 
-            if self.currentL.life <= 0:
-                if self.log: DEV.log_msg(f" *** ({self.step_id}) : link_break_event {self.currentL}", {"SIM", "EVENT"})
-                breaking = self.links.setState_link_check(self.currentL.key_cells, LINK_STATE_ENUM.AIR)
+            if t.life[self.currentL] <= 0:
+                if self.log: DEV.log_msg(f" *** ({self.step_id}) : link_break_event {self.get_currentL_log()}", {"SIM", "EVENT"})
+                breaking = self.links.setState_link_check(self.currentL, LINK_STATE_ENUM.AIR)
 
                 # stop simulation on break
-                if self.cfg.step_stopBreak:
-                    if "LINK" in self.cfg.step_stopBreak_event:
+                if self.step_cfg.step_stopBreak:
+                    if "LINK" in self.step_cfg.step_stopBreak_event:
                         self.exit_flag = SIM_EXIT_FLAG.STOP_ON_LINK_BREAK
-                    elif "CELL" in self.cfg.step_stopBreak_event:
+                    elif "CELL" in self.step_cfg.step_stopBreak_event:
                         if breaking:
                             self.exit_flag = SIM_EXIT_FLAG.STOP_ON_CELL_BREAK
 
         # TRACE: link deg
-        if self.cfg.debug_log_trace:
-            self.sub_trace.currentL_deg = d
-            self.sub_trace.currentL_life = self.currentL.life
+        if self.tracing:
+            self.trace.sub_link(d, t.life[self.currentL])
 
     def link_rnd_break_event(self):
-        if self.currentL.life < self.cfg.link_rnd_break_minCheck:
-            minLife = self.currentL.life / self.cfg.link_rnd_break_minCheck
-            if minLife * self.cfg.link_rnd_break_resistProb < rnd.random():
-                if self.log: DEV.log_msg(f" *** ({self.step_id}) : link_rnd_break_event L{self.currentL}", {"SIM", "EVENT"})
+        life = self.links.table.life[self.currentL]
+        if life < self.step_cfg.link_rnd_break_minCheck:
+            minLife = life / self.step_cfg.link_rnd_break_minCheck
+            if minLife * self.step_cfg.link_rnd_break_resistProb < self.rng.random():
+                if self.log: DEV.log_msg(f" *** ({self.step_id}) : link_rnd_break_event L{self.get_currentL_log()}", {"SIM", "EVENT"})
                 return True
         return False
 
     def water_degradation(self):
+        t = self.links.table
+
         # check potential full water absorption
         if not self.water_rnd_abs_event():
 
             # minimun abs that happens when the water runs through a exterior face or an eroded interior one
-            if self.currentL.state != LINK_STATE_ENUM.SOLID:
-                wa = self.cfg.water_abs_air * self.currentL.areaFactor
-                w = wa
+            if t.state[self.currentL] != LINK_STATE_ENUM.SOLID:
+                wa = self.step_cfg.water_abs_air * t.areaFactor[self.currentL]
+                w = float(wa)
 
             # interior solid abs takes into account resistance too
             else:
-                wr = self.link_resistance(self.currentL) * self.cfg.water_deg
-                wa = self.cfg.water_abs_solid * self.currentL.areaFactor
-                w = wa + wr
+                wr = self.link_resistance(self.currentL) * self.step_cfg.water_deg
+                wa = self.step_cfg.water_abs_solid * t.areaFactor[self.currentL]
+                w = float(wa + wr)
 
             # abs water
             self.water -= w
@@ -495,19 +730,18 @@ class MW_Sim:
                 self.water = 0
 
         # TRACE: water abs
-        if self.cfg.debug_log_trace:
-            self.sub_trace.water_abs = self.water_abs
-            self.sub_trace.water = self.water
+        if self.tracing:
+            self.trace.sub_water(self.water_abs, self.water)
 
     def water_rnd_abs_event(self):
-        if self.water < self.cfg.water_rnd_abs_minCheck:
-            minAbsorb = self.water / self.cfg.water_rnd_abs_minCheck
-            if minAbsorb * self.cfg.water_rnd_abs_continueProb < rnd.random():
+        if self.water < self.step_cfg.water_rnd_abs_minCheck:
+            minAbsorb = self.water / self.step_cfg.water_rnd_abs_minCheck
+            if minAbsorb * self.step_cfg.water_rnd_abs_continueProb < self.rng.random():
                 self.exit_flag = SIM_EXIT_FLAG.NO_WATER_RND
                 if self.log: DEV.log_msg(f" *** ({self.step_id}) : water_rnd_abs_event w:{self.water}", {"SIM", "EVENT"})
 
                 # consider how much water was abs
-                self.water_abs = self.cfg.water_rnd_abs_damage * self.water
+                self.water_abs = self.step_cfg.water_rnd_abs_damage * self.water
                 self.water -= self.water_abs
                 return True
 
@@ -517,7 +751,7 @@ class MW_Sim:
 
     def check_start(self):
         # no entry link was found
-        if not self.entryL:
+        if self.entryL == -1:
             self.exit_flag = SIM_EXIT_FLAG.NO_ENTRY_LINK
 
         return self.check_exit_flag()
@@ -526,8 +760,8 @@ class MW_Sim:
         if self.exit_flag == SIM_EXIT_FLAG.STILL_RUNNING:
 
             # no next link was found
-            if not self.currentL:
-                if self.prevL.state == LINK_STATE_ENUM.WALL: self.exit_flag = SIM_EXIT_FLAG.NO_NEXT_LINK_WALL
+            if self.currentL == -1:
+                if self.links.table.state[self.prevL] == LINK_STATE_ENUM.WALL: self.exit_flag = SIM_EXIT_FLAG.NO_NEXT_LINK_WALL
                 else: self.exit_flag = SIM_EXIT_FLAG.NO_NEXT_LINK
 
             # no more water
@@ -535,7 +769,7 @@ class MW_Sim:
                 self.exit_flag = SIM_EXIT_FLAG.NO_WATER
 
             # max iterations when enabled
-            elif self.cfg.step_maxDepth != -1 and self.step_depth >= self.cfg.step_maxDepth-1:
+            elif self.step_cfg.step_maxDepth != -1 and self.step_depth >= self.step_cfg.step_maxDepth-1:
                 self.exit_flag = SIM_EXIT_FLAG.MAX_DEPTH
 
         # the flag could be potentially set at other steps: link break, water rnd abs...
@@ -544,14 +778,10 @@ class MW_Sim:
     def check_exit_flag(self):
         # found msg means exit condition was met
         if self.exit_flag != SIM_EXIT_FLAG.STILL_RUNNING:
-            # TRACE: keep msg per trace
-            if self.cfg.debug_log_trace:
-                self.step_trace.break_flag = self.exit_flag
-
             # set the log for at least the last iter
             if self.exit_flag >= SIM_EXIT_FLAG.STOP_ON_LINK_BREAK:
                 self.log = True
-                self.log_trace = self.cfg.debug_log_trace
+                self.log_trace = self.tracing
 
             return False
 
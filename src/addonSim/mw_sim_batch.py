@@ -0,0 +1,289 @@
+import numpy as np
+
+from .mw_cont_base import CELL_STATE_ENUM
+from .mw_links import MW_Links, LINK_STATE_ENUM
+from .mw_sim import MW_Sim, SIM_EXIT_FLAG
+from .mw_rng import MW_Rng
+
+from .utils_dev import DEV
+from .stats import getStats
+
+
+#-------------------------------------------------------------------
+
+def last_positive(weights: np.ndarray) -> np.ndarray:
+    """ Index of the last positive weight at or before each position, -1 when there is none """
+    idx = np.where(weights > 0, np.arange(len(weights)), -1)
+    return np.maximum.accumulate(idx) if len(idx) else idx
+
+#-------------------------------------------------------------------
+
+class MW_SimBatch:
+    """ Vectorized infiltration engine: advances a batch of independent water particles at once
+        * candidates are gathered from the links CSR arrays, weights and sampling computed per segment
+        * water absorption and link degradation are scattered to the links table with unbuffered ufuncs
+        * break events change the topology (cells/comps) so those are resolved serially through MW_Links
+        # NOTE:: particles within a batch are simultaneous, so the result is not the same as the serial loop
+        # NOTE:: each batch draws from the stream of its first step id, so it only depends on the seed, step id and batch size
+    """
+
+    def __init__(self, sim: MW_Sim):
+        self.sim : MW_Sim = sim
+        self.links : MW_Links = sim.links
+
+        # numpy generator of the sim streams, moved to the batch stream of its first step id
+        self.rng : np.random.Generator = sim.rng.gen
+
+        # cells state as an array to check hanging links, only changes on break events
+        self.cells_state_update()
+
+        self.depth_sum = 0
+        """ Accumulated depth of all the particles run, to get the mean path depth """
+
+    def cells_state_update(self):
+        self.cells_state = np.asarray(self.sim.cont.cells_state, dtype=np.int64)
+
+    #-------------------------------------------------------------------
+
+    def run(self, n:int, batch_size:int) -> dict[int,int]:
+        """ Run n infiltrations in batches, returns the count per exit flag
+            * the sim keeps the path and exit state of the last particle (or the one that stopped the sim)
+        """
+        flags_count = dict()
+        done = 0
+        while done < n:
+            b = min(batch_size, n-done)
+            self.rng = self.sim.rng.stream(self.sim.step_id+1, MW_Rng.STREAM_BATCH)
+            flags, depth, report = self.run_batch(b)
+            done += b
+
+            # particles halted by a stop of the sim are left out, like the steps a serial run never reaches
+            ran = flags != SIM_EXIT_FLAG.STILL_RUNNING
+            self.depth_sum += int(depth[ran].sum())
+            for f,c in zip(*np.unique(flags[ran], return_counts=True)):
+                flags_count[int(f)] = flags_count.get(int(f), 0) + int(c)
+
+            # keep the reported particle as the last step of the sim
+            self.sim.step_id += int(np.count_nonzero(ran))
+            self.set_sim_step(report)
+
+            # skip the rest of batches
+            if self.sim.exit_flag == SIM_EXIT_FLAG.NO_ENTRY_LINK or self.sim.exit_flag >= SIM_EXIT_FLAG.STOP_ON_LINK_BREAK:
+                break
+
+        getStats().logDt(f"batch infiltrations: {done} / {n} (batch_size {batch_size})")
+        DEV.log_msg(f"batch exit flags: { {SIM_EXIT_FLAG.to_str(f):c for f,c in flags_count.items()} }", {"SIM", "BATCH"})
+        return flags_count
+
+    def set_sim_step(self, report:tuple):
+        sim = self.sim
+        sim.step_reset()
+        sim.step_path, sim.exit_flag, sim.step_depth = report
+        if sim.step_path:
+            sim.entryL = sim.step_path[0][0]
+            sim.currentL, sim.water = sim.step_path[-1]
+            if len(sim.step_path) > 1:
+                sim.prevL = sim.step_path[-2][0]
+
+    #-------------------------------------------------------------------
+
+    def run_batch(self, b:int) -> tuple[np.ndarray, np.ndarray, tuple]:
+        """ Simulate b simultaneous infiltrations, returns the exit flags, depths and the report tuple (path, flag, depth)
+            * particles halted by a stop of the sim (or never started) keep the STILL_RUNNING flag
+        """
+        cfg = self.sim.step_cfg
+        t = self.links.table
+
+        flags = np.full(b, SIM_EXIT_FLAG.STILL_RUNNING, dtype=np.int64)
+        depth = np.full(b, -1, dtype=np.int64)
+        water = np.full(b, cfg.water__start, dtype=np.float64)
+
+        # get entry
+        cur = self.get_entryLinks(b)
+        if cur is None:
+            # a single failed step like the serial run, the rest are never started
+            flags[0] = SIM_EXIT_FLAG.NO_ENTRY_LINK
+            return flags, depth, ([], SIM_EXIT_FLAG.NO_ENTRY_LINK, -1)
+
+        # history per sub step to rebuild the reported path, -1 when the particle was not alive
+        hist_cur = [cur.copy()]
+        hist_water = [water.copy()]
+        report_id = b-1
+
+        alive = np.ones(b, dtype=bool)
+        if cfg.step_maxDepth == 0:
+            flags[:] = SIM_EXIT_FLAG.MAX_DEPTH
+            alive[:] = False
+
+        while alive.any():
+            act = np.flatnonzero(alive)
+
+            # choose next link to propagate, the attempt counts as depth even when failed (like the serial step)
+            depth[act] += 1
+            nxt = self.get_nextLinks(cur[act])
+            found = nxt != -1
+
+            # no next link was found (or all weights null)
+            lost = act[~found]
+            if len(lost):
+                lost_wall = t.state[cur[lost]] == LINK_STATE_ENUM.WALL
+                flags[lost] = np.where(lost_wall, SIM_EXIT_FLAG.NO_NEXT_LINK_WALL, SIM_EXIT_FLAG.NO_NEXT_LINK)
+                alive[lost] = False
+
+            act, nxt = act[found], nxt[found]
+            cur[act] = nxt
+            np.add.at(t.picks, nxt, 1)
+
+            # apply degradation etc
+            water_abs = self.water_degradation(act, nxt, water, flags)
+            broken = self.link_degradation(nxt, water_abs)
+
+            # topology changes handled serially in particle order, might stop the whole sim
+            stop_id = self.resolve_breaks(act, nxt, broken, flags)
+
+            # record sub step
+            h = np.full(b, -1, dtype=np.int64)
+            h[act] = nxt
+            hist_cur.append(h)
+            hist_water.append(water.copy())
+
+            if stop_id != -1:
+                report_id = stop_id
+                break
+
+            # exit conditions, the flag could be already set by the rnd water abs
+            running = act[flags[act] == SIM_EXIT_FLAG.STILL_RUNNING]
+            flags[running[water[running] <= 0]] = SIM_EXIT_FLAG.NO_WATER
+            if cfg.step_maxDepth != -1:
+                running = act[flags[act] == SIM_EXIT_FLAG.STILL_RUNNING]
+                flags[running[depth[running] >= cfg.step_maxDepth-1]] = SIM_EXIT_FLAG.MAX_DEPTH
+            alive[act] = flags[act] == SIM_EXIT_FLAG.STILL_RUNNING
+
+        # rebuild the path of the reported particle
+        path = [ (int(h[report_id]), float(w[report_id])) for h,w in zip(hist_cur, hist_water) if h[report_id] != -1 ]
+        return flags, depth, (path, int(flags[report_id]), int(depth[report_id]))
+
+    #-------------------------------------------------------------------
+
+    def get_entryLinks(self, b:int) -> np.ndarray:
+        """ Sample b entry links at once, None when there are no valid candidates """
+        candidates = np.flatnonzero(self.links.frontier_external)
+        if not len(candidates):
+            return None
+
+        prob_weights = self.sim.get_entryProbability(candidates)
+        cw = np.cumsum(prob_weights)
+        if not cw[-1] > 0:
+            return None
+
+        picks = np.searchsorted(cw, self.rng.random(b) * cw[-1], side="right")
+        picks = last_positive(prob_weights)[np.minimum(picks, len(candidates)-1)]
+        entries = candidates[picks]
+        np.add.at(self.links.table.picks_entry, entries, 1)
+        return entries
+
+    def get_nextLinks(self, cur:np.ndarray) -> np.ndarray:
+        """ Sample the next link of each particle from its CSR segment of neighs, -1 when not found """
+        ptr, neighs = self.links.links_neighs_ptr, self.links.links_neighs
+
+        # gather candidates of all particles into a flat array with segments
+        start = ptr[cur]
+        count = ptr[cur+1] - start
+        seg_end = np.cumsum(count)
+        seg_start = seg_end - count
+        flat = np.arange(seg_end[-1] if len(seg_end) else 0) + np.repeat(start - seg_start, count)
+        candidates = neighs[flat]
+        if not len(candidates):
+            return np.full(len(cur), -1, dtype=np.int64)
+
+        # sample per segment using the cumulative sum of the weights
+        prob_weights = self.sim.get_nextProbability(candidates, flat, self.cells_state)
+        cw = np.concatenate(([0.0], np.cumsum(prob_weights)))
+        seg_total = cw[seg_end] - cw[seg_start]
+        u = cw[seg_start] + self.rng.random(len(cur)) * seg_total
+        picks = np.searchsorted(cw[1:], u, side="right")
+        picks = np.minimum(picks, seg_end-1)
+        # floating error of the global sum could land on null weights, step back inside the segment like SumTree.find
+        picks = last_positive(prob_weights)[np.maximum(picks, 0)]
+
+        return np.where((seg_total > 0) & (picks >= seg_start), candidates[np.maximum(picks, 0)], -1)
+
+    #-------------------------------------------------------------------
+
+    def water_degradation(self, act:np.ndarray, nxt:np.ndarray, water:np.ndarray, flags:np.ndarray) -> np.ndarray:
+        """ Absorb water of the active particles in place, returns the water absorbed """
+        cfg = self.sim.step_cfg
+        t = self.links.table
+        w = water[act]
+
+        # check potential full water absorption
+        rnd_abs = w < cfg.water_rnd_abs_minCheck
+        rnd_abs &= (w / cfg.water_rnd_abs_minCheck) * cfg.water_rnd_abs_continueProb < self.rng.random(len(act))
+        flags[act[rnd_abs]] = SIM_EXIT_FLAG.NO_WATER_RND
+
+        # minimun abs through exterior or eroded faces, interior solid abs takes into account resistance too
+        solid = t.state[nxt] == LINK_STATE_ENUM.SOLID
+        wa = np.where(solid, cfg.water_abs_solid, cfg.water_abs_air) * t.areaFactor[nxt]
+        wa[solid] += self.sim.link_resistance(nxt[solid]) * cfg.water_deg
+
+        # abs water, clamped to the water left
+        w_left = w - wa
+        water_abs = np.where(w_left > 0, wa, wa + w_left)
+        w_left = np.maximum(w_left, 0.0)
+
+        # consider how much water was abs by the rnd event
+        water_abs[rnd_abs] = cfg.water_rnd_abs_damage * w[rnd_abs]
+        w_left[rnd_abs] = w[rnd_abs] - water_abs[rnd_abs]
+
+        water[act] = w_left
+        return water_abs
+
+    def link_degradation(self, nxt:np.ndarray, water_abs:np.ndarray) -> np.ndarray:
+        """ Degrade the solid links traversed, returns the mask of particles that broke theirs """
+        cfg = self.sim.step_cfg
+        t = self.links.table
+        solid = t.state[nxt] == LINK_STATE_ENUM.SOLID
+
+        # degradation depends on water abs but distributed over the link surface (cancels out area)
+        d = water_abs[solid] * cfg.link_deg * t.areaFactor_inv[nxt[solid]]
+
+        # NOTE:: several particles may cross the same link so unbuffered subtract
+        np.subtract.at(t.life, nxt[solid], d)
+
+        # potential rnd break after the degradation
+        life = t.life[nxt]
+        rnd_break = solid & (life < cfg.link_rnd_break_minCheck)
+        rnd_break &= (life / cfg.link_rnd_break_minCheck) * cfg.link_rnd_break_resistProb < self.rng.random(len(nxt))
+        t.life[nxt[rnd_break]] = -1
+        t.update_resist_eff(nxt)
+
+        return solid & (t.life[nxt] <= 0)
+
+    def resolve_breaks(self, act:np.ndarray, nxt:np.ndarray, broken:np.ndarray, flags:np.ndarray) -> int:
+        """ Serial fallback for link break events, returns the particle that stopped the sim or -1 """
+        cfg = self.sim.step_cfg
+        t = self.links.table
+        if not broken.any():
+            return -1
+
+        stop_id = -1
+        for pid, lid in zip(act[broken].tolist(), nxt[broken].tolist()):
+            # several particles may have broken the same link
+            if t.state[lid] != LINK_STATE_ENUM.SOLID:
+                continue
+
+            breaking = self.links.setState_link_check(lid, LINK_STATE_ENUM.AIR)
+
+            # stop simulation on break, but still resolve the rest of breaks of this sub step
+            if cfg.step_stopBreak and stop_id == -1:
+                if "LINK" in cfg.step_stopBreak_event:
+                    flags[pid] = SIM_EXIT_FLAG.STOP_ON_LINK_BREAK
+                    stop_id = pid
+                elif "CELL" in cfg.step_stopBreak_event:
+                    if breaking:
+                        flags[pid] = SIM_EXIT_FLAG.STOP_ON_CELL_BREAK
+                        stop_id = pid
+
+        # cells might have changed to air after the comps recalc
+        self.cells_state_update()
+        return stop_id
@@ -0,0 +1,149 @@
+import numpy as np
+
+try:
+    import scipy.sparse as sp
+    import scipy.sparse.linalg as spla
+except ImportError:
+    # optional, only the expected flow preview requires it
+    sp = spla = None
+
+from .mw_links import MW_Links, LINK_STATE_ENUM
+from .mw_sim import MW_Sim
+
+from .utils_dev import DEV
+from .stats import getStats
+
+
+#-------------------------------------------------------------------
+
+class MW_SimFlow:
+    """ Expected flow solver: the infiltration as an absorbing Markov chain over the links instead of sampling walks
+        * transition matrix from the same next probabilities, the entry distribution from the entry sampler weights
+        * the water running out is approximated per visit: continue with probability 1 - absorbed / starting water
+        * expected visits v solve (I - P^T C) v = P^T p_entry, then the expected degradation is applied in bulk
+        * only re-solved after the topology changes (a link breaks), so a preview of many infiltrations costs a few solves
+        # NOTE:: no random events nor max depth, and the resistance term uses the life at the last solve
+    """
+
+    def __init__(self, sim: MW_Sim):
+        if sp is None:
+            raise ImportError("MW_SimFlow: the expected flow solver requires scipy")
+        self.sim : MW_Sim = sim
+        self.links : MW_Links = sim.links
+
+        self.visits : np.ndarray = None
+        """ Expected visits per link of a single infiltration, from the last solve """
+        self.absorbed : np.ndarray = None
+        """ Expected water absorbed per link of a single infiltration """
+        self.entries : np.ndarray = None
+        """ Entry probability per link """
+        self.solves = 0
+        self.depth_mean = 0.0
+        """ Expected path length of the infiltrations of the last run """
+
+    #-------------------------------------------------------------------
+
+    def get_transitions(self) -> "sp.csr_matrix":
+        """ Row stochastic matrix over the links CSR neighbours, null rows for the links without valid next candidates """
+        sim = self.sim
+        links = self.links
+        t = links.table
+        ptr, neighs = links.links_neighs_ptr, links.links_neighs
+
+        # all the directed edges at once, same weights as the serial choice
+        cells_state = np.asarray(sim.cont.cells_state, dtype=np.int64)
+        w = sim.get_nextProbability(neighs, slice(0, len(neighs)), cells_state)
+        rows = np.repeat(np.arange(t.len), np.diff(ptr))
+        w_total = np.bincount(rows, weights=w, minlength=t.len)
+
+        valid = w_total[rows] > 0
+        data = np.zeros_like(w)
+        data[valid] = w[valid] / w_total[rows[valid]]
+        return sp.csr_matrix((data, neighs, ptr), shape=(t.len, t.len))
+
+    def get_absorption(self) -> np.ndarray:
+        """ Water absorbed per visit of each link, same terms as the serial water degradation """
+        cfg = self.sim.step_cfg
+        t = self.links.table
+        solid = t.state == LINK_STATE_ENUM.SOLID
+        wa = np.where(solid, cfg.water_abs_solid, cfg.water_abs_air) * t.areaFactor
+        wa[solid] += self.sim.link_resistance(np.flatnonzero(solid)) * cfg.water_deg
+        return wa
+
+    def solve(self):
+        """ Expected visits and absorbed water per link of a single infiltration """
+        stats = getStats()
+        cfg = self.sim.step_cfg
+        t = self.links.table
+
+        sampler = self.sim.get_entrySampler()
+        entries = np.asarray(sampler.weights, dtype=np.float64)
+        total = entries.sum()
+        self.entries = entries / total if total > 0 else entries
+
+        # continuation probability after each visit, the water carried is approximated as the starting one
+        wa = self.get_absorption()
+        cont = np.clip(1.0 - wa / cfg.water__start, 0.0, 1.0) if cfg.water__start > 0 else np.zeros(t.len)
+
+        # visits of the first sub step come from the entries, then the walk continues while there is water
+        P = self.get_transitions()
+        PT = P.T.tocsr()
+        A = sp.identity(t.len, format="csr") - PT @ sp.diags(cont)
+        self.visits = np.maximum(spla.spsolve(A.tocsc(), PT @ self.entries), 0.0)
+        self.absorbed = self.visits * np.minimum(wa, cfg.water__start)
+
+        self.solves += 1
+        stats.logDt(f"flow solve: {t.len} links, expected path {self.visits.sum():.2f}")
+
+    #-------------------------------------------------------------------
+
+    def run(self, n: int) -> int:
+        """ Apply the expected degradation of n infiltrations, returns the infiltrations applied (less when stopped by a break)
+            * chunks of infiltrations until the next link break, then the topology changes and the system is solved again
+        """
+        cfg = self.sim.step_cfg
+        t = self.links.table
+        done = 0
+        depth_sum = 0.0
+
+        while done < n:
+            self.solve()
+            solid = t.state == LINK_STATE_ENUM.SOLID
+            deg = np.zeros(t.len)
+            deg[solid] = self.absorbed[solid] * cfg.link_deg * t.areaFactor_inv[solid]
+
+            # infiltrations until the first break, at least one
+            degrading = np.flatnonzero(deg > 0)
+            k = n - done
+            if len(degrading):
+                k_break = np.ceil(np.maximum(t.life[degrading], 0.0) / deg[degrading])
+                k = int(min(k, max(k_break.min(), 1)))
+
+            t.life -= k * deg
+            t.update_resist_eff()
+            t.picks += np.rint(k * self.visits).astype(t.picks.dtype)
+            t.picks_entry += np.rint(k * self.entries).astype(t.picks_entry.dtype)
+            done += k
+            depth_sum += k * self.visits.sum()
+            self.sim.step_id += k
+
+            # resolve the breaks serially, they modify the graph
+            broken = np.flatnonzero(solid & (t.life <= 0))
+            if not len(broken):
+                continue
+            DEV.log_msg(f"flow breaks: {len(broken)} links after {done} infiltrations", {"SIM", "FLOW", "EVENT"})
+            breaking = False
+            for lid in broken.tolist():
+                # a previous break may have detached the link already
+                if t.state[lid] != LINK_STATE_ENUM.SOLID:
+                    continue
+                breaking |= bool(self.links.setState_link_check(lid, LINK_STATE_ENUM.AIR))
+
+            # stop like the serial steps
+            if cfg.step_stopBreak:
+                if "LINK" in cfg.step_stopBreak_event or ("CELL" in cfg.step_stopBreak_event and breaking):
+                    break
+
+        self.depth_mean = depth_sum / done if done else 0.0
+        getStats().logDt(f"flow infiltrations: {done} / {n} ({self.solves} solves)")
+        return done
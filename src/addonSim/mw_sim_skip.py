@@ -0,0 +1,101 @@
+import numpy as np
+
+from .mw_links import MW_Links, LINK_STATE_ENUM
+from .mw_sim import MW_Sim, SIM_EXIT_FLAG
+from .mw_sim_batch import MW_SimBatch
+
+from .utils_dev import DEV
+from .stats import getStats
+
+
+#-------------------------------------------------------------------
+
+class MW_SimSkip:
+    """ Event driven time skipping: between link breaks the graph and probabilities barely change
+        * the degradation rates per link are measured over a window of exact infiltrations (serial or batched)
+        * then the sim jumps ahead a fraction (tolerance) of the infiltrations predicted until the first break, applying the rates to all links
+        * exact stepping resumes around the break, windows that contain a break are not extrapolated (the topology changed)
+        # NOTE:: the skipped infiltrations only apply the mean life/picks rates, no random events nor exit flags or paths
+    """
+
+    def __init__(self, sim: MW_Sim, tolerance: float = None, window: int = None):
+        self.sim : MW_Sim = sim
+        self.links : MW_Links = sim.links
+        self.tolerance = tolerance if tolerance is not None else sim.step_cfg.step_skipTolerance
+        """ Fraction of the predicted infiltrations until the next break that are skipped, 0 runs everything exactly """
+        self.window = window if window is not None else sim.step_cfg.step_skipWindow
+        """ Exact infiltrations used to measure the rates before each skip """
+
+        self.skipped = 0
+        self.skips = 0
+        self.depth_sum = 0
+        """ Accumulated depth of the exact infiltrations """
+
+    def run_exact(self, n: int, batch_size: int) -> dict[int,int]:
+        """ Run n infiltrations with the serial steps or in batches, returns the count per exit flag """
+        sim = self.sim
+        if batch_size > 1:
+            batch = MW_SimBatch(sim)
+            flags_count = batch.run(n, batch_size)
+            self.depth_sum += batch.depth_sum
+            return flags_count
+
+        flags_count = dict()
+        for _ in range(n):
+            sim.step(False)
+            flags_count[sim.exit_flag] = flags_count.get(sim.exit_flag, 0) + 1
+            self.depth_sum += sim.step_depth
+            if sim.exit_flag == SIM_EXIT_FLAG.NO_ENTRY_LINK or sim.exit_flag >= SIM_EXIT_FLAG.STOP_ON_LINK_BREAK:
+                break
+        return flags_count
+
+    def run(self, n: int, batch_size: int = 1) -> dict[int,int]:
+        """ Advance n infiltrations alternating exact windows and skips, returns the count per exit flag of the exact ones """
+        sim = self.sim
+        t = self.links.table
+        flags_count = dict()
+        done = 0
+
+        while done < n:
+            w = min(self.window, n-done)
+            life_prev, picks_prev, entries_prev = t.life.copy(), t.picks.copy(), t.picks_entry.copy()
+            air_prev = np.count_nonzero(t.state == LINK_STATE_ENUM.AIR)
+
+            for f,c in self.run_exact(w, batch_size).items():
+                flags_count[f] = flags_count.get(f, 0) + c
+            done += w
+
+            # stop like the exact steps
+            if sim.exit_flag == SIM_EXIT_FLAG.NO_ENTRY_LINK or sim.exit_flag >= SIM_EXIT_FLAG.STOP_ON_LINK_BREAK:
+                break
+            if done >= n or self.tolerance <= 0:
+                continue
+
+            # the window had a break so the rates are not stable, measure again
+            if np.count_nonzero(t.state == LINK_STATE_ENUM.AIR) != air_prev:
+                continue
+
+            # predicted infiltrations until the first break, never skip past it
+            solid = t.state == LINK_STATE_ENUM.SOLID
+            rate = (life_prev - t.life) / w
+            degrading = solid & (rate > 0)
+            skip = n - done
+            if degrading.any():
+                k = float(np.min(t.life[degrading] / rate[degrading]))
+                skip = min(skip, int(self.tolerance * k), int(np.ceil(k)) - 1)
+            if skip <= 0:
+                continue
+
+            # apply the mean rates of the window
+            t.life[solid] -= skip * rate[solid]
+            t.update_resist_eff()
+            t.picks += np.rint(skip * (t.picks - picks_prev) / w).astype(t.picks.dtype)
+            t.picks_entry += np.rint(skip * (t.picks_entry - entries_prev) / w).astype(t.picks_entry.dtype)
+            sim.step_id += skip
+            done += skip
+            self.skipped += skip
+            self.skips += 1
+
+        getStats().logDt(f"skip infiltrations: {done} / {n} ({self.skipped} skipped in {self.skips} jumps)")
+        DEV.log_msg(f"skip exit flags: { {SIM_EXIT_FLAG.to_str(f):c for f,c in flags_count.items()} }", {"SIM", "SKIP"})
+        return flags_count
@@ -0,0 +1,106 @@
+import numpy as np
+import multiprocessing as mp
+import itertools
+import csv
+
+from .mw_core import MW_Core, MW_CoreCfg
+from .mw_cont_base import CELL_STATE_ENUM
+from .mw_links import LINK_STATE_ENUM
+from .mw_sim import SIM_EXIT_FLAG
+from .mw_ensemble import run_tasks
+
+from .utils_dev import DEV
+from .stats import getStats
+
+
+#-------------------------------------------------------------------
+
+_exit_flags = sorted(SIM_EXIT_FLAG.all | { SIM_EXIT_FLAG.STOP_ON_LINK_BREAK, SIM_EXIT_FLAG.STOP_ON_CELL_BREAK })
+""" Exit flag columns of the results table """
+
+class MW_Sweep:
+    """ Run the same headless core with different sim cfg values in a process pool, one row of results per configuration
+        * every configuration starts from the current state of the core (same as the ensemble seeds)
+        * values are sim props by name, nested ones with a dot e.g. debug_rnd.seed_mod
+        # NOTE:: the resistance cfg is only read when building the links, so it cannot be swept
+    """
+
+    def __init__(self, core: MW_Core, processes: int = None):
+        self.core = core
+        self.processes = processes if processes else mp.cpu_count()
+
+    @staticmethod
+    def grid(params: dict[str, list]) -> list[dict]:
+        """ All the combinations of the listed values """
+        keys = list(params)
+        return [ dict(zip(keys, vals)) for vals in itertools.product(*(params[k] for k in keys)) ]
+
+    @staticmethod
+    def sample(ranges: dict[str, tuple[float,float]], n: int, seed: int = 64) -> list[dict]:
+        """ n uniform random samples inside the (min, max) ranges, ints stay ints """
+        rng = np.random.default_rng(seed)
+        configs = [ dict() for _ in range(n) ]
+        for k,(lo,hi) in ranges.items():
+            if isinstance(lo, int) and isinstance(hi, int): vals = rng.integers(lo, hi, endpoint=True, size=n).tolist()
+            else: vals = rng.uniform(lo, hi, size=n).tolist()
+            for c,v in zip(configs, vals): c[k] = v
+        return configs
+
+    @staticmethod
+    def to_values(config: dict) -> dict:
+        """ Expand the dotted keys to the nested dicts used by the cfg update """
+        values = dict()
+        for k,v in config.items():
+            if "." in k:
+                nested, k = k.split(".", 1)
+                values.setdefault(nested, dict())[k] = v
+            else: values[k] = v
+        return values
+
+    def check(self, configs: list[dict]):
+        """ Fail early on the main process with unknown or unsupported props """
+        for config in configs:
+            values = self.to_values(config)
+            if "resist" in values:
+                raise KeyError("MW_Sweep: the resistance cfg cannot be swept, it is baked in the links")
+            MW_CoreCfg().update(values)
+
+    #-------------------------------------------------------------------
+
+    def run(self, configs: list[dict], n: int = None, seed: int = None) -> list[dict]:
+        """ Run n infiltrations per configuration with the same seed (the cfg one by default), returns a row per configuration """
+        self.check(configs)
+        if seed is None: seed = self.core.cfg.debug_rnd.seed
+        cells_air = int(np.count_nonzero(np.asarray(self.core.cont.cells_state) == CELL_STATE_ENUM.AIR))
+        table = self.core.links.table
+        links_broken = int(np.count_nonzero((table.state == LINK_STATE_ENUM.AIR) & (table.state_initial == LINK_STATE_ENUM.SOLID)))
+
+        tasks = [ (seed, n, self.to_values(config)) for config in configs ]
+        runs = run_tasks(self.core, tasks, self.processes)
+        getStats().logDt(f"sweep runs: {len(runs)} configs (processes {self.processes})")
+
+        rows = []
+        for config, r in zip(configs, runs):
+            row = dict(config)
+            row["cells_detached"] = int(np.count_nonzero(r["cell_air"])) - cells_air
+            row["links_broken"] = int(np.count_nonzero(r["link_broken"])) - links_broken
+            row["comps_len"] = r["comps_len"]
+            row["depth_mean"] = r["depth_mean"]
+            for f in _exit_flags:
+                row[f"exit_{SIM_EXIT_FLAG.to_str(f)}"] = r["flags_count"].get(f, 0)
+            row["steps"] = r["steps"]
+            row["time"] = r["time"]
+            rows.append(row)
+
+        DEV.log_msg(f"sweep: {len(rows)} configs, max cells detached {max((r['cells_detached'] for r in rows), default=0)}", {"CORE", "SWEEP"})
+        return rows
+
+    @staticmethod
+    def save_csv(path: str, rows: list[dict]):
+        """ Write the results table, the columns of the first row """
+        if not rows: return
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        DEV.log_msg(f"Saved sweep: {path}", {'CORE', 'IO'})
@@ -0,0 +1,186 @@
+import numpy as np
+
+from .utils_dev import DEV
+
+
+#-------------------------------------------------------------------
+
+TRACE_STEP_DTYPE = np.dtype([
+    ("step",        np.int32),
+    ("entry",       np.int32),
+    ("exit",        np.int32),
+    ("flag",        np.int8),
+    ("subs_start",  np.int64),
+    ("subs_len",    np.int32),
+    ("cands_start", np.int64),
+    ("cands_len",   np.int32),
+])
+""" Row per traced step, the entry candidates are the first cands_len of the step candidates """
+
+TRACE_SUB_DTYPE = np.dtype([
+    ("step",        np.int32),
+    ("depth",       np.int32),
+    ("link",        np.int32),
+    ("water",       np.float64),
+    ("water_abs",   np.float64),
+    ("deg",         np.float64),
+    ("life",        np.float64),
+    ("cands_start", np.int64),
+    ("cands_len",   np.int32),
+])
+""" Row per traced sub step, nan/-1 for the values not reached (e.g. no next link found) """
+
+def _grow(arr: np.ndarray, size: int) -> np.ndarray:
+    """ Double the capacity until size fits, keeping the content """
+    if size <= len(arr): return arr
+    cap = max(len(arr), 1)
+    while cap < size: cap *= 2
+    new = np.zeros(cap, dtype=arr.dtype)
+    new[:len(arr)] = arr
+    return new
+
+class MW_Trace:
+    """ Columnar trace of the simulation steps, replaces the per sub step python objects
+        * preallocated structured arrays (a row per step and per sub step) that grow by doubling
+        * the candidates link id and weight of every choice in a flat buffer indexed by offset and length
+        * optional bound on the steps kept (the oldest are discarded) and sampling of one step every n
+    """
+
+    def __init__(self, max_steps: int = 0, every: int = 1, capacity: int = 64):
+        self.max_steps = max_steps
+        """ Keep at most the last max_steps steps, unbounded when 0 """
+        self.every = every
+        """ Trace one step every n """
+
+        self.steps = np.zeros(capacity, dtype=TRACE_STEP_DTYPE)
+        self.subs = np.zeros(capacity*8, dtype=TRACE_SUB_DTYPE)
+        self.cands_link = np.zeros(capacity*64, dtype=np.int32)
+        self.cands_w = np.zeros(capacity*64, dtype=np.float64)
+        self.steps_len = self.subs_len = self.cands_len = 0
+
+    def __len__(self):
+        return min(self.steps_len, self.max_steps) if self.max_steps else self.steps_len
+
+    def reset(self):
+        self.steps_len = self.subs_len = self.cands_len = 0
+
+    def sampled(self, step_id: int) -> bool:
+        return step_id % max(self.every, 1) == 0
+
+    #-------------------------------------------------------------------
+
+    def _push_cands(self, lids, weights) -> tuple[int,int]:
+        start = self.cands_len
+        n = len(lids)
+        self.cands_len += n
+        self.cands_link = _grow(self.cands_link, self.cands_len)
+        self.cands_w = _grow(self.cands_w, self.cands_len)
+        self.cands_link[start:self.cands_len] = lids
+        self.cands_w[start:self.cands_len] = weights
+        return start, n
+
+    def step_begin(self, step_id: int):
+        self.steps = _grow(self.steps, self.steps_len+1)
+        row = self.steps[self.steps_len]
+        row["step"] = step_id
+        row["entry"] = row["exit"] = row["flag"] = -1
+        row["subs_start"] = self.subs_len
+        row["subs_len"] = 0
+        row["cands_start"] = self.cands_len
+        row["cands_len"] = 0
+        self.steps_len += 1
+
+    def step_entry(self, lid: int, lids=None, weights=None):
+        """ Entry link found (-1 when none), the candidates are optional """
+        row = self.steps[self.steps_len-1]
+        row["entry"] = lid
+        if lids is not None:
+            row["cands_start"], row["cands_len"] = self._push_cands(lids, weights)
+
+    def step_end(self, lid: int, flag: int):
+        row = self.steps[self.steps_len-1]
+        row["exit"] = lid
+        row["flag"] = flag
+
+        # amortized bound: compact once twice the steps kept are stored
+        if self.max_steps and self.steps_len >= 2*self.max_steps:
+            self.trim(self.max_steps)
+
+    def sub_begin(self, step_id: int, depth: int):
+        self.subs = _grow(self.subs, self.subs_len+1)
+        row = self.subs[self.subs_len]
+        row["step"] = step_id
+        row["depth"] = depth
+        row["link"] = -1
+        row["water"] = row["water_abs"] = row["deg"] = row["life"] = np.nan
+        row["cands_start"] = self.cands_len
+        row["cands_len"] = 0
+        self.subs_len += 1
+        self.steps[self.steps_len-1]["subs_len"] += 1
+
+    def sub_next(self, lid: int, lids, weights):
+        row = self.subs[self.subs_len-1]
+        row["link"] = lid
+        row["cands_start"], row["cands_len"] = self._push_cands(lids, weights)
+
+    def sub_water(self, water_abs: float, water: float):
+        row = self.subs[self.subs_len-1]
+        row["water_abs"] = water_abs
+        row["water"] = water
+
+    def sub_link(self, deg: float, life: float):
+        row = self.subs[self.subs_len-1]
+        row["deg"] = deg
+        row["life"] = life
+
+    #-------------------------------------------------------------------
+
+    def sub_last(self) -> np.void:
+        """ Last sub step row (a view) """
+        return self.subs[self.subs_len-1]
+
+    def step_last(self) -> np.void:
+        return self.steps[self.steps_len-1]
+
+    def get_cands(self, row: np.void) -> tuple[np.ndarray, np.ndarray]:
+        """ Candidates link ids and weights of a step (entry) or sub step row """
+        s = slice(row["cands_start"], row["cands_start"] + row["cands_len"])
+        return self.cands_link[s], self.cands_w[s]
+
+    def trim(self, n: int):
+        """ Keep only the last n steps, moving the sub steps and candidates to the front """
+        if self.steps_len <= n: return
+        s0 = self.steps_len - n
+        sub0 = int(self.steps[s0]["subs_start"])
+        cand0 = int(self.steps[s0]["cands_start"])
+
+        self.steps[:n] = self.steps[s0:self.steps_len]
+        self.steps[:n]["subs_start"] -= sub0
+        self.steps[:n]["cands_start"] -= cand0
+        self.steps_len = n
+
+        subs_n = self.subs_len - sub0
+        self.subs[:subs_n] = self.subs[sub0:self.subs_len]
+        self.subs[:subs_n]["cands_start"] -= cand0
+        self.subs_len = subs_n
+
+        cands_n = self.cands_len - cand0
+        self.cands_link[:cands_n] = self.cands_link[cand0:self.cands_len]
+        self.cands_w[:cands_n] = self.cands_w[cand0:self.cands_len]
+        self.cands_len = cands_n
+
+    def get_arrays(self) -> dict[str, np.ndarray]:
+        """ Columns of the steps kept, prefixed by table (steps_, subs_) plus the flat candidates """
+        if self.max_steps: self.trim(self.max_steps)
+        steps = self.steps[:self.steps_len]
+        subs = self.subs[:self.subs_len]
+        arrays = { f"steps_{k}": steps[k].copy() for k in TRACE_STEP_DTYPE.names }
+        arrays.update({ f"subs_{k}": subs[k].copy() for k in TRACE_SUB_DTYPE.names })
+        arrays["cands_link"] = self.cands_link[:self.cands_len].copy()
+        arrays["cands_w"] = self.cands_w[:self.cands_len].copy()
+        return arrays
+
+    def save(self, path: str):
+        """ Write the columns to a compressed npz, load with np.load for offline analysis """
+        np.savez_compressed(path, **self.get_arrays())
+        DEV.log_msg(f"Saved trace: {path} ({self.steps_len} steps, {self.subs_len} sub steps)", {'SIM', 'TRACE', 'IO'})
@@ -23,6 +23,9 @@ from .mw_links import MW_Links
 from .mw_cont import MW_Cont, CELL_STATE_ENUM
 from .mw_fract import MW_Fract
 from .mw_sim import MW_Sim, SIM_EXIT_FLAG
+from .mw_sim_batch import MW_SimBatch
+from .mw_sim_flow import MW_SimFlow
+from .mw_sim_skip import MW_SimSkip
 
 from . import ui
 from . import utils, utils_scene, utils_trans
@@ -240,9 +243,8 @@ class MW_gen_OT(_StartRefresh_OT):
             mw_setup.gen_cells_LEGACY(cont.voro_cont, obj_root, self.context)
             return self.end_op("DEV.LEGACY_CONT_GEN stop...")
 
-        # precalculate/query neighs and other data with generated cells mesh
-        cells = mw_setup.gen_cellsObjects(fract, obj_root, self.context, scale=obj_root.mw_vis.cell_scale, flipN=cfg.debug_flipCellNormals)
-        cont.precalculations(cells)
+        # precalculate/query neighs and other data straight from the voro cells
+        cont.precalculations()
         if not cont.precalculated:
             return self.end_op_error("error during container precalculations!")
 
@@ -252,6 +254,10 @@ class MW_gen_OT(_StartRefresh_OT):
         if not links.initialized:
             return self.end_op_error("found no links... recalc different params?")
 
+        # the scene cells are only needed for visualization, generated in the voro cells order
+        cells = mw_setup.gen_cellsObjects(fract, obj_root, self.context, scale=obj_root.mw_vis.cell_scale, flipN=cfg.debug_flipCellNormals)
+        cont.setCells_objects(cells)
+
 
         # create an empty simulation too
         fract.sim = MW_Sim(fract.cont, fract.links)
@@ -481,9 +487,7 @@ class MW_gen_field_r_OT(_StartRefresh_OT):
         # update links R
         if  MW_global_selected.fract and MW_global_selected.fract.links:
             links :MW_Links = MW_global_selected.fract.links
-            for key in links.links_graph.nodes():
-                l = links.get_link(key)
-                l.update_resistance()
+            links.table.update_resistance()
 
         return self.end_op()
 
@@ -512,6 +516,11 @@ class MW_sim_step_OT(_StartRefresh_OT):
 
         # step
         col.prop(cfg, "step_infiltrations")
+        col.prop(cfg, "step_batchSize")
+        col.prop(cfg, "step_expectedFlow")
+        row = col.split()
+        row.prop(cfg, "step_skipTolerance")
+        row.prop(cfg, "step_skipWindow")
         col.prop(cfg, "step_maxDepth")
         col.prop(cfg, "water__start")
         col.prop(cfg, "water_deg")
@@ -581,10 +590,38 @@ class MW_sim_step_OT(_StartRefresh_OT):
             # restore state to get constructive results withing the mod last op panel
             sim.backup_state_restore()
 
+        # compile the cfg once for all the steps
+        sim.cfg_update()
+
         # steps
         sim_cfg : MW_sim_cfg= self.cfg
         DEV.log_msg(f"step_infiltrations({sim_cfg.step_infiltrations}), step_maxDepth({sim_cfg.step_maxDepth}), step_stopBreak({sim_cfg.step_stopBreak})", {'SIM'})
-        for step_id in range(sim_cfg.step_infiltrations):
+        step_start = 0
+
+        # expected flow preview instead of the steps
+        if sim_cfg.step_expectedFlow:
+            try:
+                MW_SimFlow(sim).run(sim_cfg.step_infiltrations)
+            except ImportError as e:
+                return self.end_op_error(str(e))
+            step_start = sim_cfg.step_infiltrations
+
+        # batched vectorized steps or time skipping, leaving the logged last iterations for the serial step
+        # NOTE:: the trace is only recorded by the serial steps
+        elif (sim_cfg.step_batchSize > 1 or sim_cfg.step_skipTolerance > 0) and not sim_cfg.debug_util_uniformDeg \
+                and not sim_cfg.debug_log_trace:
+            step_start = sim_cfg.step_infiltrations
+            if sim_cfg.debug_log: step_start = max(step_start - sim_cfg.debug_log_lastIters, 0)
+
+            if step_start:
+                if sim_cfg.step_skipTolerance > 0: MW_SimSkip(sim).run(step_start, sim_cfg.step_batchSize)
+                else: MW_SimBatch(sim).run(step_start, sim_cfg.step_batchSize)
+            if sim.exit_flag == SIM_EXIT_FLAG.NO_ENTRY_LINK:
+                return self.end_op_error("No entry link found... (probably due dir_entry)")
+            if sim.exit_flag >= SIM_EXIT_FLAG.STOP_ON_LINK_BREAK:
+                step_start = sim_cfg.step_infiltrations
+
+        for step_id in range(step_start, sim_cfg.step_infiltrations):
             # still alive msg
             if sim_cfg.debug_log_everyIters and step_id%sim_cfg.debug_log_everyIters == 0:
                 DEV.log_msg(f"// ({step_id}) running...", {'SIM'})
@@ -662,7 +699,7 @@ class MW_sim_resetCFG_OT(_StartRefresh_OT):
 class MW_sim_undoLast_OT(_StartRefresh_OT):
     bl_idname = "mw.sim_undo_last"
     bl_label = "Simulation UNDO last step"
-    bl_description = "DEV:: undo last simulation path"
+    bl_description = "DEV:: undo last simulation step, up to the amount of undo levels stored"
 
     bl_options = {'INTERNAL', 'UNDO'}
 
@@ -678,7 +715,7 @@ class MW_sim_undoLast_OT(_StartRefresh_OT):
         self.start_op()
 
         sim : MW_Sim = MW_global_selected.fract.sim
-        sim.backup_state_restore()
+        sim.backup_state_restore(pop=True)
         sim.step_reset()
 
         # redraw links and cells
@@ -242,9 +242,11 @@ class MW_gen_PT(types.Panel):
                     cell_sample = cont.cells_objs[0].name if not utils_scene.needsSanitize(cont.cells_objs[0]) else '~'
                     mesh_sample = cont.cells_meshes[0].name if not utils_scene.needsSanitize(cont.cells_meshes[0]) else '~'
                     boxCont.label(text=f"  samples [{len(cont.cells_objs)}],  c: {cell_sample}, m: {mesh_sample}")
+                    boxCont.label(text=f"  S: {cont.getCells_count_state(CELL_STATE_ENUM.SOLID)}, A: {cont.getCells_count_state(CELL_STATE_ENUM.AIR)}, C: {cont.getCells_count_state(CELL_STATE_ENUM.CORE)}")
                 if links:
                     boxLinks = box.box().column()
                     linksText = f"-LINKS-  comps: {links.comps_len}"
+                    linksText += f"  S: {links.get_link_count_state(LINK_STATE_ENUM.SOLID)}, A: {links.get_link_count_state(LINK_STATE_ENUM.AIR)}, W: {links.get_link_count_state(LINK_STATE_ENUM.WALL)}"
                     boxLinks.label(text=linksText, icon="OUTLINER_DATA_CURVES")
                     if curr and MW_id_utils.hasCellId(curr):
                         open, subboxLinks = ui.draw_toggleBox(prefs.gen_PT_meta_inspector, "meta_show_3", boxLinks, "neigs...", scaleBox=0.85, returnCol=False)
@@ -137,7 +137,32 @@ class MW_sim_cfg(types.PropertyGroup):
     step_infiltrations: props.IntProperty(
         name="Number of infiltrations",
         description="Translate to individual paths traced per button press.",
-        default=100, min=1, max=10000,
+        default=100, min=1, max=100000,
+    )
+    step_batchSize: props.IntProperty(
+        name="Batch size",
+        description="Advance this many infiltrations simultaneously (vectorized), set to 1 to use the serial step.",
+        default=1, min=1, max=4096,
+    )
+    step_skipTolerance: props.FloatProperty(
+        name="Skip tolerance",
+        description="Jump this fraction of the infiltrations predicted until the next link break, extrapolating the rates of a window. 0 runs all exactly.",
+        default=0.0, min=0.0, max=1.0,
+    )
+    step_skipWindow: props.IntProperty(
+        name="Skip window",
+        description="Exact infiltrations used to measure the degradation rates before each skip.",
+        default=100, min=1,
+    )
+    step_expectedFlow: props.BoolProperty(
+        name="Expected flow",
+        description="Preview: apply the expected degradation of the infiltrations solving a Markov chain (requires scipy), no random walks.",
+        default=False,
+    )
+    step_undoLevels: props.IntProperty(
+        name="Undo levels",
+        description="Amount of simulation state snapshots kept to undo steps.",
+        default=8, min=1, max=64,
     )
     step_maxDepth: props.IntProperty(
         name="Max infiltrations depth",
@@ -295,6 +320,14 @@ class MW_sim_cfg(types.PropertyGroup):
         description="SLOWER: Show all candidates and their probabilty per substep",
         default=False,
     )
+    debug_log_trace_maxSteps: props.IntProperty(
+        description="Keep only the trace of the last N steps, 0 keeps all",
+        default=1000, min=0,
+    )
+    debug_log_trace_every: props.IntProperty(
+        description="Trace one step every N, the rest run the fast path",
+        default=1, min=1,
+    )
 
     # custom sim/vis
     debug_skip_entry_area: props.BoolProperty(
@@ -0,0 +1,95 @@
+# OPT:: numpy version for batched sampling? atm single samples with python scalars are faster
+
+class SumTree:
+    """ Fenwick tree (binary indexed) over non negative weights for weighted sampling
+        * point updates and prefix search in O(log n), the whole build in O(n)
+        # NOTE:: floating error accumulates with many updates, so rebuilt from the weights every rebuild_every updates
+    """
+
+    def __init__(self, size:int):
+        self.size = size
+        # 1-based tree internally, weights kept separately to update by difference
+        self.tree = [0.0] * (size+1)
+        self.weights = [0.0] * size
+
+        # highest power of two not above the size, used to descend the tree
+        self.step_top = 1 << (size.bit_length()-1) if size else 0
+
+        self.updates = 0
+        self.rebuild_every = max(size, 64)
+        """ Updates between rebuilds, amortized O(1) per update """
+
+    @classmethod
+    def from_weights(cls, weights) -> "SumTree":
+        st = cls(len(weights))
+        st.build(weights)
+        return st
+
+    def copy(self) -> "SumTree":
+        st = SumTree(0)
+        st.size = self.size
+        st.tree = self.tree.copy()
+        st.weights = self.weights.copy()
+        st.step_top = self.step_top
+        st.updates = self.updates
+        st.rebuild_every = self.rebuild_every
+        return st
+
+    def build(self, weights):
+        self.updates = 0
+        self.weights = [ float(w) for w in weights ]
+        self.tree = [0.0] + self.weights
+
+        # propagate each node to its parent in a single pass
+        for i in range(1, self.size+1):
+            j = i + (i & -i)
+            if j <= self.size:
+                self.tree[j] += self.tree[i]
+
+    def rebuild(self):
+        """ Recalculate the tree from the weights, discards the accumulated floating error """
+        self.build(self.weights)
+
+    def update(self, idx:int, w:float):
+        """ Set the weight of an element """
+        dw = w - self.weights[idx]
+        if dw == 0: return
+        self.weights[idx] = w
+
+        self.updates += 1
+        if self.updates >= self.rebuild_every:
+            self.rebuild()
+            return
+
+        i = idx+1
+        while i <= self.size:
+            self.tree[i] += dw
+            i += i & -i
+
+    def total(self) -> float:
+        return self.prefix(self.size)
+
+    def prefix(self, n:int) -> float:
+        """ Sum of the first n weights """
+        s = 0.0
+        while n > 0:
+            s += self.tree[n]
+            n -= n & -n
+        return s
+
+    def find(self, u:float) -> int:
+        """ First element whose prefix sum (inclusive) is above u, so a uniform u in [0,total) samples by weight """
+        pos = 0
+        step = self.step_top
+        while step:
+            nxt = pos + step
+            if nxt <= self.size and self.tree[nxt] <= u:
+                pos = nxt
+                u -= self.tree[nxt]
+            step >>= 1
+
+        # clamp floating error on the upper end, could land on trailing null weights
+        pos = min(pos, self.size-1)
+        while pos > 0 and self.weights[pos] <= 0:
+            pos -= 1
+        return pos
@@ -7,11 +7,13 @@ class UnionFind:
         # OPT:: document methods, maybe path compresion option as a separate class for less overhead
     """
     _enabled_path_compression = True
+    _enabled_union_by_size = True
 
     def __init__(self, size:int):
         self.size = size
         # initially all elements disconnected
         self.parents = [i for i in range(size)]
+        self.sizes = [1] * size
         self.num_components = size
 
     def enlarge_dynamic(self, new_size:int):
@@ -21,6 +23,7 @@ class UnionFind:
         self.size = new_size
         # init new components as disconnected
         self.parents += [i for i in range(old_size, new_size)]
+        self.sizes += [1] * (new_size-old_size)
         self.num_components += new_size-old_size
 
     def find_parent(self, elem:int) -> int:
@@ -40,16 +43,22 @@ class UnionFind:
 
         return p
 
-    def union(self, a:int, b:int):
+    def union(self, a:int, b:int) -> int:
         # find root parent of both elements
         p1 = self.find_parent(a)
         p2 = self.find_parent(b)
         # already connected components
-        if p1 == p2: return
+        if p1 == p2: return p1
+
+        # hang the smaller component from the larger one to keep the trees shallow
+        if UnionFind._enabled_union_by_size and self.sizes[p1] < self.sizes[p2]:
+            p1, p2 = p2, p1
 
         # merge components by setting one parent as child
         self.parents[p2] = p1
+        self.sizes[p1] += self.sizes[p2]
         self.num_components -= 1
+        return p1
 
     def union_dynamic(self, a:int, b:int):
         # check if enlarge is required before union
@@ -67,4 +76,32 @@ class UnionFind:
             except:
                 componets[parent] = [i]
 
-        return list(componets.values())
\ No newline at end of file
+        return list(componets.values())
+
+class UnionFindSets(UnionFind):
+    """ Union-find that also keeps the members of each component at its root
+        * the smaller list is appended to the larger one so the total merge cost is O(n log n)
+    """
+
+    def __init__(self, size:int):
+        super().__init__(size)
+        self.members : list[list[int]] = [[i] for i in range(size)]
+
+    def enlarge_dynamic(self, new_size:int):
+        if new_size <= self.size: return
+        self.members += [[i] for i in range(self.size, new_size)]
+        super().enlarge_dynamic(new_size)
+
+    def union(self, a:int, b:int) -> int:
+        p1 = self.find_parent(a)
+        p2 = self.find_parent(b)
+        if p1 == p2: return p1
+
+        root = super().union(p1, p2)
+        child = p2 if root == p1 else p1
+        self.members[root] += self.members[child]
+        self.members[child] = None
+        return root
+
+    def get_members(self, elem:int) -> list[int]:
+        return self.members[self.find_parent(elem)]
@@ -9,21 +9,25 @@ def get_timestamp() -> int:
 
 def rnd_reset_seed(s:int = None, mod:int = None) -> int:
     """ Persists across separate module imports, return the seed to store in the config """
-    import mathutils.noise as bl_rnd
     import random as rnd
+    try:
+        import mathutils.noise as bl_rnd
+    except ImportError:
+        # headless core, no blender noise to seed
+        bl_rnd = None
 
     if s is None or s < 0:
         #s = get_timestamp()
         s = rnd.randint(0,10000)
 
     rnd.seed(s)
-    bl_rnd.seed_set(s)
+    if bl_rnd: bl_rnd.seed_set(s)
 
     # mod generates a few numbers to add change
     if mod:
         for i in range(mod):
             rnd.random()
-            bl_rnd.random()
+            if bl_rnd: bl_rnd.random()
 
     return s
 
@@ -88,6 +92,74 @@ def listMap_dict(d):
         l[k] = val
     return l
 
+def csr_from_lists(lists, dtype=None):
+    """ Flatten a list of iterables into CSR arrays (offsets, values), the values of i are values[offsets[i]:offsets[i+1]] """
+    import numpy as np
+    import itertools
+    if dtype is None: dtype = np.int64
+    lens = np.fromiter((len(l) for l in lists), dtype=np.int64, count=len(lists))
+    offsets = np.zeros(len(lists)+1, dtype=np.int64)
+    np.cumsum(lens, out=offsets[1:])
+    values = np.fromiter(itertools.chain.from_iterable(lists), dtype=dtype, count=int(offsets[-1]))
+    # read only so slices can be safely returned as views
+    offsets.flags.writeable = False
+    values.flags.writeable = False
+    return offsets, values
+
+def csr_to_lists(offsets, values) -> list[list]:
+    """ Inverse of csr_from_lists, python lists of python values """
+    values = values.tolist()
+    offsets = offsets.tolist()
+    return [ values[offsets[i]:offsets[i+1]] for i in range(len(offsets)-1) ]
+
+def map_FtoF_loops(loops, loops_len):
+    """ Faces to faces map as CSR arrays (offsets, faces) given the flattened vertex loops of the faces and their lengths
+        * the canonical edge keys (sorted vertex pair) of all the loops are sorted at once, faces sharing a key are neighbours
+        * the loops of several meshes can be concatenated (offsetting their vertex ids), the neighbours of each face are sorted
+    """
+    import numpy as np
+    loops = np.asarray(loops, dtype=np.int64)
+    loops_len = np.asarray(loops_len, dtype=np.int64)
+    n = len(loops_len)
+
+    # edge from each loop vertex to the next one, the last one closes the loop
+    loops_start = np.cumsum(loops_len) - loops_len
+    face = np.repeat(np.arange(n, dtype=np.int64), loops_len)
+    nxt = np.arange(1, len(loops)+1, dtype=np.int64)
+    valid = loops_len > 0
+    nxt[(loops_start + loops_len - 1)[valid]] = loops_start[valid]
+    v1, v2 = loops, loops[nxt]
+    lo, hi = np.minimum(v1, v2), np.maximum(v1, v2)
+
+    # faces of the same edge end up contiguous
+    order = np.lexsort((face, hi, lo))
+    lo, hi, face = lo[order], hi[order], face[order]
+
+    # pair each face with the following ones of the same edge (in manifold meshes there will only be a pair per edge)
+    pairs_a, pairs_b = [], []
+    for d in range(1, len(face)):
+        same = (lo[d:] == lo[:-d]) & (hi[d:] == hi[:-d])
+        if not same.any(): break
+        pairs_a.append(face[:-d][same])
+        pairs_b.append(face[d:][same])
+
+    # symmetric, unique and sorted by face
+    a = np.concatenate(pairs_a + pairs_b) if pairs_a else np.zeros(0, dtype=np.int64)
+    b = np.concatenate(pairs_b + pairs_a) if pairs_a else np.zeros(0, dtype=np.int64)
+    pairs = np.unique(a[a != b] * n + b[a != b])
+    a, b = pairs // n, pairs % n
+
+    offsets = np.zeros(n+1, dtype=np.int64)
+    np.cumsum(np.bincount(a, minlength=n), out=offsets[1:])
+    return offsets, b
+
+def vec3_normalized(v):
+    """ Normalized copy as a numpy array, null vectors stay null like mathutils """
+    import numpy as np
+    v = np.asarray(v, dtype=np.float64)
+    l = np.linalg.norm(v)
+    return v / l if l else v
+
 def vec3_to_string(v, fmt:str = ".2f"):
     fmt_vec = f"({{:{fmt}}},{{:{fmt}}},{{:{fmt}}})"
     return f"{fmt_vec}".format(*v)
@@ -17,6 +17,7 @@ class DEV:
     SKIP_SANITIZE         = False   # skip attempt to keep up with the UNDO/REDO etc system
     SKIP_PATH_CHECK       = False   # skip checking if a path still exists before recalc all graphs
     SKIP_BUBBLE_CHECK     = False   # skip checking for air bubbles -> air cells inside model can get entry water!
+    DEBUG_FRONTIER_CHECK  = False   # verify the incremental frontier against a full rebuild after each recalc
 
     FORCE_NO_RND_START    = False   # skip random generation in certain places to help debugging
     FORCE_NEW_MATS        = False   # force regeneration of gradient images to avoid debugging confussion
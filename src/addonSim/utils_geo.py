@@ -2,7 +2,9 @@
 
 import bpy.types as types
 from mathutils import Vector, Matrix
+import numpy as np
 from .unionfind import UnionFind
+from . import utils
 
 
 #-------------------------------------------------------------------
@@ -99,6 +101,20 @@ def map_FtoF(me: types.Mesh):
 
     return FtoF
 
+def map_FtoF_csr(me: types.Mesh) -> tuple[np.ndarray, np.ndarray]:
+    """ Same as map_FtoF but vectorized over the whole mesh, returns the CSR arrays (offsets, faces) with sorted neighbours """
+    n = len(me.polygons)
+    loops_start = np.empty(n, dtype=np.int64)
+    loops_len = np.empty(n, dtype=np.int64)
+    me.polygons.foreach_get("loop_start", loops_start)
+    me.polygons.foreach_get("loop_total", loops_len)
+    loops_vert = np.empty(len(me.loops), dtype=np.int64)
+    me.loops.foreach_get("vertex_index", loops_vert)
+
+    # gather the loops in face order, usually already contiguous
+    idx = np.repeat(loops_start - (np.cumsum(loops_len) - loops_len), loops_len) + np.arange(loops_len.sum())
+    return utils.map_FtoF_loops(loops_vert[idx], loops_len)
+
 def map_VtoF_EtoF_VtoE(me: types.Mesh):
     """ Returns multiple mappings of the mesh (that complement blenders)
         # NOTE:: basically the same performance as the general method
@@ -59,6 +59,7 @@ def main():
 
     #bench_meshMaps(stats, me)
     #bench_meshMaps_FtoF(stats, me)
+    #bench_meshMaps_FtoF_csr(stats, me)
 
 #-------------------------------------------------------------------
 # When executed from vscode extension __name__ gets overwritten
@@ -6,6 +6,8 @@ from addonSim import utils
 importlib.reload(utils)
 from addonSim import utils_geo
 importlib.reload(utils_geo)
+from addonSim import mw_sim
+importlib.reload(mw_sim)
 
 def bench_meshMaps(stats, me):
     stats.reset()
@@ -94,4 +96,92 @@ def bench_meshMaps_FtoF(stats, me):
         stats.reset()
         assert(ret1["FtoF"] == ret2)
         stats.logFull(t)
-    pass
\ No newline at end of file
+    pass
+
+def bench_meshMaps_FtoF_csr(stats, me):
+    stats.reset()
+
+    # query mesh props
+    utils_geo.queryLogAll_mesh(me)
+    stats.logFull("bench_meshMaps_FtoF_csr")
+    print()
+    nRep = 2
+    n = 50
+    delete = False
+
+    ret1, ret2, ret3 = None, None, None
+    for i in range(nRep):
+        print()
+        print(f"rep {i}")
+
+        t = """ maps general method """
+        stats.reset()
+        query = { "FtoF": True }
+        for n in range(n):
+            ret1 = utils_geo.get_meshDicts(me, queries_dict=query, queries_default=False)
+        stats.logFull(t)
+        if delete: del ret1
+
+        t = """ maps specific method """
+        stats.reset()
+        for n in range(n):
+            ret2 = utils_geo.map_FtoF(me)
+        stats.logFull(t)
+        if delete: del ret2
+
+        t = """ maps sorted edge keys (numpy CSR) """
+        stats.reset()
+        for n in range(n):
+            ret3 = utils_geo.map_FtoF_csr(me)
+        stats.logFull(t)
+        if delete: del ret3
+
+    if not delete:
+        t = """ assert equal results"""
+        stats.reset()
+        ret3 = utils.csr_to_lists(*ret3)
+        assert(ret1["FtoF"] == ret2)
+        assert([ sorted(f) for f in ret2 ] == ret3)
+        stats.logFull(t)
+    pass
+
+def bench_simStep(stats, sim: mw_sim.MW_Sim, n = 1000, seed = 64):
+    stats.reset()
+    sim.cfg_update()
+    base = sim.get_snapshot()
+    nRep = 2
+
+    ret1, ret2 = None, None
+    for i in range(nRep):
+        print()
+        print(f"rep {i}")
+
+        t = """ instrumented step (no logs) """
+        sim.set_snapshot(base)
+        sim.rng = mw_sim.MW_Rng(seed)
+        stats.reset()
+        ret1 = []
+        for _ in range(n):
+            sim.step_debug(False)
+            ret1.append((sim.exit_flag, sim.step_depth, sim.water, list(sim.step_path)))
+        stats.logFull(t)
+        life1, picks1 = sim.links.table.life.copy(), sim.links.table.picks.copy()
+
+        t = """ fast path step """
+        sim.set_snapshot(base)
+        sim.rng = mw_sim.MW_Rng(seed)
+        stats.reset()
+        ret2 = []
+        for _ in range(n):
+            sim.step_fast()
+            ret2.append((sim.exit_flag, sim.step_depth, sim.water, list(sim.step_path)))
+        stats.logFull(t)
+        life2, picks2 = sim.links.table.life.copy(), sim.links.table.picks.copy()
+
+    t = """ assert equal results"""
+    stats.reset()
+    assert(ret1 == ret2)
+    assert((life1 == life2).all())
+    assert((picks1 == picks2).all())
+    stats.logFull(t)
+    sim.set_snapshot(base)